@@ -0,0 +1,36 @@
+# microbenchmark: sklearn predict_proba vs the precompiled LogisticScorer, per call
+import timeit
+import warnings
+import pandas as pd
+import numpy as np
+from engine import load_models
+from logistic_scorer import LogisticScorer
+
+REPEATS = 5
+NUMBER = 2000
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+df = pd.read_csv("processed_fomo_dataset.csv")
+
+# Best-of-REPEATS time per call, in microseconds
+def per_call_us(fn, number=NUMBER):
+    return min(timeit.repeat(fn, number=number, repeat=REPEATS)) / number * 1e6
+
+print(f"{'model':<8} {'path':<32} {'µs/call':>10}")
+for name, model in zip(["resume", "event"], load_models()):
+    scorer = LogisticScorer.from_estimator(model)
+    row = df[list(scorer.feature_names)].iloc[0].to_dict()
+    X = df[list(scorer.feature_names)].to_numpy(dtype=np.float64)
+
+    results = {
+        # what the handler used to do per request
+        "sklearn 1 row": per_call_us(lambda: model.predict_proba(
+            np.array([row[c] for c in scorer.feature_names]).reshape(1, -1))[0][1]),
+        "scorer 1 row (pure Python)": per_call_us(lambda: scorer.predict_proba_row(row)),
+        f"sklearn {len(X)} rows": per_call_us(lambda: model.predict_proba(X)[:, 1], number=200),
+        f"scorer {len(X)} rows (NumPy)": per_call_us(lambda: scorer.predict_proba(X), number=200),
+    }
+    for path, us in results.items():
+        print(f"{name:<8} {path:<32} {us:>10.2f}")
+    print(f"{name:<8} single-row speed-up: {results['sklearn 1 row'] / results['scorer 1 row (pure Python)']:.0f}x")
@@ -0,0 +1,214 @@
+# Load-test and latency benchmark for the Engagement Insight Engine.
+#   - drives the FastAPI app in-process (httpx ASGI transport) and/or through a local uvicorn process
+#     or serve.py's multi-worker server
+#   - reports throughput and p50/p95/p99 latency for /analyze-engagement and /analyze-engagement/batch
+#   - microbenchmarks the request stages: validation, rules, FOMO insights, model inference, serialization
+# Results are written as JSON (tagged with the git commit) so runs can be compared across commits.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+import numpy as np
+import httpx
+from build_info import git_commit
+from latency_stats import latency_summary
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+RESULTS_DIR = os.path.join("reports", "benchmarks")
+
+# Request bodies: random profiles from simulated_profiles.json paired with random peer contexts
+def sample_payloads(count, seed):
+    with open("simulated_profiles.json") as f:
+        users = json.load(f)
+    with open("peer_snapshot.json") as f:
+        peers = json.load(f)
+    rng = random.Random(seed)
+    return [{"user_data": rng.choice(users), "peer_snapshot": rng.choice(peers)} for _ in range(count)]
+
+# Fires `bodies` at `path` with `concurrency` requests in flight; returns per-request latencies
+async def drive(client, path, bodies, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post(path, json=body)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
+
+async def run_endpoints(client, payloads, args):
+    results = {}
+    # warm-up so first-call costs (imports, caches) don't land in the percentiles
+    await drive(client, "/analyze-engagement", payloads[:min(50, len(payloads))], 1)
+
+    latencies, wall, errors = await drive(client, "/analyze-engagement", payloads, args.concurrency)
+    results["analyze_engagement"] = {**latency_summary(latencies, wall), "errors": errors}
+
+    batches = [payloads[i:i + args.batch_size] for i in range(0, len(payloads), args.batch_size)]
+    latencies, wall, errors = await drive(client, "/analyze-engagement/batch", batches, args.concurrency)
+    results["analyze_engagement_batch"] = {
+        **latency_summary(latencies, wall, items=len(payloads)),
+        "batch_size": args.batch_size,
+        "errors": errors
+    }
+    return results
+
+async def bench_in_process(payloads, args):
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        return await run_endpoints(client, payloads, args)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def bench_uvicorn(payloads, args):
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return await bench_server(command, port, payloads, args)
+
+# serve.py with --workers processes; compare against "uvicorn" for multi-core scaling
+async def bench_serve(payloads, args):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        command = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(args.workers), "--snapshot-dir", snapshot_dir, "--watch-interval", "0"]
+        return await bench_server(command, port, payloads, args)
+
+async def bench_server(command, port, payloads, args):
+    server = subprocess.Popen(command, env=os.environ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError(f"{command[1]} did not come up")
+                await asyncio.sleep(0.1)
+            return await run_endpoints(client, payloads, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+# Per-call timings (µs) of one stage over all payloads, repeated `rounds` times
+def time_stage(fn, items, rounds):
+    timings = []
+    for _ in range(rounds):
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - started)
+    us = np.asarray(timings) * 1e6
+    return {
+        "calls": len(us),
+        "mean_us": round(float(us.mean()), 2),
+        "p50_us": round(float(np.percentile(us, 50)), 2),
+        "p99_us": round(float(np.percentile(us, 99)), 2)
+    }
+
+def bench_stages(payloads, rounds):
+    from models import EngagementRequest
+    from engine import NudgeEngine, RequestInputs
+    from event_fomo_score import get_event_fomo_insights
+    from snapshot_registry import PeerAggregates
+
+    engine = NudgeEngine.from_files()
+    requests = [EngagementRequest.parse_obj(body) for body in payloads]
+    peers = [PeerAggregates.from_snapshot(r.peer_snapshot) for r in requests]
+    pairs = list(zip(requests, peers))
+    responses = [engine.evaluate(r, p) for r, p in pairs]
+    feature_rows = [
+        engine.model_features(r.user_data.profile, p, 0.5) for r, p in pairs
+    ]
+    resume_rows = [np.array([row[c] for c in engine.resume_columns]).reshape(1, -1) for row in feature_rows]
+
+    return {
+        "validation (EngagementRequest.parse_obj)": time_stage(EngagementRequest.parse_obj, payloads, rounds),
+        "peer aggregation (PeerAggregates)": time_stage(lambda r: PeerAggregates.from_snapshot(r.peer_snapshot), requests, rounds),
+        "rule schedule (engine.run_rules)": time_stage(
+            lambda rp: engine.run_rules(RequestInputs(rp[0].user_data.profile, rp[0].user_data.activity, rp[1], engine)),
+            pairs, rounds),
+        "get_event_fomo_insights": time_stage(
+            lambda rp: get_event_fomo_insights(rp[0].user_data.dict(), rp[1].snapshot, batch_score=rp[1].batch_score), pairs, rounds),
+        "model inference (compiled scorer, 1 row)": time_stage(engine.resume_scorer.predict_proba_row, feature_rows, rounds),
+        "model inference (sklearn predict_proba, 1 row)": time_stage(
+            engine.model_resume.predict_proba, resume_rows, max(1, rounds // 5)),
+        "full evaluate (engine.evaluate)": time_stage(lambda rp: engine.evaluate(*rp), pairs, rounds),
+        "serialization (nudge catalogue render_json)": time_stage(engine.catalogue.render_json, responses, rounds)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Engagement Insight Engine.")
+    parser.add_argument("--requests", type=int, default=2000, help="single requests per endpoint run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--stage-rounds", type=int, default=5, help="passes over the payloads per stage")
+    parser.add_argument("--modes", default="asgi,uvicorn,stages", help="comma-separated: asgi, uvicorn, serve, stages")
+    parser.add_argument("--workers", type=int, default=0, help="serve.py worker processes (0 = one per core)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help=f"JSON results path (default: {RESULTS_DIR}/<timestamp>_<commit>.json)")
+    args = parser.parse_args()
+
+    modes = {m.strip() for m in args.modes.split(",") if m.strip()}
+    payloads = sample_payloads(args.requests, args.seed)
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "results": {}
+    }
+
+    if "stages" in modes:
+        print("⏱  Stage microbenchmarks ...")
+        report["results"]["stages"] = bench_stages(payloads[:500], args.stage_rounds)
+        for stage, stats in report["results"]["stages"].items():
+            print(f"  {stage:<48} mean {stats['mean_us']:>9.2f} µs   p99 {stats['p99_us']:>9.2f} µs")
+    for mode, bench in (("asgi", bench_in_process), ("uvicorn", bench_uvicorn), ("serve", bench_serve)):
+        if mode in modes:
+            print(f"🚀 {mode}: {args.requests} requests, concurrency {args.concurrency} ...")
+            report["results"][mode] = asyncio.run(bench(payloads, args))
+            for endpoint, stats in report["results"][mode].items():
+                print(f"  {endpoint:<26} {stats['throughput_rps']:>9.1f} req/s   "
+                      f"p50 {stats['p50_ms']:.2f} ms   p95 {stats['p95_ms']:.2f} ms   p99 {stats['p99_ms']:.2f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to '{output}'")
+
+if __name__ == "__main__":
+    main()
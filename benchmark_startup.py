@@ -0,0 +1,111 @@
+# Cold-start benchmark for the Engagement Insight Engine.
+# Each trial runs a fresh Python process that imports main.py, runs the startup hooks and answers one
+# /analyze-engagement request, for each combination of startup.model_loading x startup.model_format.
+# Reports median import / startup / first-response times and whether sklearn got imported.
+# Results are written as JSON next to benchmark_service.py's, tagged with the git commit.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from benchmark_service import RESULTS_DIR, sample_payloads
+from build_info import git_commit
+
+VARIANTS = {
+    "json+warmup": {"model_format": "json", "model_loading": "warmup"},
+    "json+lazy": {"model_format": "json", "model_loading": "lazy"},
+    "pickle+warmup": {"model_format": "pickle", "model_loading": "warmup"},
+    "pickle+lazy": {"model_format": "pickle", "model_loading": "lazy"}
+}
+
+# Runs in the child process; prints one JSON line of timings (seconds since interpreter start-up
+# reached this script, so interpreter boot itself is excluded and reported separately)
+CHILD = r"""
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+payload = json.loads(sys.argv[1])
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    response = client.post("/analyze-engagement", json=payload)
+    answered = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - imported,
+    "first_request_s": answered - ready,
+    "import_to_first_response_s": answered - started,
+    "status": response.status_code,
+    "sklearn_imported": "sklearn" in sys.modules
+}))
+"""
+
+def run_trial(config_path, payload):
+    env = {**os.environ, "ENGAGEMENT_CONFIG": config_path}
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(payload)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings["process_wall_s"] = wall
+    return timings
+
+def summarize(trials):
+    keys = ("import_s", "startup_s", "first_request_s", "import_to_first_response_s", "process_wall_s")
+    summary = {f"median_{key[:-2]}_ms": round(statistics.median(t[key] for t in trials) * 1000, 2) for key in keys}
+    summary["statuses"] = sorted({t["status"] for t in trials})
+    summary["sklearn_imported"] = any(t["sklearn_imported"] for t in trials)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Engagement Insight Engine cold start.")
+    parser.add_argument("--trials", type=int, default=5, help="fresh processes per variant")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma-separated: " + ", ".join(VARIANTS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help=f"JSON results path (default: {RESULTS_DIR}/startup_<timestamp>_<commit>.json)")
+    args = parser.parse_args()
+
+    with open("config.json", encoding="utf-8") as f:
+        base_config = json.load(f)
+    payload = sample_payloads(1, args.seed)[0]
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": {}
+    }
+
+    for name in (v.strip() for v in args.variants.split(",") if v.strip()):
+        config = {**base_config, "startup": {**base_config.get("startup", {}), **VARIANTS[name], "open_browser": False}}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(config, f)
+        try:
+            trials = [run_trial(f.name, payload) for _ in range(args.trials)]
+        finally:
+            os.unlink(f.name)
+        summary = report["results"][name] = summarize(trials)
+        print(f"  {name:<14} import {summary['median_import_ms']:>8.1f} ms   startup {summary['median_startup_ms']:>8.1f} ms   "
+              f"first request {summary['median_first_request_ms']:>7.1f} ms   "
+              f"import→first response {summary['median_import_to_first_response_ms']:>8.1f} ms   "
+              f"sklearn {'yes' if summary['sklearn_imported'] else 'no'}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup_{datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to '{output}'")
+
+if __name__ == "__main__":
+    main()
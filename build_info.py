@@ -0,0 +1,9 @@
+# Build metadata shared by the scripts that tag their output (benchmarks, training runs).
+# Standard library only, so importing it pulls in nothing else.
+import subprocess
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
@@ -0,0 +1,315 @@
+# Offline bulk scoring: the same nudges as /analyze-engagement, for files of any size, without HTTP.
+#   - input records are streamed from NDJSON, CSV or a JSON array (never loaded whole)
+#   - a record is either a full request body ({"user_data": ..., "peer_snapshot" | "batch_id": ...})
+#     or bare user_data joined to a peer context from --peers (round-robin, or by --batch-field)
+#   - chunks are validated and scored with NudgeEngine.evaluate_many across a process pool,
+#     with a bounded number of chunks in flight, and written in input order to NDJSON or Parquet
+# Records that fail validation, and NDJSON/CSV lines that aren't a JSON object at all, are written as
+# status "invalid" (no nudges) so output lines up with input; the errors go to --errors (NDJSON) if given.
+# The whole run is scored as of one day: --as-of (for backfills of historical snapshots), or the
+# day it started.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from day_clock import today_ordinal, to_ordinal
+
+CHUNK_SIZE = 2048
+
+# ---------------- INPUT ----------------
+# Stands in for an input record that could not be read as a JSON object; scored as "invalid"
+class InvalidRecord:
+    def __init__(self, line, detail):
+        self.line = line
+        self.detail = detail
+
+    def error(self):
+        return f"line {self.line}: {self.detail}" if self.line is not None else self.detail
+
+def iter_ndjson(f):
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield InvalidRecord(number, f"invalid JSON: {e}")
+            continue
+        yield record if isinstance(record, dict) else InvalidRecord(number, f"expected a JSON object, got {type(record).__name__}")
+
+# Elements of a top-level JSON array, decoded one at a time from a sliding text buffer
+def iter_json_array(f, read_size=1 << 20):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    started = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            if buffer[pos] == "," and not started:
+                raise ValueError("Expected a JSON array")
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            buffer, pos = f.read(read_size), 0
+            eof = not buffer
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # a value is only complete once a delimiter follows (a number like "2.5e3" can be cut at "2.")
+            complete = end < len(buffer) and buffer[end] in " \t\r\n,]"
+        except json.JSONDecodeError:
+            complete = False
+        if not complete:
+            if eof:
+                raise ValueError(f"Invalid JSON array element at offset {pos} of the current buffer")
+            # value straddles the buffer end: keep the unread tail and read more
+            more = f.read(read_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield value
+        pos = end
+
+# CSV with dotted headers (user_id, profile.karma, activity.last_event_attended, ...).
+# Cells holding lists/objects are JSON ('["ml", "dsa"]'); empty cells are null. Other cells stay
+# strings and are coerced by the request models like any JSON body.
+def iter_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        record = {}
+        try:
+            for column, cell in row.items():
+                value = None if cell == "" else json.loads(cell) if cell[:1] in "[{" else cell
+                target = record
+                *parents, leaf = column.split(".")
+                for key in parents:
+                    target = target.setdefault(key, {})
+                target[leaf] = value
+        except (ValueError, AttributeError, TypeError) as e:
+            # a cell that isn't JSON, or columns that clash (a.b next to a) or overflow the header
+            yield InvalidRecord(reader.line_num, f"invalid CSV row: {e}")
+            continue
+        yield record
+
+READERS = {".ndjson": iter_ndjson, ".jsonl": iter_ndjson, ".json": iter_json_array, ".csv": iter_csv}
+
+def iter_records(path, input_format=None):
+    reader = READERS[input_format] if input_format else READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise SystemExit(f"📌 Can't tell the format of '{path}'; pass --input-format (ndjson, json, csv)")
+    with open(path, encoding="utf-8", newline="" if reader is iter_csv else None) as f:
+        yield from reader(f)
+
+# peer_snapshot.json is a list (joined round-robin, keys "0".."n-1"); a {batch_id: snapshot}
+# object is joined through each record's --batch-field
+def load_peers(path):
+    with open(path) as f:
+        peers = json.load(f)
+    if isinstance(peers, list):
+        return {str(i): snapshot for i, snapshot in enumerate(peers)}
+    if isinstance(peers, dict):
+        return peers
+    raise ValueError(f"'{path}' must contain a list of peer snapshots or an object keyed by batch_id.")
+
+# Request bodies: full bodies pass through, bare user_data gets a batch_id from the peers file.
+# Unreadable records pass through as InvalidRecord, as does anything that isn't a JSON object.
+def iter_payloads(records, peer_keys, batch_field=None):
+    for index, record in enumerate(records):
+        if isinstance(record, InvalidRecord):
+            yield record
+            continue
+        if not isinstance(record, dict):
+            yield InvalidRecord(None, f"record {index}: expected a JSON object, got {type(record).__name__}")
+            continue
+        if "user_data" in record:
+            yield record
+            continue
+        if batch_field:
+            batch_id = record.pop(batch_field, None)
+            batch_id = None if batch_id is None else str(batch_id)
+        else:
+            batch_id = peer_keys[index % len(peer_keys)]
+        yield {"user_data": record, "batch_id": batch_id}
+
+# ---------------- WORKERS ----------------
+_worker = {}
+
+def init_worker(config_path, model_format, peers, locale=None, as_of=None):
+    from engine import NudgeEngine, load_config, load_scorers
+    from models import PeerSnapshot
+    from snapshot_registry import SnapshotRegistry
+    registry = SnapshotRegistry()
+    for batch_id, snapshot in peers.items():
+        registry.put(batch_id, PeerSnapshot.parse_obj(snapshot))
+    _worker["engine"] = NudgeEngine(load_config(config_path), *load_scorers(model_format=model_format))
+    _worker["snapshots"] = registry
+    _worker["locale"] = locale
+    _worker["as_of"] = as_of
+
+# Validates and scores one chunk. Returns (rows, errors): rows are NDJSON lines or dicts in
+# input order, errors are (position in chunk, detail) for records that failed validation or
+# could not be read (InvalidRecord).
+def score_chunk(bodies, as_ndjson):
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import ValidationError
+    from models import EngagementRequest
+    from nudge_catalogue import EngagementResult
+    from snapshot_registry import UnknownBatchError
+
+    engine, snapshots, locale = _worker["engine"], _worker["snapshots"], _worker["locale"]
+    payloads, peers, positions, errors = [], [], [], []
+    for position, body in enumerate(bodies):
+        if isinstance(body, InvalidRecord):
+            errors.append((position, body.error()))
+            continue
+        try:
+            payload = EngagementRequest.parse_obj(body)
+            peer = snapshots.resolve(payload)
+        except ValidationError as e:
+            errors.append((position, jsonable_encoder(e.errors())))
+            continue
+        except UnknownBatchError as e:
+            errors.append((position, f"Unknown batch_id: {e.args[0]}"))
+            continue
+        payloads.append(payload)
+        peers.append(peer)
+        positions.append(position)
+
+    rows = [None] * len(bodies)
+    render = engine.catalogue.render_json if as_ndjson else engine.catalogue.render
+    for position, response in zip(positions, engine.evaluate_many(payloads, peers, _worker["as_of"])):
+        rows[position] = render(response, locale)
+    for position, _ in errors:
+        body = bodies[position]
+        user_data = body.get("user_data") if isinstance(body, dict) else None
+        user_id = user_data.get("user_id") if isinstance(user_data, dict) else None
+        rows[position] = render(EngagementResult(str(user_id or ""), [], "invalid"), locale)
+    if as_ndjson:
+        rows = [row.decode("utf-8") + "\n" for row in rows]
+    return rows, errors
+
+# ---------------- OUTPUT ----------------
+class NdjsonWriter:
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self._file.writelines(rows)
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("📌 pyarrow not installed. Run 'pip install pyarrow' to write Parquet.")
+        nudge = pa.struct([(name, pa.string()) for name in ("type", "title", "action", "priority")])
+        self._schema = pa.schema([("user_id", pa.string()), ("nudges", pa.list_(nudge)), ("status", pa.string())])
+        self._pa = pa
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+# ---------------- DRIVER ----------------
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Results in submission order with at most `in_flight` chunks pending, so memory stays bounded
+# and output order never depends on which worker finishes first
+def ordered_map(pool, fn, chunks, in_flight, *args):
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk, *args))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def main():
+    from engine import CONFIG_PATH
+    parser = argparse.ArgumentParser(description="Score a file of users offline with the nudge engine.")
+    parser.add_argument("input", help="NDJSON (.ndjson/.jsonl), CSV (.csv) or JSON array (.json) of users")
+    parser.add_argument("--output", default="-", help=".ndjson (default: stdout) or .parquet")
+    parser.add_argument("--input-format", choices=["ndjson", "json", "csv"])
+    parser.add_argument("--peers", default="peer_snapshot.json", help="peer contexts for records without one")
+    parser.add_argument("--batch-field", help="record field naming the peer context (default: round-robin)")
+    parser.add_argument("--errors", help="write validation errors here as NDJSON")
+    parser.add_argument("--workers", type=int, default=0, help="scoring processes (0 = one per core, 1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--model-format", choices=["json", "pickle"], default="json")
+    parser.add_argument("--locale", help="nudge text locale from config.json's nudge catalogue (default: its locale)")
+    parser.add_argument("--as-of", type=to_ordinal, help="score as of this YYYY-MM-DD date (default: today)")
+    args = parser.parse_args()
+
+    as_of = args.as_of or today_ordinal()
+    peers = load_peers(args.peers)
+    records = iter_records(args.input, args.input_format and "." + args.input_format)
+    chunks = chunked(iter_payloads(records, list(peers), args.batch_field), args.chunk_size)
+    as_ndjson = not args.output.endswith(".parquet")
+    writer = NdjsonWriter(args.output) if as_ndjson else ParquetWriter(args.output)
+    errors_file = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    workers = args.workers or os.cpu_count() or 1
+
+    total = invalid = 0
+    started = last_report = time.perf_counter()
+    pool = None
+    try:
+        if workers == 1:
+            init_worker(args.config, args.model_format, peers, args.locale, as_of)
+            results = (score_chunk(chunk, as_ndjson) for chunk in chunks)
+        else:
+            pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(args.config, args.model_format, peers, args.locale, as_of))
+            results = ordered_map(pool, score_chunk, chunks, workers * 2, as_ndjson)
+        for rows, errors in results:
+            writer.write(rows)
+            if errors_file is not None:
+                for position, detail in errors:
+                    errors_file.write(json.dumps({"record": total + position, "detail": detail}) + "\n")
+            total += len(rows)
+            invalid += len(errors)
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                last_report = now
+                print(f"  {total:,} users scored ({total / (now - started):,.0f} users/sec)", file=sys.stderr)
+    finally:
+        writer.close()
+        if errors_file is not None:
+            errors_file.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total:,} users scored in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} users/sec), "
+          f"{invalid:,} invalid, {workers} worker(s) -> {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# checks that bulk_score.py survives unreadable input records: an NDJSON line that isn't JSON, JSON
+# lines that aren't objects (3, "x", [], null) and a CSV row with a broken JSON cell must each come
+# out as one "invalid" row in input order, with their line number in --errors, while every other
+# record is scored as usual. Runs in-process (--workers 1) and across a process pool.
+import os
+import sys
+import json
+import csv
+import shutil
+import tempfile
+import subprocess
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)[:40]
+with open("peer_snapshot.json") as f:
+    peer = json.load(f)[0]
+
+tmp = tempfile.mkdtemp(prefix="bulk-check-")
+failures = 0
+
+# (input line as written, expected status); line numbers are 1-based positions in the file
+lines = []
+for i, user in enumerate(users):
+    lines.append((json.dumps({"user_data": user, "peer_snapshot": peer}), "generated"))
+    if i == 3:
+        lines.append(('{"user_data": {"user_id": "cut', "invalid"))
+    if i == 10:
+        lines.extend([("3", "invalid"), ('"x"', "invalid"), ("[]", "invalid"), ("null", "invalid")])
+    if i == 20:
+        lines.append(('{"user_data": {"user_id": "no-profile"}}', "schema"))  # schema-invalid, as before
+ndjson_path = os.path.join(tmp, "users.ndjson")
+with open(ndjson_path, "w", encoding="utf-8") as f:
+    f.write("\n".join(line for line, _ in lines) + "\n")
+unreadable_lines = [number for number, (_, status) in enumerate(lines, 1) if status == "invalid"]
+expected_lines = [number for number, (_, status) in enumerate(lines, 1) if status != "generated"]
+statuses = [status if status == "generated" else "invalid" for _, status in lines]
+
+# bare user_data with dotted headers; the second row's quiz_history cell is cut short
+def flatten(record, prefix=""):
+    cells = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            cells.update(flatten(value, f"{prefix}{key}."))
+        else:
+            cells[prefix + key] = "" if value is None else json.dumps(value) if isinstance(value, list) else str(value)
+    return cells
+
+csv_rows = [flatten(u) for u in users[:3]]
+csv_rows[1]["profile.quiz_history"] = '["2025-06-01", broken'
+csv_path = os.path.join(tmp, "users.csv")
+with open(csv_path, "w", encoding="utf-8", newline="") as f:
+    writer = csv.DictWriter(f, list(csv_rows[0]))
+    writer.writeheader()
+    writer.writerows(csv_rows)
+
+def run(path, workers):
+    output, errors = os.path.join(tmp, "out.ndjson"), os.path.join(tmp, "errors.ndjson")
+    done = subprocess.run(
+        [sys.executable, "bulk_score.py", path, "--output", output, "--errors", errors,
+         "--workers", str(workers), "--chunk-size", "16", "--as-of", "2025-07-01"],
+        capture_output=True, text=True
+    )
+    if done.returncode != 0:
+        return done.stderr.strip().splitlines()[-1:], None, None
+    with open(output, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    with open(errors, encoding="utf-8") as f:
+        details = [json.loads(line) for line in f]
+    return None, rows, details
+
+for workers in (1, 2):
+    crash, rows, details = run(ndjson_path, workers)
+    ok = (crash is None and [r["status"] for r in rows] == statuses
+          and [d["record"] + 1 for d in details] == expected_lines
+          and all(str(d["detail"]).startswith(f"line {d['record'] + 1}:") for d in details if d["record"] + 1 in unreadable_lines))
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} NDJSON, {workers} worker(s): "
+          + (f"crashed: {crash}" if crash else f"{len(rows)}/{len(lines)} rows, {len(details)} invalid at lines {[d['record'] + 1 for d in details]}"))
+
+crash, rows, details = run(csv_path, 1)
+ok = crash is None and [r["status"] for r in rows] == ["generated", "invalid", "generated"] and len(details) == 1 \
+    and str(details[0]["detail"]).startswith("line 3: invalid CSV row")
+failures += not ok
+print(f"{'✅' if ok else '❌'} CSV with a broken JSON cell: "
+      + (f"crashed: {crash}" if crash else f"{len(rows)} rows, {[r['status'] for r in rows]}, {[str(d['detail'])[:40] for d in details]}"))
+
+shutil.rmtree(tmp, ignore_errors=True)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,121 @@
+# checks request capture (request_capture.py) and replay (replay_capture.py) end to end, in process:
+#   1. main.py with capture on (sample_rate 1, anonymized user_ids) answers valid and invalid requests,
+#      some asking for a French catalogue (Accept-Language); every one must land in a segment, with
+#      its headers and with user_ids hashed consistently in request and response
+#   2. replaying the segments against the same app must reproduce every captured response, in its locale
+#   3. a tampered record must be reported as a mismatch
+#   4. with the writer's queue full, records are dropped and counted, never waited on; a truncated
+#      segment yields the records written before the cut
+import os
+import sys
+import json
+import gzip
+import asyncio
+import shutil
+import tempfile
+import time
+import httpx
+
+tmp = tempfile.mkdtemp(prefix="capture-check-")
+with open("config.json", encoding="utf-8") as f:
+    config = json.load(f)
+config["capture"] = {**config.get("capture", {}), "enabled": True, "sample_rate": 1.0,
+                     "anonymize_user_id": True, "directory": os.path.join(tmp, "captures")}
+config["nudges"]["locales"] = {"fr": {
+    "resume": {"title": "{pct}% de vos pairs ont déposé un CV. Pas vous !"},
+    "project": {"title": "Vous n'avez ajouté aucun projet."},
+    "fallback": {"title": "Restez actif pour développer votre présence !"}
+}}
+config_path = os.path.join(tmp, "config.json")
+with open(config_path, "w", encoding="utf-8") as f:
+    json.dump(config, f)
+os.environ["ENGAGEMENT_CONFIG"] = config_path
+os.environ["ENGAGEMENT_AS_OF"] = "2025-07-01"
+
+import main  # noqa: E402 (reads ENGAGEMENT_CONFIG at import)
+from replay_capture import segment_files, iter_captures, replay  # noqa: E402
+from request_capture import SEGMENT_SUFFIX, CaptureWriter  # noqa: E402
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)[:200]
+with open("peer_snapshot.json") as f:
+    peer = json.load(f)[0]
+bodies = [{"user_data": u, "peer_snapshot": peer} for u in users]
+invalid = [{"user_data": {"user_id": "broken"}}, {"peer_snapshot": peer}]
+
+async def drive(requests):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://capture-check") as client:
+        responses = []
+        for index, body in enumerate(requests):
+            headers = {"accept-language": "fr-FR,fr;q=0.9"} if index % 2 else {}
+            response = await client.post("/analyze-engagement", json=body, headers=headers)
+            responses.append(response)
+        return responses
+
+async def replay_records(records):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://capture-check") as client:
+        return await replay(client, records, rate=0, concurrency=8)
+
+failures = 0
+
+# === 1. Capture ===
+responses = asyncio.run(drive(bodies + invalid))
+timed = sum("server-timing" in r.headers for r in responses)
+main.capture.close()
+files = segment_files([main.CAPTURE["directory"]])
+records = list(iter_captures(files))
+statuses = sorted({r["status"] for r in records})
+anonymized = all(
+    r["request"]["user_data"]["user_id"].startswith("anon-") and r["request"]["user_data"]["user_id"] == r["response"]["user_id"]
+    for r in records if r["status"] == 200
+)
+raw_ids = {u["user_id"] for u in users} | {"broken"}
+leaked = sum(u in json.dumps(r) for r in records for u in [r["request"].get("user_data", {}).get("user_id")] if u in raw_ids)
+localized = [r for r in records if r["headers"].get("accept-language", "").startswith("fr")]
+french = sum("vos pairs" in json.dumps(r["response"], ensure_ascii=False) for r in localized)
+ok = (len(records) == len(responses) and timed == len(responses) and anonymized and not leaked and statuses == [200, 422]
+      and len(localized) == len(responses) // 2 and french > 0
+      and all(r["headers"].get("content-type") == "application/json" for r in records))
+failures += not ok
+print(f"{'✅' if ok else '❌'} {len(records)}/{len(responses)} requests captured in {len(files)} segment(s), "
+      f"statuses {statuses}, Server-Timing on {timed}, user_ids anonymized: {anonymized and not leaked}, "
+      f"{len(localized)} with Accept-Language fr ({french} answered in French)")
+
+# === 2. Replay ===
+result = asyncio.run(replay_records(records))
+ok = result["replayed"] == len(records) and result["mismatches"] == 0 and result["errors"] == 0 and result["as_of"] == {"2025-07-01": len(records)}
+failures += not ok
+print(f"{'✅' if ok else '❌'} {result['replayed']} replayed: {result['mismatches']} mismatches, {result['errors']} errors, "
+      f"as_of {result['as_of']}")
+
+# === 3. Tampered record ===
+tampered = json.loads(json.dumps(records))
+tampered[0]["response"]["nudges"] = []
+result = asyncio.run(replay_records(tampered))
+ok = result["mismatches"] == 1 and len(result["mismatch_examples"]) == 1
+failures += not ok
+print(f"{'✅' if ok else '❌'} a tampered record is reported: {result['mismatches']} mismatch")
+
+# === 4. Overload and truncation ===
+writer = CaptureWriter(os.path.join(tmp, "overload"), max_queue=4)
+started = time.perf_counter()
+for _ in range(2000):
+    writer.submit(time.time(), 739433, "/analyze-engagement", 200, 0.001, {}, json.dumps(bodies[0]).encode(), b"{}")
+submit_ms = (time.perf_counter() - started) * 1000
+writer.close()
+# a segment cut short still yields the records before the cut
+with open(files[0], "rb") as f:
+    data = f.read()
+cut = os.path.join(tmp, "cut" + SEGMENT_SUFFIX)
+with open(cut, "wb") as f:
+    f.write(data[:len(data) // 2])
+truncated = list(iter_captures([cut]))
+ok = writer.dropped > 0 and writer.captured + writer.dropped == 2000 and writer.written == writer.captured and len(truncated) < len(records)
+failures += not ok
+print(f"{'✅' if ok else '❌'} a 4-record queue under 2,000 submits ({submit_ms:.1f} ms): {writer.captured} written, "
+      f"{writer.dropped} dropped; a truncated segment yields {len(truncated)} complete records")
+
+shutil.rmtree(tmp, ignore_errors=True)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,117 @@
+# checks CohortAggregator's incrementally maintained peer snapshots against a rescan from scratch,
+# over a random stream of joins, moves, profile edits, removals, attendance and buddy list changes,
+# then times updates and lookups
+import sys
+import json
+import random
+import time
+from cohort_aggregator import CohortAggregator
+
+SEED = 7
+BATCHES = [f"batch-{i}" for i in range(12)]
+EVENTS = ["startup-meetup", "coding-contest", "resume-workshop", "hackathon", "career-fair", "alumni-talk"]
+UPDATES = 20_000
+CHECK_EVERY = 2_000
+WATCHED_USERS = 50  # version checked after every update
+BENCH_LOOKUPS = 200_000
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)
+rng = random.Random(SEED)
+user_ids = [u["user_id"] for u in users]
+profiles = {u["user_id"]: u["profile"] for u in users}
+
+# The reference state, rescanned in full on every check
+members, events, buddies = {}, {}, {}
+
+def expected_snapshot(user_id, batch_id):
+    batch = [m for m, (b, _) in members.items() if b == batch_id]
+    attendance = {}
+    for m in batch:
+        for event in events.get(m, ()):
+            attendance[event] = attendance.get(event, 0) + 1
+    return {
+        "batch_avg_projects": sum(members[m][1]["projects_added"] for m in batch) / len(batch),
+        "batch_resume_uploaded_pct": 100 * sum(bool(members[m][1]["resume_uploaded"]) for m in batch) / len(batch),
+        "batch_event_attendance": dict(sorted(attendance.items())),
+        "buddies_attending_events": sorted({e for b in buddies.get(user_id, ()) if b != user_id for e in events.get(b, ())})
+    }
+
+def random_update(aggregator):
+    user_id = rng.choice(user_ids)
+    action = rng.random()
+    if action < 0.35:  # join, move or edit
+        profile = dict(profiles[user_id], projects_added=rng.randint(0, 6), resume_uploaded=rng.random() < 0.6)
+        batch_id = rng.choice(BATCHES)
+        new_buddies = rng.sample(user_ids, rng.randint(0, 4)) if rng.random() < 0.5 else None
+        aggregator.upsert_member(user_id, batch_id, profile, new_buddies)
+        members[user_id] = (batch_id, profile)
+        if new_buddies is not None:
+            buddies[user_id] = set(new_buddies)
+    elif action < 0.45:
+        if user_id in members:
+            aggregator.remove_member(user_id)
+            del members[user_id]
+            buddies.pop(user_id, None)
+    elif action < 0.9:
+        event, attended = rng.choice(EVENTS), rng.random() < 0.75
+        aggregator.record_attendance(user_id, event, attended)
+        (events.setdefault(user_id, set()).add if attended else events.setdefault(user_id, set()).discard)(event)
+    else:
+        new_buddies = rng.sample(user_ids, rng.randint(0, 4))
+        aggregator.set_buddies(user_id, new_buddies)
+        buddies[user_id] = set(new_buddies)
+
+aggregator = CohortAggregator()
+watched = rng.sample(user_ids, WATCHED_USERS)
+seen = {}  # user_id -> ((batch_id, version), snapshot) after the previous update
+mismatches = stale_versions = checked = 0
+for step in range(1, UPDATES + 1):
+    random_update(aggregator)
+    # a response cached under (batch_id, version) must not outlive a change to the snapshot
+    for user_id in watched:
+        if user_id not in members:
+            seen.pop(user_id, None)
+            continue
+        peer = aggregator.peer(user_id)
+        key, snapshot = (members[user_id][0], peer.version), peer.snapshot
+        previous = seen.get(user_id)
+        if previous is not None and previous[0] == key and previous[1] != snapshot:
+            stale_versions += 1
+        seen[user_id] = (key, snapshot)
+    if step % CHECK_EVERY:
+        continue
+    for user_id, (batch_id, _) in members.items():
+        checked += 1
+        if aggregator.peer(user_id).snapshot != expected_snapshot(user_id, batch_id):
+            mismatches += 1
+
+ok = mismatches == 0 and stale_versions == 0
+print(f"{'✅' if ok else '❌'} {UPDATES:,} updates, {checked:,} snapshots checked: "
+      f"{mismatches} mismatches, {stale_versions} changed without a new version")
+
+# A rebuild from records agrees with the incremental state
+records = [
+    {"user_id": u, "batch_id": b, "profile": p, "buddies": sorted(buddies.get(u, ())), "events_attended": sorted(events.get(u, ()))}
+    for u, (b, p) in members.items()
+]
+records += [{"user_id": u, "events_attended": sorted(e)} for u, e in events.items() if u not in members]
+rebuilt = CohortAggregator.from_records(records)
+rebuild_ok = all(rebuilt.peer(u).snapshot == aggregator.peer(u).snapshot for u in members)
+print(f"{'✅' if rebuild_ok else '❌'} Rebuilt from {len(members):,} member records: snapshots {'match' if rebuild_ok else 'differ'}")
+
+# Timings: updates, then lookups (first lookup after an update rebuilds the batch's shared part)
+started = time.perf_counter()
+for _ in range(UPDATES):
+    random_update(aggregator)
+elapsed = time.perf_counter() - started
+print(f"⏱  {UPDATES:,} updates in {elapsed:.3f}s ({elapsed / UPDATES * 1e6:.1f} µs/update)")
+
+lookup_ids = [rng.choice(list(members)) for _ in range(BENCH_LOOKUPS)]
+started = time.perf_counter()
+for user_id in lookup_ids:
+    aggregator.peer(user_id)
+elapsed = time.perf_counter() - started
+print(f"⏱  {BENCH_LOOKUPS:,} lookups in {elapsed:.3f}s ({elapsed / BENCH_LOOKUPS * 1e6:.2f} µs/lookup)")
+
+sys.exit(0 if ok and rebuild_ok else 1)
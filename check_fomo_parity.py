@@ -0,0 +1,57 @@
+# checks calculate_event_fomo_score_batch against the scalar calculate_event_fomo_score, and times it on 1M users
+import sys
+import json
+import time
+from datetime import date
+import numpy as np
+from event_fomo_score import calculate_event_fomo_score, calculate_event_fomo_score_batch
+
+AS_OF = date(2025, 7, 1)
+BENCH_USERS = 1_000_000
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)
+with open("peer_snapshot.json") as f:
+    peers = json.load(f)
+
+# Edge cases the simulated data doesn't cover: no buddies, no last event, no events, many events
+peers = peers + [
+    {"batch_avg_projects": 1, "batch_resume_uploaded_pct": 70, "batch_event_attendance": {}, "buddies_attending_events": []},
+    {"batch_avg_projects": 2, "batch_resume_uploaded_pct": 90,
+     "batch_event_attendance": {f"event-{i}": 3 * i + 1 for i in range(11)}, "buddies_attending_events": ["a", "b", "c"]},
+]
+users = users + [
+    {"profile": {"buddy_count": 0}, "activity": {"last_event_attended": None}},
+    {"profile": {"buddy_count": 2}, "activity": {"last_event_attended": "2025-07-01"}},
+]
+
+# Every user against every peer context
+pairs = [(u, p) for p in peers for u in users]
+expected = [calculate_event_fomo_score(u, p, as_of=AS_OF) for u, p in pairs]
+
+scores, days = calculate_event_fomo_score_batch(
+    np.array([u["profile"]["buddy_count"] for u, _ in pairs]),
+    np.array([len(p["buddies_attending_events"]) for _, p in pairs]),
+    [p["batch_event_attendance"] for _, p in pairs],
+    np.array([u["activity"]["last_event_attended"] or "NaT" for u, _ in pairs], dtype="datetime64[D]"),
+    as_of=AS_OF
+)
+
+score_mismatch = sum(s != e[0] for s, e in zip(scores.tolist(), expected))
+days_mismatch = sum(d != e[1] for d, e in zip(days.tolist(), expected))
+ok = score_mismatch == 0 and days_mismatch == 0
+print(f"{'✅' if ok else '❌'} {len(pairs):,} user/peer pairs: {score_mismatch} score and {days_mismatch} day mismatches")
+
+# Throughput on a padded attendance matrix
+rng = np.random.default_rng(0)
+attendance = rng.integers(2, 16, size=(BENCH_USERS, 3)).astype(np.float64)
+last_event = np.datetime64(AS_OF, "D") - rng.integers(0, 91, size=BENCH_USERS).astype("timedelta64[D]")
+buddy_counts = rng.integers(0, 6, size=BENCH_USERS)
+buddies_attending = rng.integers(0, 3, size=BENCH_USERS)
+
+started = time.perf_counter()
+calculate_event_fomo_score_batch(buddy_counts, buddies_attending, attendance, last_event, as_of=AS_OF)
+elapsed = time.perf_counter() - started
+print(f"⏱  {BENCH_USERS:,} users scored in {elapsed:.3f}s ({BENCH_USERS / elapsed:,.0f} users/sec)")
+
+sys.exit(0 if ok else 1)
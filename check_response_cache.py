@@ -0,0 +1,93 @@
+# checks that the response cache (response_cache.py) never keeps a response from a retired engine:
+#   1. an engine hot reload that lands between evaluate() and put() on /analyze-engagement must leave
+#      nothing from the old engine in the cache; the next identical request is scored by the new one
+#   2. the same race on the coalesced endpoint (evaluate_many() in a micro-batch)
+#   3. without a reload, a repeated request is answered from the cache
+import os
+import sys
+import json
+import logging
+import shutil
+import tempfile
+
+tmp = tempfile.mkdtemp(prefix="cache-check-")
+with open("config.json", encoding="utf-8") as f:
+    config = json.load(f)
+config["response_cache"] = {**config.get("response_cache", {}), "enabled": True}
+config["micro_batching"] = {**config.get("micro_batching", {}), "enabled": True}
+config_path = os.path.join(tmp, "config.json")
+with open(config_path, "w", encoding="utf-8") as f:
+    json.dump(config, f)
+os.environ["ENGAGEMENT_CONFIG"] = config_path
+os.environ["ENGAGEMENT_AS_OF"] = "2025-07-01"
+
+import main  # noqa: E402 (reads ENGAGEMENT_CONFIG at import)
+from fastapi.testclient import TestClient  # noqa: E402
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)[:3]
+with open("peer_snapshot.json") as f:
+    peer = json.load(f)[0]
+bodies = [{"user_data": u, "peer_snapshot": peer} for u in users]
+cache = main.response_cache
+failures = 0
+
+# Replaces `method` on the current engine with one that hot-reloads the engine after scoring,
+# i.e. between evaluate and put; returns the engine and what it returned
+def reload_after(method):
+    engine = main.get_engine()
+    original = getattr(engine, method)
+    returned = []
+
+    def racing(*args):
+        result = original(*args)
+        returned.append(result)
+        main.reloader.reload(reason="check_response_cache")
+        return result
+
+    setattr(engine, method, racing)
+    return engine, returned
+
+def retired_entries(returned):
+    cached = [response for _, response in cache._entries.values()]
+    retired = [r for result in returned for r in (result if isinstance(result, list) else [result])]
+    return sum(any(c is r for r in retired) for c in cached)
+
+with TestClient(main.app) as client:
+    for name in ("engine_reloader", "engine.summary", "httpx"):
+        logging.getLogger(name).disabled = True
+
+    # === 1. Reload between evaluate() and put() ===
+    old, returned = reload_after("evaluate")
+    first = client.post("/analyze-engagement", json=bodies[0])
+    stale = retired_entries(returned)
+    misses = cache.stats()["misses"]
+    second = client.post("/analyze-engagement", json=bodies[0])
+    ok = (first.status_code == second.status_code == 200 and returned and not stale
+          and cache.stats()["misses"] == misses + 1 and main.get_engine() is not old and len(cache._entries) == 1)
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} /analyze-engagement: reload between evaluate and put left {stale} retired "
+          f"response(s) cached; the repeat was a {'miss' if cache.stats()['misses'] == misses + 1 else 'hit'}")
+
+    # === 2. The same race in a micro-batch ===
+    old, returned = reload_after("evaluate_many")
+    first = client.post("/analyze-engagement/coalesced", json=bodies[1])
+    stale = retired_entries(returned)
+    misses = cache.stats()["misses"]
+    second = client.post("/analyze-engagement/coalesced", json=bodies[1])
+    ok = (first.status_code == second.status_code == 200 and returned and not stale
+          and cache.stats()["misses"] == misses + 1 and main.get_engine() is not old)
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} /analyze-engagement/coalesced: reload between evaluate_many and put left "
+          f"{stale} retired response(s) cached; the repeat was a {'miss' if cache.stats()['misses'] == misses + 1 else 'hit'}")
+
+    # === 3. No reload: the repeat is a hit ===
+    hits = cache.stats()["hits"]
+    client.post("/analyze-engagement", json=bodies[2])
+    client.post("/analyze-engagement", json=bodies[2])
+    ok = cache.stats()["hits"] == hits + 1
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} without a reload the repeated request is served from the cache")
+
+shutil.rmtree(tmp, ignore_errors=True)
+sys.exit(1 if failures else 0)
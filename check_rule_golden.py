@@ -0,0 +1,89 @@
+# checks NudgeEngine output against a golden file: every simulated profile against every peer snapshot
+# (plus edge cases), through evaluate() and evaluate_many(), rendered with the default nudge catalogue.
+# Regenerate the golden file with --write only when a change to the output is intended.
+# Everything is scored as of AS_OF, so the day-count rules give the same answers on any day it runs.
+import argparse
+import gzip
+import json
+import logging
+import sys
+from datetime import date, timedelta
+from engine import NudgeEngine, load_config, load_scorers
+from models import EngagementRequest
+
+GOLDEN_PATH = "reports/golden_nudges.ndjson.gz"
+AS_OF = date(2025, 7, 1)
+
+def days_before_as_of(days):
+    return (AS_OF - timedelta(days=days)).isoformat()
+
+# Edge cases the simulated data doesn't cover: dated (and undated/bad) quizzes, no last event,
+# no buddies, no events, many buddies at events, and events and quizzes 0-39 days before AS_OF
+# (across the quiz, comeback and FOMO day limits) or after it
+EDGE_PEERS = [
+    {"batch_avg_projects": 1, "batch_resume_uploaded_pct": 70, "batch_event_attendance": {}, "buddies_attending_events": []},
+    {"batch_avg_projects": 2, "batch_resume_uploaded_pct": 90,
+     "batch_event_attendance": {f"event-{i}": 3 * i + 1 for i in range(11)}, "buddies_attending_events": ["a", "b", "c"]},
+]
+
+def edge_users(users):
+    edits = [
+        lambda u, k: u["profile"].update(quiz_history=["2025-01-01", "python"]),
+        lambda u, k: u["profile"].update(quiz_history=["bad-date"]),
+        lambda u, k: u["activity"].update(last_event_attended=None),
+        lambda u, k: u["profile"].update(buddy_count=0),
+        lambda u, k: u["profile"].update(resume_uploaded=False, projects_added=0, quiz_history=["2024-12-31"]),
+        lambda u, k: u["activity"].update(last_event_attended=days_before_as_of(k)),
+        lambda u, k: u["profile"].update(quiz_history=[days_before_as_of(k + 20), "python", days_before_as_of(k)]),
+        lambda u, k: u["activity"].update(last_event_attended=days_before_as_of(-k)),
+    ]
+    cases = []
+    for i, edit in enumerate(edits):
+        for k, user in enumerate(users[i * 40:(i + 1) * 40]):
+            user = json.loads(json.dumps(user))
+            user["user_id"] += f"-edge{i}"
+            edit(user, k)
+            cases.append(user)
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description="Check nudge output against the golden file.")
+    parser.add_argument("--write", action="store_true", help="regenerate the golden file from the current engine")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with open("simulated_profiles.json") as f:
+        users = json.load(f)
+    with open("peer_snapshot.json") as f:
+        peers = json.load(f) + EDGE_PEERS
+    users = users + edge_users(users)
+    requests = [EngagementRequest.parse_obj({"user_data": u, "peer_snapshot": p}) for p in peers for u in users]
+
+    engine = NudgeEngine(load_config(), *load_scorers())
+    render = engine.catalogue.render
+    single = [json.dumps(render(engine.evaluate(r, as_of=AS_OF)), ensure_ascii=False) for r in requests]
+    many = [json.dumps(render(result), ensure_ascii=False) for result in engine.evaluate_many(requests, as_of=AS_OF)]
+
+    if args.write:
+        with gzip.open(args.golden, "wt", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in single)
+        print(f"✅ {len(single):,} responses written to '{args.golden}'")
+        return 0
+
+    with gzip.open(args.golden, "rt", encoding="utf-8") as f:
+        golden = [line.rstrip("\n") for line in f]
+    if len(golden) != len(single):
+        print(f"❌ golden file has {len(golden):,} responses, expected {len(single):,}; regenerate it with --write")
+        return 1
+    single_mismatch = [i for i, (a, b) in enumerate(zip(single, golden)) if a != b]
+    many_mismatch = [i for i, (a, b) in enumerate(zip(many, golden)) if a != b]
+    ok = not single_mismatch and not many_mismatch
+    print(f"{'✅' if ok else '❌'} {len(golden):,} user/peer pairs: {len(single_mismatch)} evaluate() and "
+          f"{len(many_mismatch)} evaluate_many() mismatches")
+    for i in (single_mismatch or many_mismatch)[:3]:
+        print(f"  expected: {golden[i]}\n  got:      {single[i] if i in single_mismatch else many[i]}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
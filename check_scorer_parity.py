@@ -0,0 +1,41 @@
+# checks that the precompiled LogisticScorer and the exported JSON artifacts match sklearn's
+# predict_proba for both nudge models
+import sys
+import warnings
+import pandas as pd
+import numpy as np
+from engine import load_models, load_scorers
+from logistic_scorer import LogisticScorer
+
+TOLERANCE = 1e-12
+
+# sklearn warns when a model fitted on a DataFrame is given a plain array
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Load the dataset the models were trained on
+df = pd.read_csv("processed_fomo_dataset.csv")
+
+failed = False
+for name, model, artifact in zip(["resume", "event"], load_models(), load_scorers(model_format="json")):
+    scorer = LogisticScorer.from_estimator(model)
+    X = df[list(scorer.feature_names)].to_numpy(dtype=np.float64)
+    expected = model.predict_proba(X)[:, 1]
+
+    # Batch path
+    batch_diff = np.max(np.abs(scorer.predict_proba(X) - expected))
+
+    # Single-row (pure Python) path
+    rows = df[list(scorer.feature_names)].to_dict("records")
+    row_probs = np.array([scorer.predict_proba_row(row) for row in rows])
+    row_diff = np.max(np.abs(row_probs - expected))
+
+    # Exported artifact (models/model_<name>.json)
+    artifact_diff = np.max(np.abs(artifact.predict_proba(X) - expected))
+    same_features = artifact.feature_names == scorer.feature_names
+
+    ok = batch_diff <= TOLERANCE and row_diff <= TOLERANCE and artifact_diff <= TOLERANCE and same_features
+    failed |= not ok
+    print(f"{'✅' if ok else '❌'} model_{name}: {len(X)} rows, max |diff| batch={batch_diff:.2e} "
+          f"row={row_diff:.2e} artifact={artifact_diff:.2e}")
+
+sys.exit(1 if failed else 0)
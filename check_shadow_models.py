@@ -0,0 +1,134 @@
+# checks shadow model scoring (shadow_models.py) through the API, in process:
+#   1. a candidate identical to the live models: every request sent to the single, coalesced and
+#      batch endpoints is shadow-scored, with full agreement and no drift
+#   2. a shifted candidate, loaded with POST /admin/shadow/reload: decision counts, means and PSI
+#      must equal what the live and candidate scorers give for the same requests scored directly
+#   3. with the queue full, requests are dropped and counted; submit() cost per request vs scoring
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import tempfile
+import numpy as np
+
+tmp = tempfile.mkdtemp(prefix="shadow-check-")
+candidate_dir = os.path.join(tmp, "candidate")
+os.makedirs(candidate_dir)
+for name in ("model_resume.json", "model_event.json"):
+    shutil.copy(os.path.join("models", name), candidate_dir)
+with open("config.json", encoding="utf-8") as f:
+    config = json.load(f)
+config["shadow"] = {**config.get("shadow", {}), "enabled": True, "model_dir": candidate_dir, "batch_size": 64}
+config["response_cache"] = {**config.get("response_cache", {}), "enabled": False}
+config_path = os.path.join(tmp, "config.json")
+with open(config_path, "w", encoding="utf-8") as f:
+    json.dump(config, f)
+os.environ["ENGAGEMENT_CONFIG"] = config_path
+os.environ["ENGAGEMENT_AS_OF"] = "2025-07-01"
+
+import main  # noqa: E402 (reads ENGAGEMENT_CONFIG at import)
+from fastapi.testclient import TestClient  # noqa: E402
+from logistic_scorer import LogisticScorer  # noqa: E402
+from models import EngagementRequest  # noqa: E402
+from snapshot_registry import PeerAggregates  # noqa: E402
+from shadow_models import ShadowEvaluator, ModelComparison  # noqa: E402
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)[:300]
+with open("peer_snapshot.json") as f:
+    peers = json.load(f)
+bodies = [{"user_data": u, "peer_snapshot": peers[i % len(peers)]} for i, u in enumerate(users)]
+
+# 100 single, 100 coalesced and 100 in one batch request
+def send(client):
+    for body in bodies[:100]:
+        assert client.post("/analyze-engagement", json=body).status_code == 200
+    for body in bodies[100:200]:
+        assert client.post("/analyze-engagement/coalesced", json=body).status_code == 200
+    assert client.post("/analyze-engagement/batch", json=bodies[200:]).status_code == 200
+    main.shadow.close()  # scores what is still queued
+    return client.get("/shadow").json()
+
+# What the report should hold, from the same scorers applied directly
+def expected_report(engine, candidate):
+    payloads = [EngagementRequest.parse_obj(body) for body in bodies]
+    aggregates = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+    columns = engine.model_columns(payloads, aggregates)
+    live = engine.target_scores(payloads, aggregates)
+    expected = {}
+    for name, scorer in zip(ShadowEvaluator.MODELS, candidate):
+        comparison = ModelComparison()
+        comparison.add(live["ml_" + name], scorer.predict_proba(np.column_stack([columns[c] for c in scorer.feature_names])),
+                       engine.nudge_probability_threshold)
+        expected[name] = comparison.report()
+    return expected
+
+def close_enough(actual, expected):
+    if isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(close_enough(actual[k], expected[k]) for k in expected)
+    if isinstance(expected, float):
+        return abs(actual - expected) <= 1e-6
+    return actual == expected
+
+failures = 0
+with TestClient(main.app) as client:
+    # === 1. Identical candidate ===
+    report = send(client)
+    resume, event = report["models"]["resume"], report["models"]["event"]
+    ok = (report["scored"] == len(bodies) and report["queue"]["dropped"] == 0
+          and resume["agreement_rate"] == event["agreement_rate"] == 1.0
+          and resume["psi"] == event["psi"] == 0.0 and resume["max_abs_diff"] == event["max_abs_diff"] == 0.0)
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} identical candidate: {report['scored']}/{len(bodies)} requests shadow-scored in "
+          f"{report['batches']} batches, agreement {resume['agreement_rate']:.0%} / {event['agreement_rate']:.0%}, "
+          f"PSI {resume['psi']} / {event['psi']}")
+
+    # === 2. Shifted candidate ===
+    candidate = []
+    for name, shift in (("model_resume", 0.8), ("model_event", -0.6)):
+        scorer = LogisticScorer.load(os.path.join("models", name + ".json"))
+        scorer = LogisticScorer(scorer.coef * 1.1, scorer.intercept + shift, scorer.feature_names)
+        scorer.save(os.path.join(candidate_dir, name + ".json"))
+        candidate.append(scorer)
+    reload = client.post("/admin/shadow/reload")
+    report = send(client)
+    expected = expected_report(main.get_engine(), candidate)
+    ok = reload.status_code == 200 and report["scored"] == len(bodies) and close_enough(report["models"], expected)
+    failures += not ok
+    resume, event = report["models"]["resume"], report["models"]["event"]
+    print(f"{'✅' if ok else '❌'} shifted candidate matches direct scoring: agreement {resume['agreement_rate']:.1%} / "
+          f"{event['agreement_rate']:.1%}, PSI {resume['psi']:.3f} / {event['psi']:.3f}, "
+          f"mean |diff| {resume['mean_abs_diff']:.3f} / {event['mean_abs_diff']:.3f}")
+
+    shutil.rmtree(candidate_dir)
+    missing = client.post("/admin/shadow/reload")
+    candidate_info = client.get("/shadow").json()["candidate"]
+    ok = missing.status_code == 409 and candidate_info["load_error"] and candidate_info["fingerprint"] == report["candidate"]["fingerprint"]
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} reloading a missing candidate answers {missing.status_code} and keeps the last one loaded")
+
+# === 3. Overload ===
+logging.getLogger("engine.summary").disabled = True  # TestClient's startup turned logging on
+payloads = [EngagementRequest.parse_obj(body) for body in bodies]
+aggregates = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+engine = main.get_engine()
+shadow = ShadowEvaluator("models", main.get_engine, batch_size=10_000, max_queue=100, flush_seconds=60)
+started = time.perf_counter()
+for i in range(1000):
+    shadow.submit((payloads[i % len(payloads)],), (aggregates[i % len(payloads)],))
+submit_us = (time.perf_counter() - started) / 1000 * 1e6
+queued = shadow.stats()["queued"]
+shadow.close()
+started = time.perf_counter()
+for payload, peer in zip(payloads, aggregates):
+    engine.evaluate(payload, peer)
+evaluate_us = (time.perf_counter() - started) / len(payloads) * 1e6
+ok = queued == 100 and shadow.dropped == 900 and shadow.scored == 100
+failures += not ok
+print(f"{'✅' if ok else '❌'} a 100-request queue under 1,000 submits: {shadow.scored} scored, {shadow.dropped} dropped")
+print(f"⏱  submit() {submit_us:.2f} µs per request on the response path (evaluate() {evaluate_us:.1f} µs)")
+
+shutil.rmtree(tmp, ignore_errors=True)
+sys.exit(1 if failures else 0)
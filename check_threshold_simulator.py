@@ -0,0 +1,85 @@
+# checks threshold_simulator.py against the engine: for random candidate thresholds, the simulated
+# per-rule firing counts and fallbacks must equal what NudgeEngine.evaluate_many() returns with those
+# thresholds written into config.json, over every simulated profile against every peer snapshot.
+# Then times a 200-config sweep over 1M requests.
+import sys
+import copy
+import json
+import random
+import time
+from collections import Counter
+from datetime import date
+import numpy as np
+from engine import NudgeEngine, RULES, load_config, load_scorers
+from models import EngagementRequest
+from snapshot_registry import SnapshotRegistry
+from threshold_simulator import ThresholdSimulator, THRESHOLDS, thresholds_from_config
+
+AS_OF = date(2025, 7, 1)
+CANDIDATES = 20
+BENCH_ROWS = 1_000_000
+BENCH_CONFIGS = 200
+
+with open("simulated_profiles.json") as f:
+    users = json.load(f)
+with open("peer_snapshot.json") as f:
+    peers = json.load(f)
+for u in users:
+    u["activity"].pop("last_quiz_taken", None)
+# dated quizzes, so the quiz rule fires for some
+for i, u in enumerate(users[::7]):
+    u["profile"]["quiz_history"] = [(date.fromordinal(AS_OF.toordinal() - i % 30)).isoformat()]
+bodies = [{"user_data": u, "peer_snapshot": p} for p in peers for u in users]
+payloads = [EngagementRequest.parse_obj(body) for body in bodies]
+
+config = load_config()
+scorers = load_scorers()
+base = thresholds_from_config(config)
+simulator = ThresholdSimulator.from_bodies(NudgeEngine(config, *scorers), [bodies], SnapshotRegistry().resolve, base, AS_OF)
+
+def with_thresholds(config, thresholds):
+    config = copy.deepcopy(config)
+    for name, value in thresholds.items():
+        config[THRESHOLDS[name]][name] = value
+    return config
+
+rng = random.Random(3)
+candidates = [{}] + [{
+    "resume_threshold": rng.choice([0.6, 0.7, 0.75, 0.8, 0.9]),
+    "projects_avg_threshold": rng.choice([0.5, 1, 1.5, 2, 3]),
+    "event_fomo_threshold": rng.choice([0.3, 0.5, 0.6, 0.7, 0.9]),
+    "buddies_event_threshold": rng.choice([0, 1, 2, 3, 5]),
+    "event_peer_threshold": rng.choice([5, 8, 10, 12, 15]),
+    "quiz_inactive_days": rng.choice([0, 3, 7, 14, 30]),
+    "user_inactive_days": rng.choice([0, 5, 10, 30, 60]),
+    "nudge_probability_threshold": rng.choice([0.2, 0.4, 0.6, 0.8, 0.95])
+} for _ in range(CANDIDATES)]
+
+mismatches = 0
+for candidate in candidates:
+    engine = NudgeEngine(with_thresholds(config, candidate), *scorers)
+    counts = Counter(n.id for r in engine.evaluate_many(payloads, None, AS_OF) for n in r.nudges)
+    report = simulator.simulate(candidate)
+    expected = {name: counts[name] for name, _, _ in RULES}
+    if report["fired"] != expected or report["fallback_nudges"] != counts["fallback"]:
+        mismatches += 1
+        print(f"❌ {candidate}: simulated {report['fired']} + {report['fallback_nudges']} fallbacks, "
+              f"engine {expected} + {counts['fallback']} fallbacks")
+ok = mismatches == 0
+print(f"{'✅' if ok else '❌'} {len(candidates)} configs x {len(payloads):,} requests: {mismatches} differ from the engine")
+
+# Sweep timing on the corpus repeated to BENCH_ROWS
+reps = -(-BENCH_ROWS // simulator.rows)
+bench = ThresholdSimulator({name: np.tile(values, reps)[:BENCH_ROWS] for name, values in simulator.columns.items()}, base)
+sweep = [{
+    "resume_threshold": rng.uniform(0.5, 0.95),
+    "quiz_inactive_days": rng.randint(0, 30),
+    "nudge_probability_threshold": rng.uniform(0.3, 0.9)
+} for _ in range(BENCH_CONFIGS)]
+started = time.perf_counter()
+bench.sweep(sweep)
+elapsed = time.perf_counter() - started
+print(f"⏱  {BENCH_CONFIGS} configs x {BENCH_ROWS:,} requests simulated in {elapsed:.2f}s "
+      f"({elapsed / BENCH_CONFIGS * 1000:.1f} ms/config)")
+
+sys.exit(0 if ok else 1)
@@ -0,0 +1,129 @@
+# checks top-K nudge targeting (nudge_targeting.py) against full sorts, and times it:
+#   1. TopK, fed chunk by chunk, against a stable full sort on scores with many ties and NaNs
+#   2. NudgeEngine.target_scores() against the engine's per-row model scoring
+#   3. CohortRanker, with goal_tags / clubs_joined filters, against ranking every user by full sort
+#   4. streaming selection vs a full sort on 10M scores, and end-to-end ranking throughput
+import sys
+import json
+import time
+from datetime import date
+import numpy as np
+from engine import NudgeEngine, RequestInputs, load_config, load_scorers, TARGET_SCORES
+from models import EngagementRequest, PeerSnapshot
+from nudge_targeting import TopK, CohortRanker, CHUNK_SIZE
+from snapshot_registry import SnapshotRegistry
+
+AS_OF = date(2025, 7, 1)
+BENCH_SCORES = 10_000_000
+BENCH_K = 5_000
+
+def expected_top(scores, user_ids, k):
+    order = [i for i in np.argsort(-scores, kind="stable") if not np.isnan(scores[i])][:k]
+    return [(user_ids[i], float(scores[i])) for i in order]
+
+def push_chunks(top, scores, user_ids, chunk):
+    ids = np.array(user_ids, dtype=object)
+    for start in range(0, len(scores), chunk):
+        end = start + chunk
+        top.push(scores[start:end], np.arange(start, min(end, len(scores))), ids[start:end])
+
+failures = 0
+
+# === 1. TopK ===
+rng = np.random.default_rng(0)
+cases = 0
+for n, k, chunk in [(1000, 1, 64), (1000, 10, 7), (5000, 500, 256), (5000, 5000, 999), (300, 1000, 50), (10_000, 2048, 4096)]:
+    scores = rng.integers(0, 40, size=n) / 40  # plenty of ties at the cut
+    scores[rng.random(n) < 0.05] = np.nan
+    user_ids = [f"u{i}" for i in range(n)]
+    top = TopK(k)
+    push_chunks(top, scores, user_ids, chunk)
+    cases += 1
+    if top.ranked() != expected_top(scores, user_ids, k):
+        failures += 1
+        print(f"❌ TopK n={n} k={k} chunk={chunk} differs from a full sort")
+print(f"{'✅' if not failures else '❌'} TopK matches a stable full sort in {cases} cases (ties, NaNs, k > n)")
+
+# === 2. target_scores vs per-row scoring ===
+with open("simulated_profiles.json") as f:
+    users = json.load(f)
+with open("peer_snapshot.json") as f:
+    peer_snapshots = json.load(f)
+for u in users:
+    u["activity"].pop("last_quiz_taken", None)
+registry = SnapshotRegistry()
+for i, snapshot in enumerate(peer_snapshots):
+    registry.put(str(i), PeerSnapshot.parse_obj(snapshot))
+bodies = [{"user_data": u, "batch_id": str(i % len(peer_snapshots))} for i, u in enumerate(users)]
+payloads = [EngagementRequest.parse_obj(body) for body in bodies]
+peers = [registry.resolve(p) for p in payloads]
+engine = NudgeEngine(load_config(), *load_scorers())
+scores = engine.target_scores(payloads, peers, AS_OF)
+
+score_mismatches = 0
+for i, (payload, peer) in enumerate(zip(payloads, peers)):
+    x = RequestInputs(payload.user_data.profile, payload.user_data.activity, peer, engine, AS_OF.toordinal())
+    features = x.features()
+    expected = {
+        "ml_resume": engine.resume_scorer.predict_proba_row(features),
+        "ml_event": engine.event_scorer.predict_proba_row(features),
+        "event_fomo": x.fomo_score()
+    }
+    score_mismatches += sum(abs(scores[name][i] - expected[name]) > 1e-12 for name in TARGET_SCORES)
+ok = score_mismatches == 0
+failures += not ok
+print(f"{'✅' if ok else '❌'} target_scores() for {len(payloads):,} users: {score_mismatches} differences from per-row scoring")
+
+# === 3. CohortRanker with filters ===
+user_ids = [p.user_data.user_id for p in payloads]
+filters = [(None, None), (["GRE"], None), (None, ["coding", "ml-club"]), (["AI", "web development"], ["coding"])]
+for goal_tags, clubs in filters:
+    ranker = CohortRanker(engine, 50, registry.resolve, TARGET_SCORES, goal_tags, clubs, AS_OF)
+    for start in range(0, len(bodies), 333):
+        ranker.add(bodies[start:start + 333] + ([{"user_data": {"user_id": "broken"}}] if start == 0 else []))
+    keep = np.array([
+        (not goal_tags or bool(set(goal_tags) & set(p.user_data.profile.goal_tags)))
+        and (not clubs or bool(set(clubs) & set(p.user_data.profile.clubs_joined)))
+        for p in payloads
+    ])
+    result = ranker.result()
+    for name in TARGET_SCORES:
+        expected = expected_top(np.where(keep, scores[name], np.nan), user_ids, 50)
+        # positions shift by one after the broken body, but relative order is unchanged
+        if [(r["user_id"], r["score"]) for r in result["top"][name]] != expected:
+            failures += 1
+            print(f"❌ CohortRanker goal_tags={goal_tags} clubs={clubs} {name} differs from a full sort")
+    if result["users_matched"] != int(keep.sum()) or result["users_invalid"] != 1:
+        failures += 1
+        print(f"❌ CohortRanker counts {result['users_matched']} matched / {result['users_invalid']} invalid, "
+              f"expected {int(keep.sum())} / 1")
+print(f"{'✅' if not failures else '❌'} CohortRanker top-50 matches a full sort for {len(filters)} filter sets")
+
+# === 4. Timings ===
+bench = rng.random(BENCH_SCORES)
+started = time.perf_counter()
+np.argsort(-bench, kind="stable")[:BENCH_K]
+full_sort = time.perf_counter() - started
+top = TopK(BENCH_K)
+ids = np.arange(BENCH_SCORES).astype(object)
+positions = np.arange(BENCH_SCORES)
+started = time.perf_counter()
+for start in range(0, BENCH_SCORES, CHUNK_SIZE):
+    end = start + CHUNK_SIZE
+    top.push(bench[start:end], positions[start:end], ids[start:end])
+top.ranked()
+streamed = time.perf_counter() - started
+print(f"⏱  top-{BENCH_K:,} of {BENCH_SCORES:,} scores: full sort {full_sort:.2f}s (all scores in memory), "
+      f"streamed in {CHUNK_SIZE:,}-score chunks {streamed:.2f}s (holds {BENCH_K + CHUNK_SIZE:,})")
+
+repeat = 50
+ranker = CohortRanker(engine, BENCH_K, registry.resolve, TARGET_SCORES, as_of=AS_OF)
+started = time.perf_counter()
+for _ in range(repeat):
+    for start in range(0, len(bodies), CHUNK_SIZE):
+        ranker.add(bodies[start:start + CHUNK_SIZE])
+elapsed = time.perf_counter() - started
+print(f"⏱  {ranker.received:,} request bodies ranked for {len(TARGET_SCORES)} nudges in {elapsed:.2f}s "
+      f"({ranker.received / elapsed:,.0f} users/sec)")
+
+sys.exit(1 if failures else 0)
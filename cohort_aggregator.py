@@ -0,0 +1,204 @@
+import itertools
+import threading
+from collections import Counter
+from models import PeerSnapshot
+from snapshot_registry import PeerAggregates
+
+# Per-batch running totals; the peer snapshot fields are derived from them on demand
+class _BatchTotals:
+    __slots__ = ("members", "projects", "resumes", "attendance", "version", "peer")
+
+    def __init__(self):
+        self.members = 0
+        self.projects = 0
+        self.resumes = 0
+        self.attendance = Counter()  # event -> members of the batch who attended it
+        self.version = 0
+        self.peer = None  # PeerAggregates for the current version, built on first read
+
+# Peer snapshots maintained from raw student profiles and event attendance, instead of being
+# computed by the caller before every request.
+#   - each batch keeps running member/project/resume counts and per-event attendance counts,
+#     adjusted by the difference whenever a member is added, changed, moved or removed
+#   - each user keeps a count of their buddies attending every event, updated through an index from
+#     a buddy to the users who list them whenever that buddy's attendance or a buddy list changes
+#   - peer(user_id) is a dictionary lookup: the batch's PeerAggregates are built once per version
+#     and shared, only buddies_attending_events is per user
+# Versions come from one counter: a batch's moves on every change to its totals, a user's on every
+# change to their buddies' events, and a user's peer carries the larger of the two, so response
+# caches keyed on (batch_id, version) stay correct. State is held in memory, per process.
+class CohortAggregator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batches = {}         # batch_id -> _BatchTotals
+        self._members = {}         # user_id -> (batch_id, projects_added, resume_uploaded)
+        self._events = {}          # user_id -> set of events attended
+        self._buddies = {}         # user_id -> set of buddy user_ids
+        self._listed_by = {}       # buddy user_id -> set of user_ids whose buddy list has them
+        self._buddy_events = {}    # user_id -> Counter(event -> buddies attending it)
+        self._user_versions = {}   # user_id -> version of their buddy events
+        self._versions = itertools.count(1)
+
+    # ---------------- UPDATES ----------------
+    # Adds or replaces a member's profile (a models.Profile or a dict with projects_added and
+    # resume_uploaded); buddies, if given, replaces their buddy list
+    def upsert_member(self, user_id, batch_id, profile, buddies=None):
+        projects, resume = _get(profile, "projects_added"), bool(_get(profile, "resume_uploaded"))
+        with self._lock:
+            previous = self._members.get(user_id)
+            if previous != (batch_id, projects, resume):
+                if previous is not None:
+                    self._leave(user_id, *previous)
+                batch = self._batches.get(batch_id)
+                if batch is None:
+                    batch = self._batches[batch_id] = _BatchTotals()
+                batch.members += 1
+                batch.projects += projects
+                batch.resumes += resume
+                batch.attendance.update(self._events.get(user_id, ()))
+                self._members[user_id] = (batch_id, projects, resume)
+                self._touch(batch)
+            if buddies is not None:
+                self._set_buddies(user_id, set(buddies))
+
+    def remove_member(self, user_id):
+        with self._lock:
+            previous = self._members.pop(user_id, None)
+            if previous is None:
+                raise KeyError(user_id)
+            self._leave(user_id, *previous)
+            self._set_buddies(user_id, set())
+
+    # Records that user_id attended (or, with attended=False, did not attend) event
+    def record_attendance(self, user_id, event, attended=True):
+        with self._lock:
+            events = self._events.setdefault(user_id, set())
+            if (event in events) == attended:
+                return
+            step = 1 if attended else -1
+            if attended:
+                events.add(event)
+            else:
+                events.discard(event)
+            member = self._members.get(user_id)
+            if member is not None:
+                batch = self._batches[member[0]]
+                _add(batch.attendance, event, step)
+                self._touch(batch)
+            for listing_user in self._listed_by.get(user_id, ()):
+                _add(self._buddy_events.setdefault(listing_user, Counter()), event, step)
+                self._user_versions[listing_user] = next(self._versions)
+
+    def set_buddies(self, user_id, buddies):
+        with self._lock:
+            self._set_buddies(user_id, set(buddies))
+
+    def _set_buddies(self, user_id, buddies):
+        buddies.discard(user_id)
+        current = self._buddies.get(user_id, set())
+        if buddies == current:
+            return
+        counts = self._buddy_events.setdefault(user_id, Counter())
+        for buddy, step in [(b, -1) for b in current - buddies] + [(b, 1) for b in buddies - current]:
+            listed_by = self._listed_by.setdefault(buddy, set())
+            if step > 0:
+                listed_by.add(user_id)
+            else:
+                listed_by.discard(user_id)
+                if not listed_by:
+                    del self._listed_by[buddy]
+            for event in self._events.get(buddy, ()):
+                _add(counts, event, step)
+        if buddies:
+            self._buddies[user_id] = buddies
+        else:
+            self._buddies.pop(user_id, None)
+            self._buddy_events.pop(user_id, None)
+        self._user_versions[user_id] = next(self._versions)
+
+    def _leave(self, user_id, batch_id, projects, resume):
+        batch = self._batches[batch_id]
+        batch.members -= 1
+        batch.projects -= projects
+        batch.resumes -= resume
+        for event in self._events.get(user_id, ()):
+            _add(batch.attendance, event, -1)
+        if batch.members == 0:
+            del self._batches[batch_id]
+        else:
+            self._touch(batch)
+
+    def _touch(self, batch):
+        batch.version = next(self._versions)
+        batch.peer = None
+
+    # ---------------- READS ----------------
+    # PeerAggregates of batch_id (default: the user's own batch) with the user's
+    # buddies_attending_events; KeyError for an unknown batch, or a non-member without batch_id
+    def peer(self, user_id, batch_id=None):
+        if batch_id is None:
+            batch_id = self._members[user_id][0]
+        base = self.batch_peer(batch_id)
+        with self._lock:
+            user_version = self._user_versions.get(user_id)
+            if user_version is None:
+                return base
+            counts = self._buddy_events.get(user_id)
+            buddies_attending_events = sorted(counts) if counts else []
+        return base.with_buddies(buddies_attending_events, max(base.version, user_version))
+
+    # PeerAggregates shared by every member of the batch (buddies_attending_events empty); KeyError if unknown
+    def batch_peer(self, batch_id):
+        batch = self._batches[batch_id]
+        peer = batch.peer
+        if peer is None:
+            with self._lock:
+                peer = batch.peer
+                if peer is None:
+                    snapshot = PeerSnapshot(
+                        batch_avg_projects=batch.projects / batch.members,
+                        batch_resume_uploaded_pct=100 * batch.resumes / batch.members,
+                        batch_event_attendance=dict(sorted(batch.attendance.items())),
+                        buddies_attending_events=[]
+                    )
+                    peer = batch.peer = PeerAggregates(snapshot, batch_id=batch_id, version=batch.version, source="cohort")
+        return peer
+
+    # Peer aggregates for a request naming a cohort by batch_id; None if no such cohort
+    def resolve(self, payload):
+        if payload.batch_id not in self._batches:
+            return None
+        try:
+            return self.peer(payload.user_data.user_id, payload.batch_id)
+        except KeyError:  # the batch's last member was removed meanwhile
+            return None
+
+    def stats(self):
+        return {
+            batch_id: {"members": batch.members, "version": batch.version}
+            for batch_id, batch in list(self._batches.items())
+        }
+
+    # Rebuilds from scratch, e.g. from simulated_profiles.json-style records:
+    # {"user_id", "batch_id", "profile", "buddies"?, "events_attended"?}; a record without batch_id
+    # only records attendance (someone's buddy outside every cohort)
+    @classmethod
+    def from_records(cls, records):
+        aggregator = cls()
+        for record in records:
+            for event in record.get("events_attended", ()):
+                aggregator.record_attendance(record["user_id"], event)
+        for record in records:
+            if "batch_id" in record:
+                aggregator.upsert_member(record["user_id"], record["batch_id"], record["profile"], record.get("buddies"))
+        return aggregator
+
+def _get(profile, field):
+    return profile[field] if isinstance(profile, dict) else getattr(profile, field)
+
+def _add(counter, key, step):
+    count = counter[key] + step
+    if count:
+        counter[key] = count
+    else:
+        del counter[key]
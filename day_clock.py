@@ -0,0 +1,39 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+# The "as of" day every day-count rule (quiz, comeback, FOMO) measures from.
+# Days are carried as integer day ordinals (date.toordinal()): a request's dates become ordinals
+# once, and everything after that is integer subtraction. The engine reads its clock once per
+# request (or once per batch); pass a fixed as-of day instead to re-score a historical snapshot,
+# and the answer is the same on any day it runs.
+
+# The default clock: today's local date
+def today_ordinal():
+    return date.today().toordinal()
+
+# A clock that always returns the same day; for tests and backfills
+def fixed_clock(as_of):
+    ordinal = to_ordinal(as_of)
+    return lambda: ordinal
+
+# "YYYY-MM-DD" -> day ordinal, or None if it doesn't parse.
+# Cached: the same quiz and event dates recur across users and requests.
+@lru_cache(maxsize=4096)
+def parse_date_ordinal(text):
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return None
+
+# A date, datetime, "YYYY-MM-DD" string or day ordinal -> day ordinal
+def to_ordinal(value):
+    if isinstance(value, date):  # datetime too; its time of day is ignored
+        return value.toordinal()
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        ordinal = parse_date_ordinal(value)
+        if ordinal is None:
+            raise ValueError(f"Expected a YYYY-MM-DD date, got {value!r}")
+        return ordinal
+    raise TypeError(f"Expected a date, YYYY-MM-DD string or day ordinal, got {type(value).__name__}")
@@ -0,0 +1,611 @@
+from nudge_catalogue import NudgeCatalogue, NudgeRef, EngagementResult
+from logistic_scorer import LogisticScorer, compile_scorer
+from snapshot_registry import PeerAggregates
+from metrics import NULL_METRICS
+from day_clock import today_ordinal, to_ordinal, parse_date_ordinal
+from event_fomo_score import (
+    event_fomo_score, fomo_score_from_components,
+    fomo_level, fomo_recommendation_keys, DEFAULT_DAYS_SINCE_EVENT
+)
+import json
+import os
+import numpy as np
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+# One JSON record per scored request, sampled via logging.summary_sample_rate
+summary_logger = logging.getLogger("engine.summary")
+
+CONFIG_PATH = os.environ.get("ENGAGEMENT_CONFIG", os.path.join(os.path.dirname(__file__), "config.json"))
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
+MODEL_NAMES = ("model_resume", "model_event")
+# Inputs model_features() provides; a model may use any subset of them
+MODEL_FEATURES = ("resume_uploaded", "karma", "projects_added", "batch_resume_uploaded_pct", "event_fomo_score")
+# "json": compact artifacts exported by train_model.py, "pickle": the fitted sklearn estimators
+MODEL_EXTENSIONS = {"json": ".json", "pickle": ".pkl"}
+
+def load_config(path=CONFIG_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def load_models(model_dir=MODEL_DIR):
+    import joblib  # deferred: unpickling the estimators imports all of scikit-learn
+    model_resume = joblib.load(os.path.join(model_dir, "model_resume.pkl"))
+    model_event = joblib.load(os.path.join(model_dir, "model_event.pkl"))
+    return model_resume, model_event
+
+# Resume and event models as scorers; the "json" format never imports sklearn
+def load_scorers(model_dir=MODEL_DIR, model_format="json"):
+    if model_format == "json":
+        return tuple(LogisticScorer.load(path) for path in model_paths(model_dir, model_format))
+    if model_format == "pickle":
+        return tuple(compile_scorer(model) for model in load_models(model_dir))
+    raise ValueError(f"Unknown model format: {model_format!r}")
+
+def model_paths(model_dir=MODEL_DIR, model_format="json"):
+    if model_format not in MODEL_EXTENSIONS:
+        raise ValueError(f"Unknown model format: {model_format!r}")
+    return tuple(os.path.join(model_dir, name + MODEL_EXTENSIONS[model_format]) for name in MODEL_NAMES)
+
+# Files an engine is built from; anything caching engine output should watch these
+def source_paths(config_path=CONFIG_PATH, model_dir=MODEL_DIR, model_format="json"):
+    return (config_path,) + model_paths(model_dir, model_format)
+
+# Latest dated quiz as a day ordinal; None if there is none or a date fails to parse
+def _last_quiz_ordinal(quiz_history):
+    last = None
+    for q in quiz_history:
+        if '-' in q:
+            ordinal = parse_date_ordinal(q)
+            if ordinal is None:
+                logger.warning("Quiz date parse failed: %r", q)
+                return None
+            if last is None or ordinal > last:
+                last = ordinal
+    return last
+
+# ---------------- RULE SCHEDULE ----------------
+# Rules in output priority order: (name, metrics stage, derived inputs the rule reads).
+# Only the first MAX_NUDGES nudges are returned, so rules run in this order and stop once that many
+# have fired: no later rule can change the response. Running them cheapest-first instead would not
+# skip anything more (a rule can only be dropped once higher-priority rules have filled the
+# response), so cost is handled by the inputs: RequestInputs derives each one on first use, once per
+# request, and never for a request that stops before a rule needs it.
+RULES = (
+    ("resume", "rules", ()),
+    ("project", "rules", ()),
+    ("buddies_event", "rules", ()),
+    ("peer_event", "rules", ()),
+    ("quiz", "rules", ("quiz_days",)),
+    ("comeback", "rules", ("event_days",)),
+    ("event_fomo", "fomo", ("event_days", "fomo_days", "fomo_score")),
+    ("ml_resume", "ml_resume", ("features",)),
+    ("ml_event", "ml_event", ("features",))
+)
+RULE_STAGES = ("rules", "fomo", "ml_resume", "ml_event")
+MAX_NUDGES = 3
+# Below this many requests evaluate_many() scores them one by one: building the columns and model
+# matrices costs more than it saves (about break-even at 48 requests)
+COLUMNAR_MIN_BATCH = 48
+# Nudges NudgeEngine.target_scores() scores every request for
+TARGET_SCORES = ("ml_resume", "ml_event", "event_fomo")
+
+_UNSET = object()
+
+# Values derived from one request, each computed the first time a rule asks for it
+class RequestInputs:
+    __slots__ = ("profile", "activity", "peer", "engine", "ml_probs",
+                 "_today", "_event_days", "_quiz_days", "_fomo_score", "_features")
+
+    # today: the as-of day ordinal; read from the engine's clock on first use if None
+    def __init__(self, profile, activity, peer, engine, today=None):
+        self.profile = profile
+        self.activity = activity
+        self.peer = peer
+        self.engine = engine
+        self.ml_probs = {}
+        self._event_days = self._quiz_days = self._fomo_score = self._features = _UNSET
+        self._today = _UNSET if today is None else today
+
+    def today(self):
+        if self._today is _UNSET:
+            self._today = self.engine.as_of_clock()
+        return self._today
+
+    # Days since last_event_attended; None without one
+    def event_days(self):
+        if self._event_days is _UNSET:
+            last_event = self.activity.last_event_attended
+            self._event_days = self.today() - last_event.toordinal() if last_event else None
+        return self._event_days
+
+    # Days since the last event as the FOMO score counts them
+    def fomo_days(self):
+        days = self.event_days()
+        return DEFAULT_DAYS_SINCE_EVENT if days is None else days
+
+    # Days since the latest dated quiz; None if there is none or a date fails to parse
+    def quiz_days(self):
+        if self._quiz_days is _UNSET:
+            ordinal = _last_quiz_ordinal(self.profile.quiz_history)
+            self._quiz_days = None if ordinal is None else self.today() - ordinal
+        return self._quiz_days
+
+    def fomo_score(self):
+        if self._fomo_score is _UNSET:
+            self._fomo_score = event_fomo_score(
+                self.profile.buddy_count, self.peer.buddies_attending, self.peer.batch_score, self.fomo_days()
+            )
+        return self._fomo_score
+
+    # Feature row shared by both ML models
+    def features(self):
+        if self._features is _UNSET:
+            self._features = self.engine.model_features(self.profile, self.peer, self.fomo_score())
+        return self._features
+
+# Nudges without params are the same object in every response
+PROJECT_NUDGE = NudgeRef("project")
+BUDDIES_EVENT_NUDGE = NudgeRef("buddies_event")
+PEER_EVENT_NUDGE = NudgeRef("peer_event")
+QUIZ_NUDGE = NudgeRef("quiz")
+COMEBACK_NUDGE = NudgeRef("comeback")
+ML_RESUME_NUDGE = NudgeRef("ml_resume")
+ML_EVENT_NUDGE = NudgeRef("ml_event")
+FALLBACK_NUDGE = NudgeRef("fallback")
+ERROR_NUDGE = NudgeRef("error")
+
+# Rule + ML nudge engine with no web framework attached.
+# Everything read from config.json and the models is compiled into plain attributes once,
+# so evaluate()/evaluate_many() never walk the config dict on the hot path.
+class NudgeEngine:
+    # metrics: a metrics.Metrics to record stage timings and rule counters into (no-op by default)
+    # as_of_clock: returns the day ordinal the day-count rules measure from (today by default;
+    # day_clock.fixed_clock() pins it). Read once per request or batch unless as_of is passed.
+    def __init__(self, config, model_resume, model_event, metrics=NULL_METRICS, as_of_clock=today_ordinal):
+        self.metrics = metrics
+        self.as_of_clock = as_of_clock
+        profile_rules = config["profile_rules"]
+        engagement_rules = config["engagement_rules"]
+
+        # === Thresholds ===
+        self.resume_threshold_pct = profile_rules["resume_threshold"] * 100
+        self.projects_avg_threshold = profile_rules["projects_avg_threshold"]
+        self.event_fomo_threshold = profile_rules["event_fomo_threshold"]
+        self.buddies_event_threshold = engagement_rules["buddies_event_threshold"]
+        self.event_peer_threshold = engagement_rules["event_peer_threshold"]
+        self.quiz_inactive_days = engagement_rules["quiz_inactive_days"]
+        self.user_inactive_days = engagement_rules["user_inactive_days"]
+        self.nudge_probability_threshold = config["ml_rules"]["nudge_probability_threshold"]
+        self.summary_sample_rate = config.get("logging", {}).get("summary_sample_rate", 1.0)
+
+        # === Nudge texts and priorities, rendered from responses at serialization ===
+        self.catalogue = NudgeCatalogue.from_config(config)
+
+        # === Rule schedule: (name, stage, input getters, rule method) ===
+        self.rules = tuple(
+            (name, stage, tuple(getattr(RequestInputs, i) for i in inputs), getattr(self, "_rule_" + name))
+            for name, stage, inputs in RULES
+        )
+
+        # === Models, compiled to plain NumPy scorers (sklearn kept on .estimator) ===
+        # Already-compiled scorers (see load_scorers) are used as they are
+        self.model_resume = model_resume
+        self.model_event = model_event
+        self.resume_scorer = compile_scorer(model_resume)
+        self.event_scorer = compile_scorer(model_event)
+        self.resume_columns = self.resume_scorer.feature_names
+        self.event_columns = self.event_scorer.feature_names
+        for name, columns in (("resume", self.resume_columns), ("event", self.event_columns)):
+            unknown = set(columns) - set(MODEL_FEATURES)
+            if unknown:
+                raise ValueError(f"{name} model expects features the engine does not provide: {sorted(unknown)}")
+        if not 0 <= self.nudge_probability_threshold <= 1:
+            raise ValueError(f"nudge_probability_threshold must be within [0, 1], got {self.nudge_probability_threshold}")
+
+    @classmethod
+    def from_files(cls, config_path=CONFIG_PATH, model_dir=MODEL_DIR, metrics=NULL_METRICS, as_of_clock=today_ordinal):
+        return cls(load_config(config_path), *load_models(model_dir), metrics=metrics, as_of_clock=as_of_clock)
+
+    # ---------------- NUDGES ----------------
+    # Nudges are catalogue IDs plus params (see nudge_catalogue.py); text is rendered at serialization
+    def resume_nudge(self, batch_resume_uploaded_pct):
+        return NudgeRef("resume", {"pct": batch_resume_uploaded_pct})
+
+    def project_nudge(self):
+        return PROJECT_NUDGE
+
+    def buddies_event_nudge(self):
+        return BUDDIES_EVENT_NUDGE
+
+    def peer_event_nudge(self):
+        return PEER_EVENT_NUDGE
+
+    def quiz_nudge(self):
+        return QUIZ_NUDGE
+
+    def comeback_nudge(self):
+        return COMEBACK_NUDGE
+
+    def fomo_nudge(self, level, recommendation_keys, buddies_attending_events):
+        return NudgeRef("event_fomo", {
+            "level": level,
+            "recommendations": recommendation_keys,
+            "events": buddies_attending_events
+        })
+
+    def ml_resume_nudge(self):
+        return ML_RESUME_NUDGE
+
+    def ml_event_nudge(self):
+        return ML_EVENT_NUDGE
+
+    def fallback_nudge(self):
+        return FALLBACK_NUDGE
+
+    def error_response(self, user_id):
+        return EngagementResult(user_id=user_id, nudges=[ERROR_NUDGE], status="generated")
+
+    # Feature row for both ML models; each model picks its columns in its own order
+    @staticmethod
+    def model_features(profile, peer, fomo_score):
+        return {
+            "resume_uploaded": int(profile.resume_uploaded),
+            "karma": profile.karma,
+            "projects_added": profile.projects_added,
+            "batch_resume_uploaded_pct": peer.batch_resume_uploaded_pct,
+            "event_fomo_score": fomo_score
+        }
+
+    # ---------------- AUDIT SUMMARY ----------------
+    def summary_sampled(self):
+        if self.summary_sample_rate <= 0 or not summary_logger.isEnabledFor(logging.INFO):
+            return False
+        return self.summary_sample_rate >= 1 or random.random() < self.summary_sample_rate
+
+    # One structured record per request in place of per-rule log lines; the dict is only
+    # JSON-encoded by the log handler (on the listener thread in queue mode)
+    def log_summary(self, user_id, fired, fallbacks, ml_probs, started, force=False, **extra):
+        if not force and not self.summary_sampled():
+            return
+        summary_logger.info("engagement_summary", extra={"summary": {
+            "user_id": user_id,
+            "rules_fired": fired,
+            "fallback_nudges": fallbacks,
+            "ml_probs": ml_probs,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            **extra
+        }})
+
+    # ---------------- RULES ----------------
+    # One method per RULES entry: takes the RequestInputs and the derived inputs the entry names,
+    # returns a nudge or None
+    def _rule_resume(self, x):
+        if not x.profile.resume_uploaded and x.peer.batch_resume_uploaded_pct > self.resume_threshold_pct:
+            return self.resume_nudge(x.peer.batch_resume_uploaded_pct)
+
+    def _rule_project(self, x):
+        if x.profile.projects_added == 0 and x.peer.batch_avg_projects >= self.projects_avg_threshold:
+            return self.project_nudge()
+
+    def _rule_buddies_event(self, x):
+        if x.peer.buddies_attending >= self.buddies_event_threshold:
+            return self.buddies_event_nudge()
+
+    def _rule_peer_event(self, x):
+        if x.peer.max_attendance >= self.event_peer_threshold:
+            return self.peer_event_nudge()
+
+    # quiz_history entries with dates only
+    def _rule_quiz(self, x, quiz_days):
+        if quiz_days is not None and quiz_days > self.quiz_inactive_days:
+            return self.quiz_nudge()
+
+    def _rule_comeback(self, x, event_days):
+        if event_days is not None and event_days > self.user_inactive_days:
+            return self.comeback_nudge()
+
+    # Same score as get_event_fomo_insights; the score counts a missing last event as 999 days,
+    # the inactivity check as 0
+    def _rule_event_fomo(self, x, event_days, fomo_days, fomo_score):
+        if fomo_score >= self.event_fomo_threshold or (event_days or 0) > 30:
+            events = x.peer.buddies_attending_events
+            keys = fomo_recommendation_keys(fomo_score, fomo_days, events)
+            return self.fomo_nudge(fomo_level(fomo_score), keys, events)
+
+    def _rule_ml_resume(self, x, features):
+        return self._ml_rule(x, "ml_resume", "Resume", self.resume_scorer, features, self.ml_resume_nudge)
+
+    def _rule_ml_event(self, x, features):
+        return self._ml_rule(x, "ml_event", "Event", self.event_scorer, features, self.ml_event_nudge)
+
+    def _ml_rule(self, x, rule, name, scorer, features, build):
+        try:
+            prob = x.ml_probs[rule] = scorer.predict_proba_row(features)
+        except Exception as e:
+            logger.error("%s ML model failed: %s", name, e)
+            return None
+        if prob >= self.nudge_probability_threshold:
+            return build()
+
+    # ---------------- SINGLE REQUEST ----------------
+    # Runs the rules in priority order until MAX_NUDGES have fired. Returns the nudges, the rules
+    # that fired and how many rules ran; with `marks`, also records clock() after each stage.
+    def run_rules(self, x, marks=None):
+        nudges = []
+        fired = []
+        evaluated = 0
+        for name, stage, getters, check in self.rules:
+            if len(nudges) >= MAX_NUDGES:
+                break
+            nudge = check(x, *[get(x) for get in getters]) if getters else check(x)
+            if nudge is not None:
+                fired.append(name)
+                nudges.append(nudge)
+            evaluated += 1
+            if marks is not None:
+                marks[stage] = self.metrics.clock()
+        return nudges, fired, evaluated
+
+    # peer: precomputed PeerAggregates (e.g. from a SnapshotRegistry); built from payload.peer_snapshot if omitted
+    # as_of: date, "YYYY-MM-DD" or day ordinal to score as of; the engine's as_of_clock if omitted
+    def evaluate(self, payload, peer=None, as_of=None):
+        today = None if as_of is None else to_ordinal(as_of)
+        clock = self.metrics.clock  # returns 0.0 without reading the clock when metrics are off
+        try:
+            started = time.perf_counter()
+            t_start = clock()
+            user = payload.user_data
+            if peer is None:
+                peer = PeerAggregates.from_snapshot(payload.peer_snapshot)
+            x = RequestInputs(user.profile, user.activity, peer, self, today)
+            t_peer = clock()
+
+            marks = {} if self.metrics.enabled else None
+            nudges, fired, evaluated = self.run_rules(x, marks)
+
+            # === FALLBACK if nudges < 3 ===
+            fallbacks = max(MAX_NUDGES - len(nudges), 0)
+            nudges.extend(self.fallback_nudge() for _ in range(fallbacks))
+
+            if marks is not None:
+                stages = [("peer", t_start, t_peer)]
+                begin = t_peer
+                for stage in RULE_STAGES:
+                    end = marks.get(stage, begin)  # a stage the schedule stopped before took no time
+                    stages.append((stage, begin, end))
+                    begin = end
+                stages.append(("evaluate", t_start, clock()))
+                self._record_request(fired, fallbacks, evaluated, stages)
+
+            self.log_summary(user.user_id, fired, fallbacks, x.ml_probs, started)
+            return EngagementResult(user.user_id, nudges, "generated")
+
+        except Exception as e:
+            logger.exception("Unexpected failure for user %s: %s", payload.user_data.user_id, e)
+            self.metrics.inc("engine_error_fallback_total")
+            return self.error_response(payload.user_data.user_id)
+
+    # Stage latencies and rule counters for one evaluate() call, recorded in one place
+    def _record_request(self, fired, fallbacks, evaluated, stages):
+        metrics = self.metrics
+        for stage, begin, end in stages:
+            metrics.observe("engine_stage_seconds", end - begin, stage=stage)
+        for rule in fired:
+            metrics.inc("engine_nudges_fired_total", rule=rule)
+        for name, _, _, _ in self.rules[evaluated:]:
+            metrics.inc("engine_rules_skipped_total", rule=name)
+            if name.startswith("ml_"):
+                metrics.inc("engine_ml_skipped_total", model=name[len("ml_"):])
+        if fallbacks:
+            metrics.inc("engine_fallback_nudges_total", fallbacks)
+
+    # ---------------- MANY REQUESTS ----------------
+    # Scores a list of requests column-wise; falls back to evaluate() per item if that fails.
+    # peers: optional PeerAggregates per payload, same length as payloads
+    # as_of: as for evaluate(); the clock is read once, so the whole batch is scored as of one day
+    def evaluate_many(self, payloads, peers=None, as_of=None):
+        today = self.as_of_clock() if as_of is None else to_ordinal(as_of)
+        if peers is None:
+            peers = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+        if len(payloads) < COLUMNAR_MIN_BATCH:
+            return [self.evaluate(payload, peer, today) for payload, peer in zip(payloads, peers)]
+        try:
+            return self._evaluate_columns(payloads, peers, today)
+        except Exception as e:
+            logger.exception("Batch scoring failed, scoring %d users one by one: %s", len(payloads), e)
+            return [self.evaluate(payload, peer, today) for payload, peer in zip(payloads, peers)]
+
+    # Per-request inputs as columns: every MODEL_FEATURES column (float64), plus buddies_attending,
+    # has_event, event_days and fomo_days for the day-count and FOMO rules
+    def _input_columns(self, payloads, peers, today):
+        n = len(payloads)
+        profiles = [p.user_data.profile for p in payloads]
+        activities = [p.user_data.activity for p in payloads]
+        buddy_count = np.fromiter((p.buddy_count for p in profiles), dtype=np.float64, count=n)
+        buddies_attending = np.fromiter((p.buddies_attending for p in peers), dtype=np.float64, count=n)
+        batch_scores = np.fromiter((p.batch_score for p in peers), dtype=np.float64, count=n)
+        has_event = np.fromiter((bool(a.last_event_attended) for a in activities), dtype=bool, count=n)
+        event_days = today - np.fromiter(
+            (a.last_event_attended.toordinal() if a.last_event_attended else today for a in activities),
+            dtype=np.int64, count=n
+        )
+        fomo_days = np.where(has_event, event_days, DEFAULT_DAYS_SINCE_EVENT)
+        return {
+            "resume_uploaded": np.fromiter((p.resume_uploaded for p in profiles), dtype=np.float64, count=n),
+            "karma": np.fromiter((p.karma for p in profiles), dtype=np.float64, count=n),
+            "projects_added": np.fromiter((p.projects_added for p in profiles), dtype=np.float64, count=n),
+            "batch_resume_uploaded_pct": np.fromiter((p.batch_resume_uploaded_pct for p in peers), dtype=np.float64, count=n),
+            "event_fomo_score": fomo_score_from_components(buddy_count, buddies_attending, batch_scores, fomo_days),
+            "buddies_attending": buddies_attending,
+            "has_event": has_event,
+            "event_days": event_days,
+            "fomo_days": fomo_days
+        }
+
+    # Every rule is a boolean mask over the batch and each model sees one matrix holding
+    # only the rows that still have room for an ML nudge.
+    def _evaluate_columns(self, payloads, peers, today):
+        n = len(payloads)
+        if n == 0:
+            return []
+        started = time.perf_counter()
+        profiles = [p.user_data.profile for p in payloads]
+        columns = self._input_columns(payloads, peers, today)
+        resume_uploaded = columns["resume_uploaded"] != 0
+        projects_added = columns["projects_added"]
+        resume_pct = columns["batch_resume_uploaded_pct"]
+        buddies_attending = columns["buddies_attending"]
+        has_event, event_days = columns["has_event"], columns["event_days"]
+        avg_projects = np.fromiter((p.batch_avg_projects for p in peers), dtype=np.float64, count=n)
+        max_attendance = np.fromiter((p.max_attendance for p in peers), dtype=np.float64, count=n)
+
+        # Same schedule as run_rules(): a rule only counts for rows that still have room for a nudge,
+        # so masks and counters match evaluate() and skipped rows never need their quiz dates parsed
+        rules = []
+        fired_count = np.zeros(n, dtype=np.int64)
+        rules_skipped = {}
+
+        def add_rule(rule_name, mask, build):
+            nonlocal fired_count
+            pending = fired_count < MAX_NUDGES
+            rules_skipped[rule_name] = n - int(pending.sum())
+            mask = mask & pending
+            rules.append((rule_name, mask, build))
+            fired_count = fired_count + mask
+
+        add_rule("resume", ~resume_uploaded & (resume_pct > self.resume_threshold_pct),
+                 lambda i: self.resume_nudge(peers[i].batch_resume_uploaded_pct))
+        add_rule("project", (projects_added == 0) & (avg_projects >= self.projects_avg_threshold),
+                 lambda i: self.project_nudge())
+        add_rule("buddies_event", buddies_attending >= self.buddies_event_threshold,
+                 lambda i: self.buddies_event_nudge())
+        add_rule("peer_event", max_attendance >= self.event_peer_threshold,
+                 lambda i: self.peer_event_nudge())
+
+        has_quiz = np.zeros(n, dtype=bool)
+        quiz_days = np.zeros(n, dtype=np.int64)
+        for i in np.flatnonzero(fired_count < MAX_NUDGES).tolist():
+            ordinal = _last_quiz_ordinal(profiles[i].quiz_history)
+            if ordinal is not None:
+                has_quiz[i] = True
+                quiz_days[i] = today - ordinal
+        add_rule("quiz", has_quiz & (quiz_days > self.quiz_inactive_days), lambda i: self.quiz_nudge())
+        add_rule("comeback", has_event & (event_days > self.user_inactive_days),
+                 lambda i: self.comeback_nudge())
+
+        # === FOMO ===
+        fomo_days, fomo_scores = columns["fomo_days"], columns["event_fomo_score"]
+        fomo_fired = (fomo_scores >= self.event_fomo_threshold) | (np.where(has_event, event_days, 0) > 30)
+
+        def build_fomo(i):
+            score = float(fomo_scores[i])
+            events = peers[i].buddies_attending_events
+            keys = fomo_recommendation_keys(score, int(fomo_days[i]), events)
+            return self.fomo_nudge(fomo_level(score), keys, events)
+
+        add_rule("event_fomo", fomo_fired, build_fomo)
+
+        # === ML models, one matrix per model ===
+        ml_branches = (
+            ("ml_resume", self.resume_scorer, self.resume_columns, "Resume", self.ml_resume_nudge),
+            ("ml_event", self.event_scorer, self.event_columns, "Event", self.ml_event_nudge),
+        )
+        ml_probs = {}
+        ml_skipped = {}
+        for rule_name, scorer, model_columns, name, build in ml_branches:
+            fired = np.zeros(n, dtype=bool)
+            probs = ml_probs[rule_name] = np.full(n, np.nan)
+            pending = fired_count < MAX_NUDGES
+            ml_skipped[rule_name] = rules_skipped[rule_name] = n - int(pending.sum())
+            if pending.any():
+                try:
+                    input_array = np.column_stack([columns[col][pending] for col in model_columns])
+                    probs[pending] = scorer.predict_proba(input_array)
+                    fired[pending] = probs[pending] >= self.nudge_probability_threshold
+                except Exception as e:
+                    logger.error("%s ML model failed: %s", name, e)
+            rules.append((rule_name, fired, lambda i, build=build: build()))
+            fired_count = fired_count + fired
+
+        responses = []
+        for i, payload in enumerate(payloads):
+            nudges = [build(i) for _, mask, build in rules if mask[i]]
+            fallbacks = max(MAX_NUDGES - len(nudges), 0)
+            nudges.extend(self.fallback_nudge() for _ in range(fallbacks))
+            responses.append(EngagementResult(payload.user_data.user_id, nudges, "generated"))
+            if self.summary_sampled():
+                self.log_summary(
+                    payload.user_data.user_id,
+                    [rule_name for rule_name, mask, _ in rules if mask[i]],
+                    fallbacks,
+                    {k: float(v[i]) for k, v in ml_probs.items() if not np.isnan(v[i])},
+                    started,
+                    batch_size=n,
+                    force=True
+                )
+
+        if self.metrics.enabled:
+            metrics = self.metrics
+            metrics.observe("engine_stage_seconds", time.perf_counter() - started, stage="evaluate_many")
+            for rule_name, mask, _ in rules:
+                metrics.inc("engine_nudges_fired_total", int(mask.sum()), rule=rule_name)
+            for rule_name, skipped in rules_skipped.items():
+                metrics.inc("engine_rules_skipped_total", skipped, rule=rule_name)
+            for rule_name, skipped in ml_skipped.items():
+                metrics.inc("engine_ml_skipped_total", skipped, model=rule_name[len("ml_"):])
+            metrics.inc("engine_fallback_nudges_total", int(np.maximum(MAX_NUDGES - fired_count, 0).sum()))
+        return responses
+
+    # ---------------- TARGETING ----------------
+    # How strongly each nudge applies to each request, for ranking users (see nudge_targeting.py):
+    # {"ml_resume": P(resume), "ml_event": P(event), "event_fomo": FOMO score}, one float64 array
+    # each. Unlike evaluate_many(), both models score every row, whatever rules fired before them.
+    def target_scores(self, payloads, peers=None, as_of=None):
+        today = self.as_of_clock() if as_of is None else to_ordinal(as_of)
+        if peers is None:
+            peers = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+        if not payloads:
+            return {name: np.empty(0) for name in TARGET_SCORES}
+        columns = self._input_columns(payloads, peers, today)
+        return {
+            "ml_resume": self.resume_scorer.predict_proba(np.column_stack([columns[c] for c in self.resume_columns])),
+            "ml_event": self.event_scorer.predict_proba(np.column_stack([columns[c] for c in self.event_columns])),
+            "event_fomo": columns["event_fomo_score"]
+        }
+
+    # ---------------- SHADOW MODELS ----------------
+    # The MODEL_FEATURES columns (float64) both models score, for every request; shadow_models.py
+    # scores them with the live and the candidate models to compare the two
+    def model_columns(self, payloads, peers=None, as_of=None):
+        today = self.as_of_clock() if as_of is None else to_ordinal(as_of)
+        if peers is None:
+            peers = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+        if not payloads:
+            return {name: np.empty(0) for name in MODEL_FEATURES}
+        columns = self._input_columns(payloads, peers, today)
+        return {name: columns[name] for name in MODEL_FEATURES}
+
+    # ---------------- SIMULATION ----------------
+    # Every value a rule compares against a threshold, as columns over all requests: input_columns
+    # plus batch_avg_projects, max_attendance, has_quiz / quiz_days and both models' probabilities
+    # (scored for every row). None of them depend on config.json's thresholds, so
+    # threshold_simulator.py computes them once and re-applies the rules under any thresholds.
+    def rule_columns(self, payloads, peers=None, as_of=None):
+        today = self.as_of_clock() if as_of is None else to_ordinal(as_of)
+        if peers is None:
+            peers = [PeerAggregates.from_snapshot(p.peer_snapshot) for p in payloads]
+        n = len(payloads)
+        columns = self._input_columns(payloads, peers, today)
+        quiz_ordinals = [_last_quiz_ordinal(p.user_data.profile.quiz_history) for p in payloads]
+        columns["has_quiz"] = np.fromiter((o is not None for o in quiz_ordinals), dtype=bool, count=n)
+        columns["quiz_days"] = today - np.fromiter((today if o is None else o for o in quiz_ordinals), dtype=np.int64, count=n)
+        columns["batch_avg_projects"] = np.fromiter((p.batch_avg_projects for p in peers), dtype=np.float64, count=n)
+        columns["max_attendance"] = np.fromiter((p.max_attendance for p in peers), dtype=np.float64, count=n)
+        for name, scorer, model_columns in (("ml_resume", self.resume_scorer, self.resume_columns),
+                                            ("ml_event", self.event_scorer, self.event_columns)):
+            columns[name] = scorer.predict_proba(np.column_stack([columns[c] for c in model_columns])) if n else np.empty(0)
+        return columns
+
@@ -1,35 +1,55 @@
-from datetime import datetime
+from datetime import date
 import math
+import numpy as np
+from day_clock import today_ordinal, to_ordinal
 
-# Calculates a FOMO score based on buddy participation, batch activity, and recency of user participation
-def calculate_event_fomo_score(user_data, peer_snapshot):
-    BUDDY_WEIGHT = 0.4
-    BATCH_WEIGHT = 0.3
-    TIME_WEIGHT = 0.3
-    MAX_DAYS_SINCE_EVENT = 30  # days
-
-    # Buddy score based on how many buddies are attending events
-    buddy_score = 0
-    if user_data['profile']['buddy_count'] > 0:
-        buddies_attending = len(peer_snapshot['buddies_attending_events'])
-        buddy_score = min(buddies_attending / user_data['profile']['buddy_count'], 1.0)
+BUDDY_WEIGHT = 0.4
+BATCH_WEIGHT = 0.3
+TIME_WEIGHT = 0.3
+MAX_DAYS_SINCE_EVENT = 30  # days
+DEFAULT_DAYS_SINCE_EVENT = 999  # used when the last event is missing or unparseable
 
+# Calculates a FOMO score based on buddy participation, batch activity, and recency of user participation
+# as_of (a date or day ordinal) pins "today" for reproducible scores; defaults to today.
+# batch_score can be passed in when it was already computed for this peer snapshot.
+def calculate_event_fomo_score(user_data, peer_snapshot, as_of=None, batch_score=None):
     # Batch score is average normalized attendance across all events
-    batch_scores = []
-    for event, attendance in peer_snapshot['batch_event_attendance'].items():
-        normalized_score = min(attendance / 10, 1.0)
-        batch_scores.append(normalized_score)
-    batch_score = sum(batch_scores) / len(batch_scores) if batch_scores else 0
+    if batch_score is None:
+        batch_scores = []
+        for event, attendance in peer_snapshot['batch_event_attendance'].items():
+            normalized_score = min(attendance / 10, 1.0)
+            batch_scores.append(normalized_score)
+        batch_score = sum(batch_scores) / len(batch_scores) if batch_scores else 0
 
-    # Time score based on days since last attended event (up to 30 days)
-    days_since_event = 999  # default large value if parsing fails
+    days_since_event = days_since_last_event(user_data['activity']['last_event_attended'], as_of)
+    fomo_score = event_fomo_score(
+        user_data['profile']['buddy_count'],
+        len(peer_snapshot['buddies_attending_events']),
+        batch_score,
+        days_since_event
+    )
+    return fomo_score, days_since_event  # Also return days_since_event for rule fallback
+
+# Days since the last attended event; DEFAULT_DAYS_SINCE_EVENT when it is missing or unparseable
+def days_since_last_event(last_event, as_of=None):
+    days_since_event = DEFAULT_DAYS_SINCE_EVENT  # default large value if parsing fails
     try:
-        if user_data['activity']['last_event_attended']:
-            last_event_date = datetime.strptime(user_data['activity']['last_event_attended'], '%Y-%m-%d')
-            days_since_event = (datetime.now() - last_event_date).days
+        if last_event:
+            # API callers pass pydantic's parsed date, the data scripts pass raw strings
+            now = today_ordinal() if as_of is None else to_ordinal(as_of)
+            days_since_event = now - to_ordinal(last_event)
     except Exception:
         pass  # keep default days_since_event = 999 if parsing fails
+    return days_since_event
+
+# The FOMO score from its inputs, for callers that already hold them as plain values
+def event_fomo_score(buddy_count, buddies_attending, batch_score, days_since_event):
+    # Buddy score based on how many buddies are attending events
+    buddy_score = 0
+    if buddy_count > 0:
+        buddy_score = min(buddies_attending / buddy_count, 1.0)
 
+    # Time score based on days since last attended event (up to 30 days)
     time_score = min(days_since_event / MAX_DAYS_SINCE_EVENT, 1.0)
 
     # Weighted FOMO score
@@ -39,16 +59,54 @@ def calculate_event_fomo_score(user_data, peer_snapshot):
         TIME_WEIGHT * time_score
     )
     fomo_score = 1 / (1 + math.exp(-5 * (fomo_score - 0.5)))  # sigmoid for normalization
+    return round(fomo_score, 2)
+
+# FOMO level bucket shown in the event nudge title
+def fomo_level(fomo_score):
+    return 'low' if fomo_score < 0.3 else 'medium' if fomo_score < 0.7 else 'high'
+
+# Recommendation lines for a FOMO score, by key; the nudge catalogue renders the same keys
+FOMO_RECOMMENDATIONS = {
+    "high_fomo": "High FOMO detected! Consider attending upcoming events to stay connected with your peers.",
+    "moderate_fomo": "Moderate FOMO level. Keep an eye on event announcements to maintain engagement.",
+    "inactive": "You haven't attended any events in a while. Reconnect by joining upcoming events!",
+    "buddies": "Your buddies are attending: {events}"
+}
+
+# Keys of the recommendations that apply, in display order; shared by the single and batch paths
+def fomo_recommendation_keys(fomo_score, days_since_event, buddies_attending_events):
+    keys = []
+
+    # Score-based recommendations
+    if fomo_score > 0.7:
+        keys.append("high_fomo")
+    elif fomo_score > 0.3:
+        keys.append("moderate_fomo")
 
-    return round(fomo_score, 2), days_since_event  # Also return days_since_event for rule fallback
+    # Explicit rule-based fallback: No event in over 30 days
+    if days_since_event > 30:
+        keys.append("inactive")
+
+    # Buddy presence suggestion
+    if len(buddies_attending_events) > 0:
+        keys.append("buddies")
+
+    return keys
+
+def fomo_recommendations(fomo_score, days_since_event, buddies_attending_events):
+    events = ", ".join(buddies_attending_events)
+    return [
+        FOMO_RECOMMENDATIONS[key].format(events=events)
+        for key in fomo_recommendation_keys(fomo_score, days_since_event, buddies_attending_events)
+    ]
 
 # Generates insights based on FOMO score and attendance gaps
-def get_event_fomo_insights(user_data, peer_snapshot):
-    fomo_score, days_since_event = calculate_event_fomo_score(user_data, peer_snapshot)
+def get_event_fomo_insights(user_data, peer_snapshot, batch_score=None):
+    fomo_score, days_since_event = calculate_event_fomo_score(user_data, peer_snapshot, batch_score=batch_score)
 
     insights = {
         'fomo_score': fomo_score,
-        'fomo_level': 'low' if fomo_score < 0.3 else 'medium' if fomo_score < 0.7 else 'high',
+        'fomo_level': fomo_level(fomo_score),
         'factors': {
             'buddy_attendance': len(peer_snapshot['buddies_attending_events']),
             'total_buddies': user_data['profile']['buddy_count'],
@@ -56,28 +114,77 @@ def get_event_fomo_insights(user_data, peer_snapshot):
             'batch_attendance': peer_snapshot['batch_event_attendance']
         },
         'recommendation': "",
-        'recommendations': [],
         'triggered_by_rule': days_since_event > 30
     }
 
-    # Score-based recommendations
-    if fomo_score > 0.7:
-        insights['recommendations'].append("High FOMO detected! Consider attending upcoming events to stay connected with your peers.")
-    elif fomo_score > 0.3:
-        insights['recommendations'].append("Moderate FOMO level. Keep an eye on event announcements to maintain engagement.")
-
-    # Explicit rule-based fallback: No event in over 30 days
-    if days_since_event > 30:
-        insights['recommendations'].append("You haven't attended any events in a while. Reconnect by joining upcoming events!")
-
-    # Buddy presence suggestion
-    if len(peer_snapshot['buddies_attending_events']) > 0:
-        insights['recommendations'].append(f"Your buddies are attending: {', '.join(peer_snapshot['buddies_attending_events'])}")
+    insights['recommendations'] = fomo_recommendations(fomo_score, days_since_event, peer_snapshot['buddies_attending_events'])
 
     # Combine for rule-based title if needed
     insights['recommendation'] = insights['recommendations'][0] if insights['recommendations'] else "Stay engaged with upcoming events."
 
     return insights
 
-# for verification that the file runs successfully:
-print("event_fomo_score.py generated")
+# ---------------- BATCH (columnar) ----------------
+# Per-row mean of min(attendance / 10, 1). Takes a ragged list of per-user attendance counts or a
+# padded 2-D array with NaN padding; rows with no events score 0. Columns are summed left to right,
+# the same order as the scalar sum(), so results match it exactly.
+def batch_attendance_scores(batch_event_attendance):
+    if isinstance(batch_event_attendance, np.ndarray) and batch_event_attendance.ndim == 2:
+        attendance = batch_event_attendance.astype(np.float64)
+    else:
+        rows = [list(row.values()) if isinstance(row, dict) else list(row) for row in batch_event_attendance]
+        width = max((len(row) for row in rows), default=0)
+        attendance = np.full((len(rows), width), np.nan)
+        for i, row in enumerate(rows):
+            attendance[i, :len(row)] = row
+
+    present = ~np.isnan(attendance)
+    counts = present.sum(axis=1)
+    totals = np.zeros(len(attendance))
+    for column, mask in zip(np.minimum(attendance / 10, 1.0).T, present.T):
+        totals += np.where(mask, column, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, totals / counts, 0.0)
+
+# Days between an as-of date or day ordinal (default: today) and each last-event date; NaT -> DEFAULT_DAYS_SINCE_EVENT
+def days_since_event_batch(last_event_attended, as_of=None):
+    last_event = np.asarray(last_event_attended, dtype='datetime64[D]')
+    as_of = np.datetime64(date.fromordinal(today_ordinal() if as_of is None else to_ordinal(as_of)), 'D')
+    days = (as_of - last_event).astype(np.int64)
+    return np.where(np.isnat(last_event), DEFAULT_DAYS_SINCE_EVENT, days)
+
+# Column-wise calculate_event_fomo_score for many users at once.
+#   buddy_counts, buddies_attending: 1-D arrays (profile.buddy_count, len(buddies_attending_events))
+#   batch_event_attendance: ragged list of attendance counts/dicts, or a NaN-padded 2-D array
+#   last_event_attended: datetime64[D] array (NaT when unknown)
+# Returns (fomo_scores, days_since_event) arrays; matches the scalar function after rounding.
+def calculate_event_fomo_score_batch(buddy_counts, buddies_attending, batch_event_attendance, last_event_attended, as_of=None):
+    days_since_event = days_since_event_batch(last_event_attended, as_of)
+    scores = fomo_score_from_components(
+        buddy_counts, buddies_attending, batch_attendance_scores(batch_event_attendance), days_since_event
+    )
+    return scores, days_since_event
+
+# The weighted score + sigmoid once batch scores and days since event are known.
+# Callers that share one peer snapshot across many users compute batch_scores once per snapshot.
+def fomo_score_from_components(buddy_counts, buddies_attending, batch_scores, days_since_event):
+    buddy_counts = np.asarray(buddy_counts, dtype=np.float64)
+    buddies_attending = np.asarray(buddies_attending, dtype=np.float64)
+    batch_scores = np.asarray(batch_scores, dtype=np.float64)
+    days_since_event = np.asarray(days_since_event, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buddy_score = np.where(buddy_counts > 0, np.minimum(buddies_attending / buddy_counts, 1.0), 0.0)
+    time_score = np.minimum(days_since_event / MAX_DAYS_SINCE_EVENT, 1.0)
+
+    raw = BUDDY_WEIGHT * buddy_score + BATCH_WEIGHT * batch_scores + TIME_WEIGHT * time_score
+    return _round_like_python(1 / (1 + np.exp(-5 * (raw - 0.5))), raw)
+
+# np.round can land on the other side of a .xx5 tie than Python's round(); redo those few in Python
+def _round_like_python(scores, raw):
+    rounded = np.round(scores, 2)
+    scaled = scores * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(1 / (1 + math.exp(-5 * (float(raw[i]) - 0.5))), 2)
+    return rounded
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import re
+from datetime import date
+from math import isfinite
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library does the same job, just slower
+    orjson = None
+
+# Request fast path.
+# The common, well-formed body is decoded straight into the small __slots__ objects below,
+# which expose the same attributes the engine reads from the pydantic models. Anything the
+# decoder isn't certain pydantic would accept unchanged (a missing field, a value needing
+# coercion, an unusual content type, invalid JSON) returns None, and the request goes
+# through FastAPI's normal validation instead, so 422 responses are exactly the usual ones.
+# Routes keep their pydantic signatures, so the OpenAPI schema is unchanged too.
+
+class FastProfile:
+    __slots__ = ("resume_uploaded", "goal_tags", "karma", "projects_added", "quiz_history",
+                 "clubs_joined", "buddy_count")
+
+class FastActivity:
+    __slots__ = ("login_streak", "posts_created", "buddies_interacted", "last_event_attended")
+
+class FastUserData:
+    __slots__ = ("user_id", "profile", "activity")
+
+class FastPeerSnapshot:
+    __slots__ = ("batch_avg_projects", "batch_resume_uploaded_pct", "batch_event_attendance",
+                 "buddies_attending_events")
+
+class FastRequest:
+    __slots__ = ("user_data", "peer_snapshot", "batch_id")
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _loads(body):
+    try:
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError:  # JSONDecodeError, orjson.JSONDecodeError and bad UTF-8 are all ValueErrors
+        return None
+
+def _is_int(value):
+    return type(value) is int
+
+def _is_str_list(value):
+    return type(value) is list and all(type(item) is str for item in value)
+
+def _number(value):
+    kind = type(value)
+    if kind is int or (kind is float and isfinite(value)):
+        return float(value)
+    return None
+
+def _decode_profile(data):
+    if type(data) is not dict:
+        return None
+    try:
+        values = (data["resume_uploaded"], data["goal_tags"], data["karma"], data["projects_added"],
+                  data["quiz_history"], data["clubs_joined"], data["buddy_count"])
+    except KeyError:
+        return None
+    resume_uploaded, goal_tags, karma, projects_added, quiz_history, clubs_joined, buddy_count = values
+    if not (type(resume_uploaded) is bool and _is_int(karma) and _is_int(projects_added) and _is_int(buddy_count)
+            and _is_str_list(goal_tags) and _is_str_list(quiz_history) and _is_str_list(clubs_joined)):
+        return None
+    profile = FastProfile()
+    profile.resume_uploaded = resume_uploaded
+    profile.goal_tags = goal_tags
+    profile.karma = karma
+    profile.projects_added = projects_added
+    profile.quiz_history = quiz_history
+    profile.clubs_joined = clubs_joined
+    profile.buddy_count = buddy_count
+    return profile
+
+def _decode_activity(data):
+    if type(data) is not dict:
+        return None
+    try:
+        login_streak, posts_created = data["login_streak"], data["posts_created"]
+        buddies_interacted, last_event = data["buddies_interacted"], data["last_event_attended"]
+    except KeyError:
+        return None
+    if not (_is_int(login_streak) and _is_int(posts_created) and _is_int(buddies_interacted)):
+        return None
+    if last_event is not None:
+        if type(last_event) is not str or not _ISO_DATE.fullmatch(last_event):
+            return None
+        try:
+            last_event = date.fromisoformat(last_event)
+        except ValueError:
+            return None
+    activity = FastActivity()
+    activity.login_streak = login_streak
+    activity.posts_created = posts_created
+    activity.buddies_interacted = buddies_interacted
+    activity.last_event_attended = last_event
+    return activity
+
+def _decode_user_data(data):
+    if type(data) is not dict or type(data.get("user_id")) is not str:
+        return None
+    profile = _decode_profile(data.get("profile"))
+    activity = _decode_activity(data.get("activity"))
+    if profile is None or activity is None:
+        return None
+    user = FastUserData()
+    user.user_id = data["user_id"]
+    user.profile = profile
+    user.activity = activity
+    return user
+
+def _decode_peer_snapshot(data):
+    if type(data) is not dict:
+        return None
+    avg_projects = _number(data.get("batch_avg_projects"))
+    resume_pct = _number(data.get("batch_resume_uploaded_pct"))
+    attendance = data.get("batch_event_attendance")
+    buddies = data.get("buddies_attending_events")
+    if (avg_projects is None or resume_pct is None or not _is_str_list(buddies)
+            or type(attendance) is not dict or not all(_is_int(count) for count in attendance.values())):
+        return None
+    snapshot = FastPeerSnapshot()
+    snapshot.batch_avg_projects = avg_projects
+    snapshot.batch_resume_uploaded_pct = resume_pct
+    snapshot.batch_event_attendance = attendance
+    snapshot.buddies_attending_events = buddies
+    return snapshot
+
+# One EngagementRequest body (already JSON-decoded) -> FastRequest, or None
+def decode_engagement_request(data):
+    if type(data) is not dict:
+        return None
+    user = _decode_user_data(data.get("user_data"))
+    if user is None:
+        return None
+    peer_data = data.get("peer_snapshot")
+    batch_id = data.get("batch_id")
+    # exactly one peer source, as EngagementRequest.check_peer_source requires
+    if (peer_data is None) == (batch_id is None):
+        return None
+    if batch_id is not None and type(batch_id) is not str:
+        return None
+    peer = None
+    if peer_data is not None:
+        peer = _decode_peer_snapshot(peer_data)
+        if peer is None:
+            return None
+    request = FastRequest()
+    request.user_data = user
+    request.peer_snapshot = peer
+    request.batch_id = batch_id
+    return request
+
+# A JSON list of EngagementRequest bodies -> list of FastRequest, or None if any one needs the slow path
+def decode_engagement_requests(data):
+    if type(data) is not list:
+        return None
+    requests = []
+    for item in data:
+        request = decode_engagement_request(item)
+        if request is None:
+            return None
+        requests.append(request)
+    return requests
+
+# Only JSON content types take the fast path; whether a body without one is parsed as JSON
+# depends on the FastAPI version, so those (like anything else) get the normal handling
+def _json_content_type(request):
+    content_type = request.headers.get("content-type")
+    if content_type is None:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+# APIRoute that tries `decoder` on the raw body first. On success the endpoint is called directly with
+# the decoded body in place of its pydantic body parameter (and the Request, if it asks for one), in
+# the threadpool like FastAPI runs any sync endpoint. Endpoints should return a Response they encoded
+# themselves (main.py renders nudges from the catalogue); anything else is sent through
+# jsonable_encoder, without response_model filtering. On failure the standard FastAPI handler runs,
+# reusing the body Starlette has already buffered.
+def fast_path_route(decoder):
+    class FastPathRoute(APIRoute):
+        def get_route_handler(self):
+            standard = super().get_route_handler()
+            endpoint = self.endpoint
+            body_param = self.body_field.name if self.body_field is not None else None
+            request_param = self.dependant.request_param_name
+            is_coroutine = asyncio.iscoroutinefunction(endpoint)
+
+            async def handler(request: Request):
+                if body_param is None or not _json_content_type(request):
+                    return await standard(request)
+                data = _loads(await request.body())
+                payload = decoder(data) if data is not None else None
+                if payload is None:
+                    return await standard(request)
+                kwargs = {body_param: payload}
+                if request_param:
+                    kwargs[request_param] = request
+                if is_coroutine:
+                    result = await endpoint(**kwargs)
+                else:
+                    result = await run_in_threadpool(endpoint, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                return JSONResponse(jsonable_encoder(result), status_code=self.status_code or 200)
+
+            return handler
+    return FastPathRoute
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+FEATURE_STORE_DIR = os.path.join("data", "feature_store")
+MANIFEST_NAME = "manifest.json"
+# Version of the manifest layout; bump on incompatible changes
+STORE_FORMAT = "npy-shards"
+STORE_VERSION = 1
+
+# Append-only, columnar store of labelled training rows.
+# Each append is a shard: a directory with one .npy file per column. manifest.json lists the
+# columns (with dtypes) and the shards in order. A shard is written under a temporary name and
+# renamed into place before the manifest is replaced, and shards are never modified, so a reader
+# sees either the rows before an append or after it. Columns are memory-mapped on read.
+class FeatureStore:
+    def __init__(self, path=FEATURE_STORE_DIR):
+        self.path = path
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"format": STORE_FORMAT, "version": STORE_VERSION, "columns": [], "dtypes": [], "shards": []}
+        if manifest.get("format") != STORE_FORMAT or manifest.get("version") != STORE_VERSION:
+            raise ValueError(
+                f"Unsupported feature store {manifest.get('format')!r} v{manifest.get('version')} in '{self.path}', "
+                f"expected {STORE_FORMAT!r} v{STORE_VERSION}"
+            )
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+        self.manifest = manifest
+
+    @property
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    @property
+    def shards(self):
+        return list(self.manifest["shards"])
+
+    @property
+    def rows(self):
+        return sum(shard["rows"] for shard in self.manifest["shards"])
+
+    # Adds the rows of `df` as a new shard and returns its manifest entry. The first append fixes the
+    # columns and dtypes; later ones must have the same columns (in any order) and are cast to them.
+    def append(self, df, source=None):
+        columns, dtypes = self.columns, self.manifest["dtypes"]
+        if not columns:
+            columns = [str(c) for c in df.columns]
+            dtypes = [np.dtype(df[c].dtype).str for c in columns]
+        elif set(df.columns) != set(columns):
+            raise ValueError(f"Rows have columns {sorted(df.columns)}, the feature store has {sorted(columns)}")
+
+        os.makedirs(self.path, exist_ok=True)
+        name = f"shard-{len(self.manifest['shards']):05d}"
+        shard_dir = os.path.join(self.path, name)
+        tmp_dir = shard_dir + ".tmp"
+        # not in the manifest, so left over from an append that failed halfway
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column, dtype in zip(columns, dtypes):
+            values = df[column].to_numpy()
+            stored = values.astype(dtype)
+            if stored.dtype.kind != values.dtype.kind and not np.array_equal(stored, values):
+                shutil.rmtree(tmp_dir)
+                raise ValueError(f"Column {column!r} has values that don't fit the store's {np.dtype(dtype)}")
+            np.save(os.path.join(tmp_dir, column + ".npy"), stored)
+        os.replace(tmp_dir, shard_dir)
+
+        shard = {
+            "name": name,
+            "rows": len(df),
+            "source": source,
+            "added_at": datetime.now().isoformat(timespec="seconds")
+        }
+        manifest = dict(self.manifest, columns=columns, dtypes=dtypes, shards=self.shards + [shard])
+        self._write_manifest(manifest)
+        return shard
+
+    # Rows of the given shards (default: all) as one DataFrame; `columns` limits what is read
+    def load(self, shards=None, columns=None):
+        shards = self.manifest["shards"] if shards is None else shards
+        columns = self.columns if columns is None else list(columns)
+        data = {}
+        for column in columns:
+            parts = [np.load(os.path.join(self.path, s["name"], column + ".npy"), mmap_mode="r") for s in shards]
+            data[column] = np.concatenate(parts) if parts else np.empty(0)
+        return pd.DataFrame(data, columns=columns)
@@ -0,0 +1,162 @@
+# Columnar version of simulate_data.py + generate_training_data.py for large training sets.
+# Profiles are generated (or loaded) as NumPy columns with a seeded np.random.Generator, FOMO scores
+# and labels are array operations, and rows are written to CSV/Parquet chunk by chunk.
+# Label semantics are the same as generate_training_data.py.
+import argparse
+import json
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from event_fomo_score import fomo_score_from_components, batch_attendance_scores, days_since_event_batch
+
+CAMPUS_EVENTS = ["tech-talk", "coding-contest", "startup-meetup"]
+OUTPUT_COLUMNS = [
+    "resume_uploaded", "karma", "projects_added", "batch_resume_uploaded_pct",
+    "event_fomo_score", "should_nudge_resume", "should_nudge_event"
+]
+
+# Peer contexts as columns: same ranges as simulate_data.generate_peer_context
+def generate_peer_columns(rng, count):
+    attendance = rng.integers(2, 16, size=(count, len(CAMPUS_EVENTS)))
+    return {
+        "batch_resume_uploaded_pct": rng.integers(60, 96, size=count).astype(np.float64),
+        "buddies_attending": np.ones(count),  # one event sampled per context
+        "batch_score": batch_attendance_scores(attendance)
+    }
+
+# Peer contexts from peer_snapshot.json, reduced to the columns the labels need
+def load_peer_columns(path):
+    with open(path) as f:
+        peers = json.load(f)
+    if not isinstance(peers, list):
+        raise ValueError(f"'{path}' must contain a list of peer context snapshots.")
+    return {
+        "batch_resume_uploaded_pct": np.array([p.get("batch_resume_uploaded_pct", 0) for p in peers], dtype=np.float64),
+        "buddies_attending": np.array([len(p["buddies_attending_events"]) for p in peers], dtype=np.float64),
+        "batch_score": batch_attendance_scores([p["batch_event_attendance"] for p in peers])
+    }
+
+# Synthetic profile columns: same ranges as simulate_data.generate_student_profile
+def generate_profile_chunk(rng, size):
+    return {
+        "resume_uploaded": rng.integers(0, 2, size=size).astype(bool),
+        "karma": rng.integers(40, 501, size=size),
+        "projects_added": rng.integers(0, 7, size=size),
+        "buddy_count": rng.integers(0, 6, size=size),
+        "days_since_event": rng.integers(0, 91, size=size)  # last_event_attended up to 90 days back
+    }
+
+# Real profiles from a simulated_profiles.json-style file, converted to columns chunk by chunk
+def iter_profile_chunks(path, chunk_size, as_of):
+    with open(path) as f:
+        users = json.load(f)
+    for start in range(0, len(users), chunk_size):
+        chunk = users[start:start + chunk_size]
+        profiles = [u.get("profile", {}) for u in chunk]
+        last_events = [u.get("activity", {}).get("last_event_attended") for u in chunk]
+        event_dates = np.array([d or "NaT" for d in last_events], dtype="datetime64[D]")
+        yield {
+            "resume_uploaded": np.array([bool(p.get("resume_uploaded", False)) for p in profiles]),
+            "karma": np.array([p.get("karma", 0) for p in profiles]),
+            "projects_added": np.array([p.get("projects_added", 0) for p in profiles]),
+            "buddy_count": np.array([p["buddy_count"] for p in profiles]),
+            "days_since_event": days_since_event_batch(event_dates, as_of)
+        }
+
+# FOMO score + labels for one chunk; each profile is paired with a random peer context
+def build_rows(rng, profiles, peers):
+    size = len(profiles["karma"])
+    peer_index = rng.integers(0, len(peers["batch_score"]), size=size)
+    resume_pct = peers["batch_resume_uploaded_pct"][peer_index]
+    fomo = fomo_score_from_components(
+        profiles["buddy_count"],
+        peers["buddies_attending"][peer_index],
+        peers["batch_score"][peer_index],
+        profiles["days_since_event"]
+    )
+    has_resume = profiles["resume_uploaded"].astype(np.int64)
+    return pd.DataFrame({
+        "resume_uploaded": has_resume,
+        "karma": profiles["karma"],
+        "projects_added": profiles["projects_added"],
+        "batch_resume_uploaded_pct": resume_pct,
+        "event_fomo_score": fomo,
+        "should_nudge_resume": ((has_resume == 0) & (resume_pct > 80)).astype(np.int64),
+        "should_nudge_event": (fomo >= 0.5).astype(np.int64)
+    }, columns=OUTPUT_COLUMNS)
+
+# Appends chunks to a CSV file or a Parquet file (Parquet needs pyarrow)
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("📌 pyarrow not installed. Run 'pip install pyarrow' to write Parquet.")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a FOMO training dataset column-wise, in chunks.")
+    parser.add_argument("--rows", type=int, default=2000, help="synthetic profiles to generate")
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--peer-contexts", type=int, default=10, help="synthetic peer contexts to generate")
+    parser.add_argument("--profiles", help="score real profiles from this JSON file instead of generating them")
+    parser.add_argument("--peers", help="use peer contexts from this JSON file (e.g. peer_snapshot.json)")
+    parser.add_argument("--as-of", default=date.today().isoformat(), help="reference date for days since last event")
+    parser.add_argument("--output", default="processed_fomo_dataset.csv", help=".csv or .parquet")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    peers = load_peer_columns(args.peers) if args.peers else generate_peer_columns(rng, args.peer_contexts)
+
+    if args.profiles:
+        chunks = iter_profile_chunks(args.profiles, args.chunk_size, args.as_of)
+    else:
+        chunks = (
+            generate_profile_chunk(rng, min(args.chunk_size, args.rows - start))
+            for start in range(0, args.rows, args.chunk_size)
+        )
+
+    writer = ChunkWriter(args.output)
+    total = 0
+    resume_positive = event_positive = 0
+    started = time.perf_counter()
+    try:
+        for profiles in chunks:
+            df = build_rows(rng, profiles, peers)
+            writer.write(df)
+            total += len(df)
+            resume_positive += int(df["should_nudge_resume"].sum())
+            event_positive += int(df["should_nudge_event"].sum())
+            elapsed = time.perf_counter() - started
+            print(f"  {total:,} rows written ({total / elapsed:,.0f} rows/sec)")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print("\n🔍 Label Value Counts:")
+    print(f"should_nudge_resume: 1 = {resume_positive:,}, 0 = {total - resume_positive:,}")
+    print(f"should_nudge_event:  1 = {event_positive:,}, 0 = {total - event_positive:,}")
+    print(f"\n✅ {total:,} rows saved as '{args.output}' in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+if __name__ == "__main__":
+    main()
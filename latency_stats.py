@@ -0,0 +1,18 @@
+# Latency summaries shared by the benchmark and replay tools; NumPy only, so importing it pulls in
+# neither tool's dependencies.
+import numpy as np
+
+def latency_summary(latencies_s, wall_s, items=None):
+    ms = np.asarray(latencies_s) * 1000
+    summary = {
+        "requests": len(ms),
+        "throughput_rps": round(len(ms) / wall_s, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "mean_ms": round(float(ms.mean()), 3)
+    }
+    if items is not None:
+        summary["items_per_sec"] = round(items / wall_s, 1)
+    return summary
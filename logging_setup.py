@@ -0,0 +1,98 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+DEFAULT_SETTINGS = {
+    "mode": "queue",  # "queue": handlers run on a background listener thread, "sync": handlers run inline
+    "level": "INFO",
+    "file": "logs/app.log",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "summary_sample_rate": 1.0
+}
+
+_listener = None
+_queue_handler = None
+_configured = False
+
+# Plain text for ordinary records; records carrying a "summary" dict (see engine.py) become one JSON line
+class SummaryFormatter(logging.Formatter):
+    def format(self, record):
+        summary = getattr(record, "summary", None)
+        if summary is None:
+            return super().format(record)
+        return json.dumps({
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            **summary
+        }, default=str)
+
+# QueueHandler that hands the record over untouched, so message interpolation and
+# JSON encoding happen on the listener thread instead of the request thread.
+# The queue is in-process, so nothing has to be made picklable.
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record
+
+def _output_handlers(settings):
+    formatter = SummaryFormatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if settings["file"]:
+        os.makedirs(os.path.dirname(settings["file"]) or ".", exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            settings["file"],
+            maxBytes=settings["max_bytes"],
+            backupCount=settings["backup_count"],
+            encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+# Configures the root logger from the "logging" section of config.json; safe to call more than once
+def configure_logging(settings=None):
+    global _listener, _configured
+    if _configured:
+        return
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+    root = logging.getLogger()
+    root.setLevel(settings["level"])
+    handlers = _output_handlers(settings)
+
+    if settings["mode"] == "queue":
+        global _queue_handler
+        log_queue = queue.SimpleQueue()
+        _queue_handler = DeferredQueueHandler(log_queue)
+        root.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    elif settings["mode"] == "sync":
+        for handler in handlers:
+            root.addHandler(handler)
+    else:
+        raise ValueError(f"Unknown logging mode: {settings['mode']!r}")
+    _configured = True
+
+# Writes out whatever is still queued and stops the listener thread. Called from main.py's shutdown
+# hook (a worker stopped by a signal may never run atexit) and registered with atexit as a fallback.
+# Records logged afterwards go to the same handlers, inline.
+def shutdown_logging():
+    global _listener, _queue_handler
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _queue_handler = None
+        for handler in listener.handlers:
+            handler.flush()
+            root.addHandler(handler)
@@ -0,0 +1,103 @@
+import json
+import math
+import numpy as np
+
+# Version of the JSON artifact written by LogisticScorer.save(); bump on incompatible changes
+ARTIFACT_FORMAT = "logistic-regression"
+ARTIFACT_VERSION = 1
+
+# Precompiled binary logistic regression: P(class 1) = sigmoid(intercept + coef . x).
+# Pulls coef_, intercept_ and feature_names_in_ out of a fitted sklearn LogisticRegression once,
+# so scoring skips sklearn's input validation. The estimator is kept for verify().
+class LogisticScorer:
+    def __init__(self, coef, intercept, feature_names, estimator=None):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.feature_names = tuple(feature_names)
+        if len(self.coef) != len(self.feature_names):
+            raise ValueError(f"{len(self.coef)} coefficients for {len(self.feature_names)} features")
+        self.estimator = estimator
+        # Pure-Python copies for the single-row path
+        self._terms = tuple(zip(self.feature_names, self.coef.tolist()))
+
+    @classmethod
+    def from_estimator(cls, model):
+        classes = list(getattr(model, "classes_", []))
+        if getattr(model, "coef_", None) is None or len(classes) != 2 or np.shape(model.coef_)[0] != 1:
+            raise ValueError(f"{type(model).__name__} is not a fitted binary linear classifier")
+        return cls(model.coef_[0], model.intercept_[0], model.feature_names_in_, estimator=model)
+
+    # Compact artifact: everything needed to score, loadable without sklearn or pickle
+    def to_artifact(self):
+        return {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "feature_names": list(self.feature_names),
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept
+        }
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        if artifact.get("format") != ARTIFACT_FORMAT or artifact.get("version") != ARTIFACT_VERSION:
+            raise ValueError(
+                f"Unsupported model artifact {artifact.get('format')!r} v{artifact.get('version')}, "
+                f"expected {ARTIFACT_FORMAT!r} v{ARTIFACT_VERSION}"
+            )
+        return cls(artifact["coef"], artifact["intercept"], artifact["feature_names"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_artifact(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_artifact(json.load(f))
+
+    # P(class 1) for one row given as a {feature_name: value} mapping
+    def predict_proba_row(self, features):
+        z = self.intercept
+        for name, weight in self._terms:
+            z += weight * features[name]
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)  # avoids overflow for very negative z
+        return e / (1.0 + e)
+
+    # P(class 1) for an N x F matrix whose columns follow feature_names
+    def predict_proba(self, X):
+        z = np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    # Max absolute difference against the wrapped sklearn estimator on X
+    def verify(self, X):
+        if self.estimator is None:
+            raise ValueError("No sklearn estimator to verify against")
+        X = np.asarray(X, dtype=np.float64)
+        expected = self.estimator.predict_proba(X)[:, 1]
+        return float(np.max(np.abs(self.predict_proba(X) - expected))) if len(X) else 0.0
+
+# Same interface as LogisticScorer, backed by the sklearn estimator itself.
+# Used when a model can't be compiled (e.g. a non-linear or multi-class replacement).
+class EstimatorScorer:
+    def __init__(self, estimator):
+        self.estimator = estimator
+        self.feature_names = tuple(estimator.feature_names_in_)
+
+    def predict_proba_row(self, features):
+        row = np.array([features[name] for name in self.feature_names]).reshape(1, -1)
+        return self.estimator.predict_proba(row)[0][1]
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(np.asarray(X, dtype=np.float64))[:, 1]
+
+# Passes scorers through unchanged, so an engine can be built from artifacts or estimators
+def compile_scorer(model):
+    if isinstance(model, (LogisticScorer, EstimatorScorer)):
+        return model
+    try:
+        return LogisticScorer.from_estimator(model)
+    except (ValueError, AttributeError):
+        return EstimatorScorer(model)
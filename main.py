@@ -1,38 +1,89 @@
-from fastapi import FastAPI, Request
+from fastapi import APIRouter, FastAPI, Request, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from models import EngagementRequest, EngagementResponse, Nudge
-from event_fomo_score import get_event_fomo_insights
-import joblib
+from models import EngagementRequest, EngagementResponse, PeerSnapshot, SnapshotInfo, CohortMember, AttendanceRecord
+from engine import NudgeEngine, load_config, load_scorers, source_paths, TARGET_SCORES
+from snapshot_registry import SnapshotRegistry, FileSnapshotRegistry, UnknownBatchError
+from cohort_aggregator import CohortAggregator
+from response_cache import ResponseCache, request_fingerprint
+from metrics import MetricsMiddleware, metrics_from_config
+from engine_reloader import EngineReloader
+from logging_setup import configure_logging, shutdown_logging
+from fast_path import fast_path_route, decode_engagement_request, decode_engagement_requests
+from micro_batcher import MicroBatcher, QueueFullError
+from nudge_targeting import CohortRanker, CHUNK_SIZE as TARGETING_CHUNK_SIZE
+from request_capture import CaptureWriter, CaptureMiddleware, CAPTURE_DEFAULTS
+from shadow_models import ShadowEvaluator
+from day_clock import today_ordinal, fixed_clock
+from typing import List, Optional
 import json
-import os
-import numpy as np
 import logging
-import webbrowser
-from datetime import datetime 
-from fastapi.responses import JSONResponse
+import os
+from fastapi.responses import JSONResponse, Response, StreamingResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
 
-# ---------------- LOGGING ----------------
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    handlers=[
-        logging.FileHandler(f"{log_dir}/app.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+# ---------------- CONFIG ----------------
+# Importing this module only reads config.json; logging, models and the browser are
+# handled in startup_event so worker processes come up fast.
+CONFIG = load_config()
+# model_loading: "warmup" loads models in the startup hook, "lazy" on the first request.
+# model_format: "json" artifacts from train_model.py (no sklearn import) or "pickle".
+STARTUP_DEFAULTS = {"model_loading": "warmup", "model_format": "json", "open_browser": False}
+STARTUP = {**STARTUP_DEFAULTS, **CONFIG.get("startup", {})}
+if STARTUP["model_loading"] not in ("warmup", "lazy"):
+    raise ValueError(f"Unknown startup.model_loading: {STARTUP['model_loading']!r}")
 logger = logging.getLogger(__name__)
 
-# ---------------- CONFIG & MODELS ----------------
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
-with open(CONFIG_PATH) as f:
-    CONFIG = json.load(f)
+metrics = metrics_from_config(CONFIG.get("metrics"))
+# serve.py points every worker at one snapshot directory; a single process keeps them in memory
+SNAPSHOT_DIR = os.environ.get("ENGAGEMENT_SNAPSHOT_DIR")
+snapshots = FileSnapshotRegistry(SNAPSHOT_DIR) if SNAPSHOT_DIR else SnapshotRegistry()
+# Peer snapshots aggregated from raw profiles (see /cohorts). They live in memory, per process, so
+# they are only served by a single process: under serve.py with several workers an update would
+# reach one worker and requests on the others would miss it, so /cohorts answers 404 there instead.
+WORKERS = int(os.environ.get("ENGAGEMENT_WORKERS", "1"))
+cohorts = CohortAggregator() if WORKERS == 1 else None
+response_cache = ResponseCache.from_config(
+    CONFIG.get("response_cache"),
+    watch_paths=source_paths(model_format=STARTUP["model_format"])
+)
+
+# ENGAGEMENT_AS_OF=YYYY-MM-DD pins the day the day-count rules measure from (e.g. to replay
+# captured requests, see replay_capture.py); otherwise it is today
+AS_OF_CLOCK = fixed_clock(os.environ["ENGAGEMENT_AS_OF"]) if os.environ.get("ENGAGEMENT_AS_OF") else today_ordinal
+
+# ---------------- MODELS ----------------
+# Rules, thresholds, labels and models are re-read from disk on every reload; the other sections
+# of config.json (logging, metrics, cache, micro-batching, capture, shadow, startup, serving) only apply at process start.
+def _build_engine():
+    config = load_config()
+    return NudgeEngine(config, *load_scorers(model_format=STARTUP["model_format"]), metrics=metrics, as_of_clock=AS_OF_CLOCK)
+
+# Responses cached under the old engine may no longer be what the new one would return, and
+# shadow comparisons were against the old live models
+def _on_engine_swap(release):
+    if response_cache is not None:
+        response_cache.clear()
+    if shadow is not None:
+        shadow.reset()
+
+HOT_RELOAD = {"watch_interval": 0, **CONFIG.get("hot_reload", {})}
+# When set, POST /admin/reload requires a matching X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("ENGAGEMENT_ADMIN_TOKEN")
+reloader = EngineReloader(
+    _build_engine,
+    source_paths(model_format=STARTUP["model_format"]),
+    on_swap=_on_engine_swap,
+    metrics=metrics
+)
+
+# The current NudgeEngine, built on first call; take it once per request
+def get_engine():
+    return reloader.current()
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-model_resume = joblib.load(os.path.join(MODEL_DIR, "model_resume.pkl"))
-model_event = joblib.load(os.path.join(MODEL_DIR, "model_event.pkl"))
+# Candidate models scored on live traffic off the response path (see shadow_models.py); off by default
+shadow = ShadowEvaluator.from_config(CONFIG.get("shadow"), get_engine, metrics=metrics)
 
 # ---------------- FASTAPI APP ----------------
 app = FastAPI(
@@ -48,6 +99,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Sampled request/response capture for replay testing (see request_capture.py); off by default
+CAPTURE = {**CAPTURE_DEFAULTS, **CONFIG.get("capture", {})}
+capture = CaptureWriter.from_config(CAPTURE, metrics=metrics)
+if capture is not None:
+    app.add_middleware(CaptureMiddleware, writer=capture, paths=CAPTURE["paths"],
+                       sample_rate=CAPTURE["sample_rate"], as_of_clock=AS_OF_CLOCK)
 
 @app.get("/")
 def root():
@@ -64,16 +123,73 @@ def health():
 
 @app.get("/version")
 def version():
-    return {"version": "1.0.0"}
+    return {"version": "1.0.0", **reloader.status()}
+
+# Validates and swaps in config.json + model artifacts from disk; requests already running
+# finish on the engine they started with
+@app.post("/admin/reload")
+def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    status = reloader.reload(reason="POST /admin/reload")
+    if status["last_reload_error"]:
+        return JSONResponse(status_code=409, content=status)
+    return status
+
+# stats() entries that /metrics already exports as counters (microbatch_batches_total, ...), left out of the gauges
+COUNTED_STATS = frozenset({"microbatch_batches", "microbatch_items", "microbatch_rejected",
+                           "capture_captured", "capture_dropped"})
+
+# Prometheus text exposition of stage latencies, rule counters and cache stats
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled in config.json")
+    gauges = {}
+    if response_cache is not None:
+        gauges.update((f"response_cache_{name}", value) for name, value in response_cache.stats().items())
+    if micro_batcher is not None:
+        gauges.update((f"microbatch_{name}", value) for name, value in micro_batcher.stats().items())
+    if capture is not None:
+        gauges.update((f"capture_{name}", value) for name, value in capture.stats().items())
+    if shadow is not None:
+        gauges.update((f"shadow_{name}", value) for name, value in shadow.stats().items())
+    gauges = {name: value for name, value in gauges.items() if name not in COUNTED_STATS}
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
 
 @app.on_event("startup")
 async def startup_event():
-    webbrowser.open("http://127.0.0.1:8000/docs")
+    logging_settings = CONFIG.get("logging") or {}
+    if WORKERS > 1:
+        # each worker's RotatingFileHandler would rotate the shared file under the others: log to
+        # stderr only, which serve.py's workers share with the supervisor
+        logging_settings = {**logging_settings, "file": None}
+    configure_logging(logging_settings)
+    if STARTUP["model_loading"] == "warmup":
+        get_engine()
+        if shadow is not None:
+            shadow.ensure_loaded()
+    reloader.start_watching(HOT_RELOAD["watch_interval"])
+    if STARTUP["open_browser"]:
+        import webbrowser
+        webbrowser.open("http://127.0.0.1:8000/docs")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    reloader.stop_watching()
+    if micro_batcher is not None:
+        micro_batcher.close()
+    if capture is not None:
+        capture.close()
+    if shadow is not None:
+        shadow.close()
+    # last, so the records logged while closing the rest are written too
+    shutdown_logging()
 
 # === GLOBAL ERROR HANDLER FOR UNCAUGHT EXCEPTIONS ===
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled error: {exc}", exc_info=True)
+    logger.error("Unhandled error: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error. Check logs for details."}
@@ -82,190 +198,320 @@ async def global_exception_handler(request: Request, exc: Exception):
 # === VALIDATION ERROR HANDLER ===
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.warning(f"Validation error: {exc}")
+    logger.warning("Validation error: %s", exc)
     return JSONResponse(
         status_code=422,
-        content={"detail": exc.errors()}
+        content={"detail": jsonable_encoder(exc.errors())}
     )
 
-@app.post("/analyze-engagement", response_model=EngagementResponse)
-def analyze_engagement(payload: EngagementRequest):
+# ---------------- SHADOW MODELS ----------------
+# How the candidate models compare with the live ones on the traffic scored since they were
+# loaded: per model, agreement on the nudge decision and probability drift
+@app.get("/shadow")
+def shadow_report():
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow models are disabled in config.json")
+    return {**shadow.report(), "live": reloader.status()}
+
+# Loads the candidate models from shadow.model_dir again (e.g. after a retrain) and restarts the comparison
+@app.post("/admin/shadow/reload")
+def admin_shadow_reload(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow models are disabled in config.json")
     try:
-        user = payload.user_data
-        profile = user.profile
-        activity = user.activity
-        peer = payload.peer_snapshot
-
-        nudges = []
-        logger.info(f"Analyzing engagement for user: {user.user_id}")
-
-        # === Resume ===
-        if not profile.resume_uploaded and peer.batch_resume_uploaded_pct > CONFIG["profile_rules"]["resume_threshold"] * 100:
-            logger.info("Triggering resume upload rule-based nudge.")
-            nudges.append(Nudge(
-                type="profile",
-                title=f"{peer.batch_resume_uploaded_pct}% of your peers have uploaded resumes. You haven’t yet!",
-                action="Upload resume now",
-                priority=CONFIG["priority_labels"]["resume"]
-            ))
-
-        # === Projects ===
-        if profile.projects_added == 0 and peer.batch_avg_projects >= CONFIG["profile_rules"]["projects_avg_threshold"]:
-            logger.info("Triggering project-based rule nudge.")
-            nudges.append(Nudge(
-                type="profile",
-                title="You haven't added any projects. Your peers have a head start!",
-                action="Showcase your work by adding a project.",
-                priority=CONFIG["priority_labels"]["project"]
-            ))
-
-        # === Buddies Attending Events ===
-        if len(peer.buddies_attending_events) >= CONFIG["engagement_rules"]["buddies_event_threshold"]:
-            logger.info("Triggering buddies attending event nudge.")
-            nudges.append(Nudge(
-                type="event",
-                title="Several of your buddies are attending events!",
-                action="Join them and don’t miss the opportunity.",
-                priority=CONFIG["priority_labels"]["event_fomo"]
-            ))
-
-        # === Large Peer Event Attendance ===
-        if any(count >= CONFIG["engagement_rules"]["event_peer_threshold"] for count in peer.batch_event_attendance.values()):
-            logger.info("Triggering peer event attendance rule nudge.")
-            nudges.append(Nudge(
-                type="event",
-                title="Many peers are attending trending events.",
-                action="Check them out and participate!",
-                priority=CONFIG["priority_labels"]["event_fomo"]
-            ))
-
-        # === Quiz Inactivity Nudge (quiz_history with dates only) ===
-        try:
-            quiz_dates = [datetime.strptime(q, "%Y-%m-%d") for q in profile.quiz_history if '-' in q]
-            if quiz_dates:
-                last_quiz_date = max(quiz_dates)
-                if (datetime.now() - last_quiz_date).days > CONFIG["engagement_rules"]["quiz_inactive_days"]:
-                    logger.info("Triggering quiz inactivity rule-based nudge.")
-                    nudges.append(Nudge(
-                        type="profile",
-                        title="It’s been a while since your last quiz!",
-                        action="Sharpen your skills with a new quiz today.",
-                        priority=CONFIG["priority_labels"]["quiz"]
-                    ))
-        except Exception as e:
-            logger.warning(f"Quiz date parse failed: {e}")
-
-        # === Comeback Event Nudge ===
-        if activity.last_event_attended:
-            last_event_date = datetime.strptime(str(activity.last_event_attended), "%Y-%m-%d")
-            if (datetime.now() - last_event_date).days > CONFIG["engagement_rules"]["user_inactive_days"]:
-                logger.info("Triggering comeback event nudge.")
-                nudges.append(Nudge(
-                    type="event",
-                    title="You’ve been inactive lately. Time to re-engage!",
-                    action="Explore new events and meet like-minded peers.",
-                    priority=CONFIG["priority_labels"]["comeback"]
-                ))
-
-        # === FOMO ===
-        fomo = get_event_fomo_insights(user.dict(), peer.dict())
-        days_since_event = 0
-        try:
-            if activity.last_event_attended:
-                last_event = datetime.strptime(str(activity.last_event_attended), "%Y-%m-%d")
-                days_since_event = (datetime.now() - last_event).days
-        except Exception as e:
-            logger.warning(f"Date parse failed: {e}")
-
-        if fomo["fomo_score"] >= CONFIG["profile_rules"]["event_fomo_threshold"] or days_since_event > 30:
-            logger.info("Triggering event FOMO rule-based nudge.")
-            nudges.append(Nudge(
-                type="event",
-                title=f"{fomo['fomo_level'].capitalize()} event FOMO detected",
-                action=". ".join(fomo["recommendations"]),
-                priority=CONFIG["priority_labels"]["event_fomo"]
-            ))
-
-        # === Resume ===
-        if len(nudges) < 3:
-            try:
-                features = {
-                    "karma": profile.karma,
-                    "projects_added": profile.projects_added,
-                    "resume_uploaded": int(profile.resume_uploaded),
-                    "batch_resume_uploaded_pct": peer.batch_resume_uploaded_pct
-                }
-                input_array = np.array([features[col] for col in model_resume.feature_names_in_]).reshape(1, -1)
-                prob = model_resume.predict_proba(input_array)[0][1]
-                logger.info(f"Resume ML model prob: {prob}")
-
-                if prob >= CONFIG["ml_rules"]["nudge_probability_threshold"]:
-                    logger.info("ML-based resume nudge triggered.")
-                    nudges.append(Nudge(
-                        type="profile",
-                        title="AI thinks uploading your resume could boost your visibility!",
-                        action="Update your profile with a resume.",
-                        priority="medium"
-                    ))
-            except Exception as e:
-                logger.error(f"Resume ML model failed: {e}")
-
-        # === Event ===
-        if len(nudges) < 3:
-            try:
-                features = {
-                    "karma": profile.karma,
-                    "resume_uploaded": int(profile.resume_uploaded),
-                    "event_fomo_score": fomo["fomo_score"],
-                    "batch_attending_events_count": peer.batch_attending_events_count
-                }
-                input_array = np.array([features[col] for col in model_event.feature_names_in_]).reshape(1, -1)
-                prob = model_event.predict_proba(input_array)[0][1]
-                logger.info(f"Event ML model prob: {prob}")
-
-                if prob >= CONFIG["ml_rules"]["nudge_probability_threshold"]:
-                    logger.info("ML-based event nudge triggered.")
-                    nudges.append(Nudge(
-                        type="event",
-                        title="AI suggests you may benefit from attending events!",
-                        action="Look out for upcoming events to join.",
-                        priority="medium"
-                    ))
-            except Exception as e:
-                logger.error(f"Event ML model failed: {e}")
-
-        # === FALLBACK if nufges < 3 ===
-        while len(nudges) < 3:
-            logger.info("Adding fallback nudge.")
-            nudges.append(Nudge(
-                type="profile",
-                title="Stay active to grow your presence!",
-                action="Explore community features and attend events.",
-                priority="low"
-            ))
-
-        return EngagementResponse(
-            user_id=user.user_id,
-            nudges=nudges[:3],
-            status="generated"
-        )
+        shadow.load()
+    except (OSError, ValueError) as e:
+        return JSONResponse(status_code=409, content={"detail": f"Candidate models not loaded: {e}"})
+    return shadow_report()
+
+# ---------------- PEER SNAPSHOTS ----------------
+# Upload once per batch, then send {"user_data": ..., "batch_id": ...} instead of the full snapshot
+@app.put("/peer-snapshots/{batch_id}", response_model=SnapshotInfo)
+def put_peer_snapshot(batch_id: str, snapshot: PeerSnapshot):
+    entry = snapshots.put(batch_id, snapshot)
+    logger.info("Peer snapshot %s stored as version %d", batch_id, entry.version)
+    return SnapshotInfo(batch_id=batch_id, version=entry.version, updated_at=entry.updated_at)
+
+@app.get("/peer-snapshots")
+def list_peer_snapshots():
+    return {"versions": snapshots.versions()}
+
+@app.get("/peer-snapshots/{batch_id}")
+def get_peer_snapshot(batch_id: str):
+    entry = _snapshot_or_404(batch_id)
+    return {
+        "batch_id": batch_id,
+        "version": entry.version,
+        "updated_at": entry.updated_at,
+        "peer_snapshot": entry.snapshot
+    }
+
+@app.delete("/peer-snapshots/{batch_id}")
+def delete_peer_snapshot(batch_id: str):
+    try:
+        snapshots.delete(batch_id)
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch_id: {batch_id}")
+    return {"batch_id": batch_id, "status": "deleted"}
+
+def _snapshot_or_404(batch_id):
+    try:
+        return snapshots.get(batch_id)
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch_id: {batch_id}")
+
+# An uploaded snapshot wins; a batch_id no snapshot was uploaded for may name a cohort.
+# UnknownBatchError if it names neither.
+def _lookup_peer(payload):
+    try:
+        return snapshots.resolve(payload)
+    except UnknownBatchError:
+        peer = cohorts.resolve(payload) if cohorts is not None else None
+        if peer is None:
+            raise
+        return peer
+
+def _resolve_peer(payload):
+    try:
+        return _lookup_peer(payload)
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch_id: {payload.batch_id}")
 
-    except Exception as e:
-        logger.exception(f"Unexpected failure for user {payload.user_data.user_id}: {e}")
-        fallback_nudges = [
-            Nudge(
-                type="profile",
-                title="We encountered an error analyzing your engagement.",
-                action="Please try again later or contact support.",
-                priority="low"
-            )
-        ]
-        return EngagementResponse(
-            user_id=payload.user_data.user_id,
-            nudges=fallback_nudges,
-            status="generated"
+# ---------------- COHORTS ----------------
+# Raw profiles and attendance in, peer snapshots out: each update adjusts its batch's aggregates
+# (see cohort_aggregator.py), and requests then send {"user_data": ..., "batch_id": ...} as for an
+# uploaded snapshot, with buddies_attending_events filled in for that user
+def _require_cohorts():
+    if cohorts is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Cohorts are held per process and this server runs {WORKERS} workers; serve them with --workers 1"
         )
 
+@app.put("/cohorts/members")
+def put_cohort_members(members: List[CohortMember]):
+    _require_cohorts()
+    for member in members:
+        cohorts.upsert_member(member.user_id, member.batch_id, member.profile, member.buddies)
+    return {"updated": len(members)}
+
+@app.delete("/cohorts/members/{user_id}")
+def delete_cohort_member(user_id: str):
+    _require_cohorts()
+    try:
+        cohorts.remove_member(user_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown user_id: {user_id}")
+    return {"user_id": user_id, "status": "deleted"}
+
+@app.post("/cohorts/attendance")
+def post_cohort_attendance(records: List[AttendanceRecord]):
+    _require_cohorts()
+    for record in records:
+        cohorts.record_attendance(record.user_id, record.event, record.attended)
+    return {"recorded": len(records)}
+
+@app.get("/cohorts")
+def list_cohorts():
+    _require_cohorts()
+    return {"cohorts": cohorts.stats()}
+
+# The batch's aggregated snapshot; with user_id, as that user's request would see it
+@app.get("/cohorts/{batch_id}/peer-snapshot")
+def get_cohort_snapshot(batch_id: str, user_id: Optional[str] = None):
+    _require_cohorts()
+    try:
+        peer = cohorts.peer(user_id, batch_id) if user_id else cohorts.batch_peer(batch_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch_id: {batch_id}")
+    return {"batch_id": batch_id, "version": peer.version, "peer_snapshot": peer.snapshot}
+
+# Time from the request reaching MetricsMiddleware to the handler running: body read,
+# JSON decoding, pydantic validation and threadpool dispatch
+def _observe_validation(request):
+    received = request.scope.get("state", {}).get("metrics_received_at")
+    if received is not None:
+        metrics.observe("engine_stage_seconds", metrics.clock() - received, stage="validation")
+
+# Scoring routes decode well-formed bodies without pydantic (see fast_path.py); anything else gets
+# FastAPI's usual validation and 422s, and the OpenAPI schema is unchanged
+engagement_router = APIRouter(route_class=fast_path_route(decode_engagement_request))
+batch_router = APIRouter(route_class=fast_path_route(decode_engagement_requests))
+
+# The engine returns nudge IDs + params; they are rendered from its catalogue in the locale the
+# client asks for (Accept-Language), straight to the JSON an EngagementResponse would produce
+def _request_locale(engine, request):
+    return engine.catalogue.negotiate(request.headers.get("accept-language"))
+
+@engagement_router.post("/analyze-engagement", response_model=EngagementResponse)
+def analyze_engagement(payload: EngagementRequest, request: Request):
+    if metrics.enabled:
+        _observe_validation(request)
+    peer = _resolve_peer(payload)
+    if response_cache is None:
+        engine = get_engine()
+        response = engine.evaluate(payload, peer)
+    else:
+        # read before the engine: if a reload clears the cache after this, put() drops the response
+        generation = response_cache.generation
+        engine = get_engine()
+        key = request_fingerprint(payload, peer)
+        response = response_cache.get(key)
+        if response is None:
+            response = engine.evaluate(payload, peer)
+            response_cache.put(key, response, generation)
+    if shadow is not None:
+        shadow.submit((payload,), (peer,))
+    if metrics.enabled:
+        request.scope["state"]["metrics_handler_done_at"] = metrics.clock()
+    content = engine.catalogue.render_json(response, _request_locale(engine, request))
+    return Response(content, media_type="application/json")
+
+# ---------------- MICRO-BATCHING ----------------
+# Scores one micro-batch from the coalescing endpoint on the batcher's thread pool: the same steps
+# as analyze_engagement, with one evaluate_many() call for every request the cache didn't answer
+# (one matrix per model once the batch is big enough). Results are the rendered JSON, or the
+# HTTPException for that request only.
+def _score_micro_batch(items):
+    generation = response_cache.generation if response_cache is not None else None
+    engine = get_engine()
+    results = [None] * len(items)
+    pending = []
+    resolved = []
+    for index, (payload, accept_language) in enumerate(items):
+        locale = engine.catalogue.negotiate(accept_language)
+        try:
+            peer = _resolve_peer(payload)
+        except HTTPException as e:
+            results[index] = e
+            continue
+        resolved.append((payload, peer))
+        key = None
+        if response_cache is not None:
+            key = request_fingerprint(payload, peer)
+            response = response_cache.get(key)
+            if response is not None:
+                results[index] = engine.catalogue.render_json(response, locale)
+                continue
+        pending.append((index, payload, peer, key, locale))
+    if pending:
+        responses = engine.evaluate_many([p[1] for p in pending], [p[2] for p in pending])
+        for (index, _, _, key, locale), response in zip(pending, responses):
+            if key is not None:
+                response_cache.put(key, response, generation)
+            results[index] = engine.catalogue.render_json(response, locale)
+    if shadow is not None and resolved:
+        shadow.submit(*zip(*resolved))
+    return results
+
+micro_batcher = MicroBatcher.from_config(CONFIG.get("micro_batching"), _score_micro_batch, metrics=metrics)
+
+# Same request and response as /analyze-engagement. Concurrent requests are coalesced into
+# micro-batches (see micro_batcher.py), so bursts are absorbed by the event loop instead of
+# queueing for the threadpool; 429 when the queue is full.
+@engagement_router.post(
+    "/analyze-engagement/coalesced",
+    response_model=EngagementResponse,
+    responses={429: {"description": "Too many requests queued; retry after the Retry-After seconds"}}
+)
+async def analyze_engagement_coalesced(payload: EngagementRequest, request: Request):
+    if micro_batcher is None:
+        raise HTTPException(status_code=404, detail="Micro-batching is disabled in config.json")
+    if metrics.enabled:
+        _observe_validation(request)
+    try:
+        content = await micro_batcher.submit((payload, request.headers.get("accept-language")))
+    except QueueFullError:
+        raise HTTPException(status_code=429, detail="Too many requests queued", headers={"Retry-After": "1"})
+    if metrics.enabled:
+        request.scope["state"]["metrics_handler_done_at"] = metrics.clock()
+    return Response(content, media_type="application/json")
+
+app.include_router(engagement_router)
+
+@app.get("/cache/stats")
+def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+# ---------------- BATCH SCORING ----------------
+BATCH_CHUNK_SIZE = 1024
+
+# Scores one chunk at a time so only a chunk of responses is ever held in memory
+def _stream_batch(engine, payloads, peers, locale):
+    for start in range(0, len(payloads), BATCH_CHUNK_SIZE):
+        end = start + BATCH_CHUNK_SIZE
+        for response in engine.evaluate_many(payloads[start:end], peers[start:end]):
+            yield engine.catalogue.render_json(response, locale) + b"\n"
+        if shadow is not None:
+            shadow.submit(payloads[start:end], peers[start:end])
+    logger.info("Batch analyzed for %d users", len(payloads))
+
+@batch_router.post(
+    "/analyze-engagement/batch",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "One EngagementResponse per line"}}
+)
+def analyze_engagement_batch(payloads: List[EngagementRequest], request: Request):
+    # resolved up front so an unknown batch_id is a 404 rather than a broken stream
+    peers = [_resolve_peer(payload) for payload in payloads]
+    engine = get_engine()
+    stream = _stream_batch(engine, payloads, peers, _request_locale(engine, request))
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
+app.include_router(batch_router)
+
+# ---------------- TOP-K TARGETING ----------------
+# Decoded NDJSON lines of a streamed body, a chunk at a time; only the current chunk is held
+async def _ndjson_chunks(request, size):
+    chunk, tail = [], b""
+    async for data in request.stream():
+        *lines, tail = (tail + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(_decode_ndjson_line(line))
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+    if tail.strip():
+        chunk.append(_decode_ndjson_line(tail))
+    if chunk:
+        yield chunk
+
+def _decode_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None  # counted as invalid by the ranker
+
+# The k users most strongly matching each nudge, from a cohort streamed as NDJSON request bodies
+# (one EngagementRequest per line): model probabilities for ml_resume / ml_event, the FOMO score for
+# event_fomo. The body is scored chunk by chunk as it arrives and only the top k are kept, so
+# cohorts of millions fit in bounded memory (see nudge_targeting.py).
+@app.post(
+    "/target/top-k",
+    openapi_extra={"requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}}}
+)
+async def target_top_k(
+    request: Request,
+    k: int = Query(100, ge=1, le=100_000),
+    nudge: Optional[List[str]] = Query(None, description=f"any of {', '.join(TARGET_SCORES)} (default: all)"),
+    goal_tag: Optional[List[str]] = Query(None, description="keep users with any of these goal_tags"),
+    club: Optional[List[str]] = Query(None, description="keep users in any of these clubs_joined"),
+    as_of: Optional[str] = Query(None, description="YYYY-MM-DD to score as of (default: today)")
+):
+    try:
+        ranker = CohortRanker(get_engine(), k, _lookup_peer, nudge or TARGET_SCORES, goal_tag, club, as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async for chunk in _ndjson_chunks(request, TARGETING_CHUNK_SIZE):
+        await run_in_threadpool(ranker.add, chunk)
+    logger.info("Top-%d targeting over %d users (%d matched)", k, ranker.received, ranker.matched)
+    return ranker.result()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
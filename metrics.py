@@ -0,0 +1,169 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds, from 10µs (rule checks) up to 2.5s (large batches)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+# Label values escaped as the text exposition format requires: backslash, double quote and line feed
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label_value(v)}"' for k, v in labels) + "}"
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+# In-process counters and latency histograms rendered in the Prometheus text format.
+# Metric keys are (name, labels) with labels as a tuple of (key, value) pairs.
+class Metrics:
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    # perf_counter when enabled; instrumented code calls metrics.clock() around each stage
+    clock = staticmethod(time.perf_counter)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def render(self, extra_gauges=None):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            histogram_data = [(key, list(h.counts), h.total, h.count) for key, h in histograms]
+
+        seen = set()
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for (name, labels), counts, total, count in histogram_data:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        for name, value in (extra_gauges or {}).items():
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+# Stand-in used when metrics are disabled: every call is a no-op and clock() never reads the clock
+class NullMetrics:
+    enabled = False
+
+    @staticmethod
+    def clock():
+        return 0.0
+
+    def describe(self, name, text):
+        pass
+
+    def inc(self, name, amount=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+NULL_METRICS = NullMetrics()
+
+def metrics_from_config(settings):
+    if settings and settings.get("enabled"):
+        metrics = Metrics()
+        metrics.describe("engine_stage_seconds", "Time spent in each stage of nudge evaluation.")
+        metrics.describe("engine_nudges_fired_total", "Rule and ML nudges that fired, by rule.")
+        metrics.describe("engine_ml_skipped_total", "ML branches skipped because three nudges were already decided.")
+        metrics.describe("engine_rules_skipped_total", "Rules not evaluated because three nudges were already decided.")
+        metrics.describe("engine_fallback_nudges_total", "Fallback nudges added to reach three nudges.")
+        metrics.describe("engine_error_fallback_total", "Requests answered with the error fallback response.")
+        metrics.describe("http_request_seconds", "End-to-end request latency, including validation and serialization.")
+        metrics.describe("http_requests_total", "HTTP requests by route and status code.")
+        metrics.describe("engine_reloads_total", "Config/model hot reloads, by result.")
+        metrics.describe("microbatch_batches_total", "Micro-batches scored by the coalescing endpoint.")
+        metrics.describe("microbatch_items_total", "Requests scored in micro-batches.")
+        metrics.describe("microbatch_rejected_total", "Coalescing requests rejected with 429 because the queue was full.")
+        metrics.describe("capture_records_total", "Requests sampled for capture and queued for writing.")
+        metrics.describe("capture_dropped_total", "Sampled requests dropped because the capture queue was full.")
+        metrics.describe("shadow_samples_total", "Scored requests queued for candidate (shadow) model scoring.")
+        metrics.describe("shadow_dropped_total", "Requests not shadow-scored because the shadow queue was full.")
+        metrics.describe("shadow_errors_total", "Shadow scoring batches that failed.")
+        return metrics
+    return NULL_METRICS
+
+# Pure ASGI middleware: end-to-end latency and status per route, plus the "validation" and
+# "serialization" stages around the handler (the handler stamps scope["state"], see main.py)
+class MetricsMiddleware:
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        started = state["metrics_received_at"] = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            finished = time.perf_counter()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.metrics.observe("http_request_seconds", finished - started, route=route)
+            self.metrics.inc("http_requests_total", route=route, status=str(status))
+            handler_done = state.get("metrics_handler_done_at")
+            if handler_done is not None:
+                self.metrics.observe("engine_stage_seconds", finished - handler_done, stage="serialization")
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import NULL_METRICS
+
+# Raised by MicroBatcher.submit() when max_queue items are already waiting; the API answers 429
+class QueueFullError(Exception):
+    pass
+
+# Coalesces concurrent single requests into micro-batches.
+# submit() adds an item to the open batch and waits for its result. A batch closes window seconds
+# after its first item, or as soon as it holds max_batch items, and process(items) runs on a pool of
+# max_concurrency threads, so the event loop never scores anything and at most that many batches
+# are scored at once. process returns one result per item, or an exception instance to raise
+# to that item's caller only. Items queued or being scored are capped at max_queue: past that,
+# submit() raises QueueFullError straight away instead of letting the backlog grow.
+# Call submit() from one event loop (one per uvicorn worker).
+class MicroBatcher:
+    def __init__(self, process, window=0.002, max_batch=64, max_queue=1024, max_concurrency=2, metrics=NULL_METRICS):
+        if window < 0 or max_batch < 1 or max_queue < 1 or max_concurrency < 1:
+            raise ValueError("micro_batching needs window_ms >= 0 and max_batch, max_queue, max_concurrency >= 1")
+        self.process = process
+        self.window = window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.max_concurrency = max_concurrency
+        self.metrics = metrics
+        self._pending = []  # (item, future) for the batch still open
+        self._timer = None
+        self._queued = 0
+        self._executor = None  # started on first use, so nothing runs before serve.py forks
+        self.batches = self.items = self.rejected = 0
+
+    async def submit(self, item):
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            self.metrics.inc("microbatch_rejected_total")
+            raise QueueFullError(f"{self._queued} requests already queued")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self._queued += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="microbatch")
+        self.batches += 1
+        self.items += len(batch)
+        self.metrics.inc("microbatch_batches_total")
+        self.metrics.inc("microbatch_items_total", len(batch))
+        loop = asyncio.get_running_loop()
+        done = loop.run_in_executor(self._executor, self._run, [item for item, _ in batch])
+        done.add_done_callback(lambda done: self._deliver(batch, done))
+
+    # Runs on the pool; times the batch from the moment a thread picks it up
+    def _run(self, items):
+        started = time.perf_counter()
+        try:
+            return self.process(items)
+        finally:
+            self.metrics.observe("engine_stage_seconds", time.perf_counter() - started, stage="microbatch")
+
+    # Fans the batch's results back out; callers that have gone away (cancelled) are skipped
+    def _deliver(self, batch, done):
+        self._queued -= len(batch)
+        error = done.exception() if not done.cancelled() else asyncio.CancelledError()
+        results = done.result() if error is None else None
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            result = error if error is not None else results[index]
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "rejected": self.rejected
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # Batcher built from the "micro_batching" section of config.json; None when disabled
+    @classmethod
+    def from_config(cls, settings, process, metrics=NULL_METRICS):
+        if not settings or not settings.get("enabled"):
+            return None
+        return cls(
+            process,
+            window=settings.get("window_ms", 2) / 1000,
+            max_batch=settings.get("max_batch", 64),
+            max_queue=settings.get("max_queue", 1024),
+            max_concurrency=settings.get("max_concurrency", 2),
+            metrics=metrics
+        )
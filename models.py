@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, root_validator
 from typing import List, Dict, Optional
 from datetime import date
 
@@ -31,7 +31,15 @@ class UserData(BaseModel):
 
 class EngagementRequest(BaseModel):
     user_data: UserData
-    peer_snapshot: PeerSnapshot
+    # Either embed the peer snapshot, or reference one uploaded via PUT /peer-snapshots/{batch_id}
+    peer_snapshot: Optional[PeerSnapshot] = None
+    batch_id: Optional[str] = None
+
+    @root_validator(skip_on_failure=True)
+    def check_peer_source(cls, values):
+        if (values.get("peer_snapshot") is None) == (values.get("batch_id") is None):
+            raise ValueError("provide exactly one of 'peer_snapshot' or 'batch_id'")
+        return values
 
     class Config:
         json_schema_extra = {
@@ -66,6 +74,23 @@ class EngagementRequest(BaseModel):
             }
         }
 
+class SnapshotInfo(BaseModel):
+    batch_id: str
+    version: int
+    updated_at: float
+
+# Cohort analytics input (PUT /cohorts/members): a student's raw profile and, optionally, buddy list
+class CohortMember(BaseModel):
+    user_id: str
+    batch_id: str
+    profile: Profile
+    buddies: Optional[List[str]] = None
+
+class AttendanceRecord(BaseModel):
+    user_id: str
+    event: str
+    attended: bool = True
+
 #Output Model
 class Nudge(BaseModel):
     type: str
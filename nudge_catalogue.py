@@ -0,0 +1,386 @@
+import json
+import sys
+import zlib
+from functools import lru_cache
+from string import Formatter
+from event_fomo_score import FOMO_RECOMMENDATIONS
+
+try:
+    import orjson
+except ImportError:  # optional, as in fast_path.py
+    orjson = None
+
+# Nudge catalogue: every nudge the engine can return, keyed by ID, with its type, priority and text.
+# The engine only emits NudgeRef(id, params); titles and actions are rendered from the catalogue
+# when a response is serialized, so wording, translations and A/B copy tests never touch scoring.
+# Templates use str.format fields ("{pct}%"). A field with a "values" table renders the template
+# its value names (a list of keys is joined with the entry's "separator"); a plain list is joined
+# with ", ". Static text is interned and pre-encoded to JSON once, at load time.
+
+DEFAULT_LOCALE = "en"
+
+# Params the engine passes for each nudge ID, and the keys it may use for fields with a values table.
+# The catalogue in config.json is checked against this when it is loaded (and on hot reload).
+NUDGE_PARAMS = {
+    "resume": ("pct",),
+    "project": (),
+    "buddies_event": (),
+    "peer_event": (),
+    "quiz": (),
+    "comeback": (),
+    "event_fomo": ("level", "recommendations", "events"),
+    "ml_resume": (),
+    "ml_event": (),
+    "fallback": (),
+    "error": ()
+}
+NUDGE_VALUES = {
+    "event_fomo": {"level": ("low", "medium", "high"), "recommendations": tuple(FOMO_RECOMMENDATIONS)}
+}
+
+# The catalogue texts and priorities; the one copy of them. config.json's "nudges" section only holds
+# changes on top (catalogue overrides, locales, experiments), and event_fomo's recommendations are
+# the engine's own FOMO_RECOMMENDATIONS.
+DEFAULT_NUDGES = {
+    "resume": {"type": "profile", "priority": "high",
+               "title": "{pct}% of your peers have uploaded resumes. You haven’t yet!",
+               "action": "Upload resume now"},
+    "project": {"type": "profile", "priority": "medium",
+                "title": "You haven't added any projects. Your peers have a head start!",
+                "action": "Showcase your work by adding a project."},
+    "buddies_event": {"type": "event", "priority": "high",
+                      "title": "Several of your buddies are attending events!",
+                      "action": "Join them and don’t miss the opportunity."},
+    "peer_event": {"type": "event", "priority": "high",
+                   "title": "Many peers are attending trending events.",
+                   "action": "Check them out and participate!"},
+    "quiz": {"type": "profile", "priority": "medium",
+             "title": "It’s been a while since your last quiz!",
+             "action": "Sharpen your skills with a new quiz today."},
+    "comeback": {"type": "event", "priority": "high",
+                 "title": "You’ve been inactive lately. Time to re-engage!",
+                 "action": "Explore new events and meet like-minded peers."},
+    "event_fomo": {"type": "event", "priority": "high",
+                   "title": "{level} event FOMO detected",
+                   "action": "{recommendations}",
+                   "separator": ". ",
+                   "values": {"level": {"low": "Low", "medium": "Medium", "high": "High"},
+                              "recommendations": dict(FOMO_RECOMMENDATIONS)}},
+    "ml_resume": {"type": "profile", "priority": "medium",
+                  "title": "AI thinks uploading your resume could boost your visibility!",
+                  "action": "Update your profile with a resume."},
+    "ml_event": {"type": "event", "priority": "medium",
+                 "title": "AI suggests you may benefit from attending events!",
+                 "action": "Look out for upcoming events to join."},
+    "fallback": {"type": "profile", "priority": "low",
+                 "title": "Stay active to grow your presence!",
+                 "action": "Explore community features and attend events."},
+    "error": {"type": "profile", "priority": "low",
+              "title": "We encountered an error analyzing your engagement.",
+              "action": "Please try again later or contact support."}
+}
+
+# Pre-catalogue configs set priorities in "priority_labels"; still honoured, over the catalogue
+LEGACY_PRIORITY_LABELS = {
+    "resume": ("resume",),
+    "project": ("project",),
+    "event_fomo": ("event_fomo", "buddies_event", "peer_event"),
+    "quiz": ("quiz",),
+    "comeback": ("comeback",)
+}
+TEXT_FIELDS = ("title", "action", "separator", "values")
+
+# One nudge in an engine result: a catalogue ID plus the params its templates need.
+# Nudges without params are shared module-level instances; treat them as immutable.
+class NudgeRef:
+    __slots__ = ("id", "params")
+
+    def __init__(self, nudge_id, params=None):
+        self.id = nudge_id
+        self.params = params
+
+    def __repr__(self):
+        return f"NudgeRef({self.id!r}, {self.params!r})"
+
+# What NudgeEngine.evaluate() returns; NudgeCatalogue.render() turns it into the EngagementResponse shape
+class EngagementResult:
+    __slots__ = ("user_id", "nudges", "status")
+
+    def __init__(self, user_id, nudges, status="generated"):
+        self.user_id = user_id
+        self.nudges = nudges
+        self.status = status
+
+    def __repr__(self):
+        return f"EngagementResult({self.user_id!r}, {self.nudges!r}, {self.status!r})"
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class _Template:
+    __slots__ = ("static", "parts", "fields")
+
+    def __init__(self, text):
+        if not isinstance(text, str):
+            raise ValueError(f"template must be a string, got {text!r}")
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (not field.isidentifier() or conversion):
+                raise ValueError(f"template field must be a plain name: {{{field}}} in {text!r}")
+            parts.append((sys.intern(literal), field, spec or ""))
+        self.fields = tuple(field for _, field, _ in parts if field is not None)
+        self.static = sys.intern(text) if not self.fields else None
+        self.parts = tuple(parts)
+
+    def render(self, params, nudge):
+        if self.static is not None:
+            return self.static
+        out = []
+        for literal, field, spec in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = params[field]
+            table = nudge.values.get(field)
+            if table is not None:
+                if isinstance(value, (list, tuple)):
+                    out.append(nudge.separator.join(table[key].render(params, nudge) for key in value))
+                else:
+                    out.append(table[value].render(params, nudge))
+            elif isinstance(value, (list, tuple)):
+                out.append(", ".join(map(str, value)))
+            else:
+                out.append(format(value, spec))
+        return "".join(out)
+
+# One catalogue entry in one locale (and A/B arm), compiled for rendering
+class _CompiledNudge:
+    __slots__ = ("type", "priority", "title", "action", "separator", "values", "head", "tail",
+                 "title_json", "action_json", "fragment", "content")
+
+    def __init__(self, nudge_id, entry):
+        for key in ("type", "priority", "title", "action"):
+            if not isinstance(entry.get(key), str):
+                raise ValueError(f"nudge '{nudge_id}' needs a string '{key}'")
+        params = NUDGE_PARAMS[nudge_id]
+        allowed_values = NUDGE_VALUES.get(nudge_id, {})
+        self.type = sys.intern(entry["type"])
+        self.priority = sys.intern(entry["priority"])
+        self.separator = entry.get("separator", " ")
+        self.values = {}
+        for field, table in entry.get("values", {}).items():
+            if field not in allowed_values:
+                raise ValueError(f"nudge '{nudge_id}' has a values table for unknown field '{field}'")
+            missing = set(allowed_values[field]) - set(table)
+            if missing:
+                raise ValueError(f"nudge '{nudge_id}' values.{field} is missing {sorted(missing)}")
+            self.values[field] = {key: _Template(text) for key, text in table.items()}
+        self.title = _Template(entry["title"])
+        self.action = _Template(entry["action"])
+
+        templates = [self.title, self.action] + [t for table in self.values.values() for t in table.values()]
+        for template in templates:
+            unknown = set(template.fields) - set(params)
+            if unknown:
+                raise ValueError(f"nudge '{nudge_id}' template uses unknown params {sorted(unknown)}; "
+                                 f"available: {list(params)}")
+        for table in self.values.values():
+            for template in table.values():
+                if set(template.fields) & set(self.values):
+                    raise ValueError(f"nudge '{nudge_id}' values templates can't use fields that have values tables")
+        for field in allowed_values:
+            if field not in self.values and any(field in t.fields for t in (self.title, self.action)):
+                raise ValueError(f"nudge '{nudge_id}' uses '{{{field}}}' without a values table")
+
+        self.head = b'{"type":' + _dumps(self.type) + b',"title":'
+        self.tail = b',"priority":' + _dumps(self.priority) + b"}"
+        self.title_json = _dumps(self.title.static) if self.title.static is not None else None
+        self.action_json = _dumps(self.action.static) if self.action.static is not None else None
+        self.fragment = self.content = None
+        if self.title_json is not None and self.action_json is not None:
+            self.fragment = self.head + self.title_json + b',"action":' + self.action_json + self.tail
+            self.content = {"type": self.type, "title": self.title.static,
+                            "action": self.action.static, "priority": self.priority}
+
+    def render(self, params):
+        if self.content is not None:
+            return dict(self.content)
+        return {
+            "type": self.type,
+            "title": self.title.render(params, self),
+            "action": self.action.render(params, self),
+            "priority": self.priority
+        }
+
+    def render_json(self, params):
+        if self.fragment is not None:
+            return self.fragment
+        title = self.title_json or _dumps(self.title.render(params, self))
+        action = self.action_json or _dumps(self.action.render(params, self))
+        return b"".join((self.head, title, b',"action":', action, self.tail))
+
+def _merge(entry, override):
+    merged = {**entry, **override}
+    if "values" in override:
+        merged["values"] = {
+            field: {**entry.get("values", {}).get(field, {}), **table}
+            for field, table in {**entry.get("values", {}), **override["values"]}.items()
+        }
+    return merged
+
+# Deterministic A/B arm for one user: the same user_id always sees the same copy
+def _bucket(experiment, user_id):
+    return zlib.crc32(f"{experiment}:{user_id}".encode("utf-8")) / 2 ** 32
+
+# Compiled nudge catalogue, built from the "nudges" section of config.json:
+#   "locale": default locale of the catalogue texts (default "en")
+#   "catalogue": {id: {type, priority, title, action[, separator, values]}} over DEFAULT_NUDGES
+#   "locales": {locale: {id: {title, action, separator, values}}} translations, any subset
+#   "experiments": {name: {"nudge": id, "arms": {arm: {"weight": 0.1, title/action/priority...,
+#                   "locales": {locale: {...}}}}}} the rest of the traffic sees the catalogue text;
+#                   an arm only applies in its locales (the default locale unless it lists others)
+class NudgeCatalogue:
+    def __init__(self, catalogue=None, locale=DEFAULT_LOCALE, locales=None, experiments=None):
+        base = {nudge_id: dict(entry) for nudge_id, entry in DEFAULT_NUDGES.items()}
+        for nudge_id, entry in (catalogue or {}).items():
+            if nudge_id not in NUDGE_PARAMS:
+                raise ValueError(f"Unknown nudge id in catalogue: {nudge_id!r}")
+            base[nudge_id] = _merge(base[nudge_id], entry)
+        self.locale = locale.lower()
+        translations = {self.locale: {}}
+        for name, entries in (locales or {}).items():
+            for nudge_id, entry in entries.items():
+                if nudge_id not in NUDGE_PARAMS:
+                    raise ValueError(f"Unknown nudge id in locale '{name}': {nudge_id!r}")
+                if set(entry) - set(TEXT_FIELDS):
+                    raise ValueError(f"locale '{name}' can only override {TEXT_FIELDS} of nudge '{nudge_id}'")
+            translations[name.lower()] = entries
+        self.locales = tuple(translations)
+
+        # locale -> id -> entry dict, then compiled
+        entries = {
+            name: {nudge_id: _merge(entry, overrides.get(nudge_id, {})) for nudge_id, entry in base.items()}
+            for name, overrides in translations.items()
+        }
+        self._nudges = {
+            name: {nudge_id: _CompiledNudge(nudge_id, entry) for nudge_id, entry in table.items()}
+            for name, table in entries.items()
+        }
+
+        # locale -> id -> (experiment, ((cumulative weight, arm name, compiled), ...))
+        self._experiments = {name: {} for name in self.locales}
+        for experiment, spec in (experiments or {}).items():
+            nudge_id = spec.get("nudge")
+            if nudge_id not in NUDGE_PARAMS:
+                raise ValueError(f"experiment '{experiment}' targets unknown nudge {nudge_id!r}")
+            if any(nudge_id in table for table in self._experiments.values()):
+                raise ValueError(f"nudge '{nudge_id}' is in more than one experiment")
+            arms = spec.get("arms", {})
+            for arm_name, arm in arms.items():
+                unknown = set(arm) - {"weight", "priority", "locales", *TEXT_FIELDS}
+                if unknown or not 0 <= arm.get("weight", 0) <= 1:
+                    raise ValueError(f"experiment '{experiment}' arm '{arm_name}' needs a weight in [0, 1] "
+                                     f"and only text, priority and locales overrides")
+            if sum(arm.get("weight", 0) for arm in arms.values()) > 1:
+                raise ValueError(f"experiment '{experiment}' arm weights add up to more than 1")
+            for name in self.locales:
+                compiled, upper = [], 0.0
+                for arm_name, arm in arms.items():
+                    upper += arm.get("weight", 0)
+                    if name == self.locale:
+                        text = {k: v for k, v in arm.items() if k not in ("weight", "locales")}
+                    elif name in arm.get("locales", {}):
+                        text = {k: v for k, v in arm["locales"][name].items() if k in TEXT_FIELDS}
+                        text["priority"] = arm.get("priority", entries[name][nudge_id]["priority"])
+                    else:
+                        continue
+                    compiled.append((upper, arm_name, _CompiledNudge(nudge_id, _merge(entries[name][nudge_id], text))))
+                if compiled:
+                    self._experiments[name][nudge_id] = (experiment, tuple(compiled))
+
+        self.negotiate = lru_cache(maxsize=256)(self._negotiate)
+
+    @classmethod
+    def from_config(cls, config):
+        section = config.get("nudges", {})
+        catalogue = {nudge_id: dict(entry) for nudge_id, entry in section.get("catalogue", {}).items()}
+        for label, nudge_ids in LEGACY_PRIORITY_LABELS.items():
+            if label in config.get("priority_labels", {}):
+                for nudge_id in nudge_ids:
+                    catalogue[nudge_id] = {**catalogue.get(nudge_id, {}), "priority": config["priority_labels"][label]}
+        return cls(
+            catalogue,
+            locale=section.get("locale", DEFAULT_LOCALE),
+            locales=section.get("locales"),
+            experiments=section.get("experiments")
+        )
+
+    # Best supported locale for an Accept-Language header ("hi-IN,hi;q=0.9,en;q=0.8"); cached per header
+    def _negotiate(self, accept_language):
+        if not accept_language:
+            return self.locale
+        ranked = []
+        for position, item in enumerate(accept_language.split(",")):
+            tag, _, q = item.strip().partition(";q=")
+            try:
+                weight = float(q) if q else 1.0
+            except ValueError:
+                continue
+            ranked.append((-weight, position, tag.strip().lower()))
+        for weight, _, tag in sorted(ranked):
+            if weight == 0:
+                break
+            if tag in self._nudges:
+                return tag
+            if tag.split("-", 1)[0] in self._nudges:
+                return tag.split("-", 1)[0]
+            if tag == "*":
+                return self.locale
+        return self.locale
+
+    # The compiled nudge this user sees: an experiment arm if one applies, else the catalogue entry
+    def _compiled(self, nudge_id, locale, user_id):
+        experiment = self._experiments[locale].get(nudge_id)
+        if experiment is not None:
+            name, arms = experiment
+            bucket = _bucket(name, user_id)
+            for upper, _, compiled in arms:
+                if bucket < upper:
+                    return compiled
+        return self._nudges[locale][nudge_id]
+
+    # Arm of `experiment` a user is in (None: control); for joining analytics to what was shown
+    def arm(self, experiment, user_id):
+        bucket = _bucket(experiment, user_id)
+        for table in self._experiments.values():
+            for name, arms in table.values():
+                if name == experiment:
+                    return next((arm for upper, arm, _ in arms if bucket < upper), None)
+        return None
+
+    def _locale(self, locale):
+        locale = (locale or self.locale).lower()
+        return locale if locale in self._nudges else self.locale
+
+    # EngagementResult -> dict in the EngagementResponse shape
+    def render(self, result, locale=None):
+        locale = self._locale(locale)
+        return {
+            "user_id": result.user_id,
+            "nudges": [self._compiled(n.id, locale, result.user_id).render(n.params) for n in result.nudges],
+            "status": result.status
+        }
+
+    # EngagementResult -> the JSON bytes FastAPI would send for render(result) as an EngagementResponse
+    def render_json(self, result, locale=None):
+        locale = self._locale(locale)
+        nudges = b",".join(self._compiled(n.id, locale, result.user_id).render_json(n.params) for n in result.nudges)
+        return b"".join((b'{"user_id":', _dumps(result.user_id), b',"nudges":[', nudges,
+                         b'],"status":', _dumps(result.status), b"}"))
+
+    # EngagementResult -> models.EngagementResponse, for callers that want the pydantic model
+    def to_response(self, result, locale=None):
+        from models import EngagementResponse
+        return EngagementResponse.parse_obj(self.render(result, locale))
@@ -0,0 +1,176 @@
+# Top-K nudge targeting: "the k users in this cohort most likely to respond to nudge X".
+# Requests are scored a chunk at a time with NudgeEngine.target_scores() (both models' predict_proba
+# and the FOMO score, as column operations), and only the best k per nudge are kept between chunks:
+# each chunk is merged into them with np.argpartition, never a full sort, so memory is O(k + chunk)
+# however many users are streamed through. Ties rank in input order, which makes the result exactly
+# what a stable full sort by score would give.
+#   python nudge_targeting.py users.ndjson --k 5000 --nudge ml_event --goal-tag GRE
+# Input records are read like bulk_score.py reads them (full request bodies, or bare user_data joined
+# to --peers); main.py serves the same ranking as POST /target/top-k.
+import argparse
+import json
+import sys
+import time
+from datetime import date
+import numpy as np
+from pydantic import ValidationError
+from day_clock import to_ordinal
+from engine import TARGET_SCORES
+from fast_path import decode_engagement_request
+from models import EngagementRequest
+
+CHUNK_SIZE = 4096
+
+# The k highest (score, position) pairs pushed so far; NaN scores are never kept
+class TopK:
+    def __init__(self, k):
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        self.scores = np.empty(0)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=object)
+        self.floor = np.nan
+
+    # scores, positions (input order, unique) and user_ids are equal-length arrays for one chunk
+    def push(self, scores, positions, user_ids):
+        keep = ~np.isnan(scores)
+        if len(self.scores) == self.k:  # full: a score below the current k-th can never get in
+            keep &= scores >= self.floor
+        scores = np.concatenate([self.scores, scores[keep]])
+        positions = np.concatenate([self.positions, positions[keep]])
+        user_ids = np.concatenate([self.user_ids, user_ids[keep]])
+        if len(scores) > self.k:
+            best = _select(scores, positions, self.k)
+            scores, positions, user_ids = scores[best], positions[best], user_ids[best]
+        self.scores, self.positions, self.user_ids = scores, positions, user_ids
+        self.floor = scores.min() if len(scores) else np.nan
+
+    # [(user_id, score)] best first; only the k survivors are sorted
+    def ranked(self):
+        order = np.lexsort((self.positions, -self.scores))
+        return list(zip(self.user_ids[order].tolist(), self.scores[order].tolist()))
+
+# Indices of the k best rows: argpartition finds the k-th highest score, then every row above it
+# is kept and rows tied with it are taken in position order up to k
+def _select(scores, positions, k):
+    threshold = scores[np.argpartition(scores, len(scores) - k)[len(scores) - k]]
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)
+    if len(above) + len(tied) > k:
+        tied = tied[np.argsort(positions[tied], kind="stable")[:k - len(above)]]
+    return np.concatenate([above, tied])
+
+# Streams request bodies through NudgeEngine.target_scores() and keeps the top k per nudge.
+# goal_tags / clubs_joined: keep only users with at least one of the given tags / clubs (both, if both
+# are given). resolve_peer(payload) returns the PeerAggregates for a request and raises KeyError for
+# an unknown batch_id; such requests, and bodies that fail validation, are counted and skipped.
+# The whole ranking is scored as of one day: as_of, or the engine's clock when the ranker is built.
+class CohortRanker:
+    def __init__(self, engine, k, resolve_peer, nudges=TARGET_SCORES, goal_tags=None, clubs_joined=None, as_of=None):
+        unknown = set(nudges) - set(TARGET_SCORES)
+        if unknown or not nudges:
+            raise ValueError(f"Unknown nudges {sorted(unknown)}; choose from {list(TARGET_SCORES)}")
+        self.engine = engine
+        self.k = k
+        self.resolve_peer = resolve_peer
+        self.goal_tags = frozenset(goal_tags) if goal_tags else None
+        self.clubs_joined = frozenset(clubs_joined) if clubs_joined else None
+        self.today = engine.as_of_clock() if as_of is None else to_ordinal(as_of)
+        self.top = {nudge: TopK(k) for nudge in dict.fromkeys(nudges)}
+        self.received = self.matched = self.invalid = 0
+
+    def matches(self, profile):
+        return (
+            (self.goal_tags is None or not self.goal_tags.isdisjoint(profile.goal_tags))
+            and (self.clubs_joined is None or not self.clubs_joined.isdisjoint(profile.clubs_joined))
+        )
+
+    # Decoded JSON request bodies, in input order
+    def add(self, bodies):
+        payloads, peers, positions = [], [], []
+        for position, body in enumerate(bodies, self.received):
+            payload = decode_engagement_request(body)
+            try:
+                if payload is None:
+                    payload = EngagementRequest.parse_obj(body)
+                if not self.matches(payload.user_data.profile):
+                    continue
+                peer = self.resolve_peer(payload)
+            except (ValidationError, KeyError):
+                self.invalid += 1
+                continue
+            payloads.append(payload)
+            peers.append(peer)
+            positions.append(position)
+        self.received += len(bodies)
+        if not payloads:
+            return
+        self.matched += len(payloads)
+        scores = self.engine.target_scores(payloads, peers, self.today)
+        positions = np.array(positions, dtype=np.int64)
+        user_ids = np.array([p.user_data.user_id for p in payloads], dtype=object)
+        for nudge, top in self.top.items():
+            top.push(scores[nudge], positions, user_ids)
+
+    def result(self):
+        return {
+            "as_of": date.fromordinal(self.today).isoformat(),
+            "k": self.k,
+            "users_received": self.received,
+            "users_matched": self.matched,
+            "users_invalid": self.invalid,
+            "top": {
+                nudge: [{"user_id": user_id, "score": score} for user_id, score in top.ranked()]
+                for nudge, top in self.top.items()
+            }
+        }
+
+def main():
+    from engine import NudgeEngine, load_config, load_scorers, CONFIG_PATH
+    from snapshot_registry import SnapshotRegistry
+    from models import PeerSnapshot
+    from bulk_score import iter_records, iter_payloads, load_peers, chunked
+
+    parser = argparse.ArgumentParser(description="Rank a file of users by how strongly each nudge applies to them.")
+    parser.add_argument("input", help="NDJSON (.ndjson/.jsonl), CSV (.csv) or JSON array (.json) of users")
+    parser.add_argument("--k", type=int, default=100, help="users to return per nudge")
+    parser.add_argument("--nudge", action="append", choices=TARGET_SCORES, help="nudge to rank for (default: all)")
+    parser.add_argument("--goal-tag", action="append", help="keep users with any of these goal_tags")
+    parser.add_argument("--club", action="append", help="keep users in any of these clubs_joined")
+    parser.add_argument("--output", default="-", help="JSON result (default: stdout)")
+    parser.add_argument("--input-format", choices=["ndjson", "json", "csv"])
+    parser.add_argument("--peers", default="peer_snapshot.json", help="peer contexts for records without one")
+    parser.add_argument("--batch-field", help="record field naming the peer context (default: round-robin)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--model-format", choices=["json", "pickle"], default="json")
+    parser.add_argument("--as-of", type=to_ordinal, help="score as of this YYYY-MM-DD date (default: today)")
+    args = parser.parse_args()
+
+    peers = load_peers(args.peers)
+    registry = SnapshotRegistry()
+    for batch_id, snapshot in peers.items():
+        registry.put(batch_id, PeerSnapshot.parse_obj(snapshot))
+    engine = NudgeEngine(load_config(args.config), *load_scorers(model_format=args.model_format))
+    ranker = CohortRanker(engine, args.k, registry.resolve, args.nudge or TARGET_SCORES,
+                          args.goal_tag, args.club, args.as_of)
+
+    started = time.perf_counter()
+    records = iter_records(args.input, args.input_format and "." + args.input_format)
+    for chunk in chunked(iter_payloads(records, list(peers), args.batch_field), args.chunk_size):
+        ranker.add(chunk)
+    elapsed = time.perf_counter() - started
+
+    result = ranker.result()
+    if args.output == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    print(f"✅ {ranker.received:,} users ranked in {elapsed:.2f}s ({ranker.received / max(elapsed, 1e-9):,.0f} users/sec), "
+          f"{ranker.matched:,} matched the filters, {ranker.invalid:,} invalid -> {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Replays captured requests (request_capture.py) against a running instance and diffs the responses.
+#   - fires the captured request bodies, with their captured headers (content type, Accept-Language),
+#     at their paths at --rate requests/sec (open loop: requests go out on schedule whether or not
+#     earlier ones have returned), at most --concurrency in flight
+#   - every response is compared with the captured one: status and JSON body must be identical
+#   - latency: the target's server-side time (its Server-Timing header, present when its capture
+#     middleware is enabled; sample_rate may be 0) against the captured server-side time, plus the
+#     client round trip
+# Day-count rules depend on the day, so run the target pinned to the capture day:
+#   ENGAGEMENT_AS_OF=2025-07-01 uvicorn main:app --port 8000
+#   python replay_capture.py captures/ --target http://127.0.0.1:8000 --rate 200 --as-of 2025-07-01
+# Exits 1 if any response differs, so a refactor of main.py can be checked in CI.
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+import numpy as np
+import httpx
+from latency_stats import latency_summary
+from request_capture import SEGMENT_SUFFIX, PARTIAL_SUFFIX
+
+# Segment files under `paths` (files or directories) in name order, i.e. capture order per worker
+def segment_files(paths, include_partial=False):
+    suffixes = (SEGMENT_SUFFIX, PARTIAL_SUFFIX) if include_partial else (SEGMENT_SUFFIX,)
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(suffixes))
+        else:
+            files.append(path)
+    return sorted(files)
+
+# Captured records; a segment cut short (a worker killed mid-write) yields what was complete
+def iter_captures(files, as_of=None):
+    for path in files:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # last line of a truncated segment
+                    record = json.loads(line)
+                    if as_of is None or record["as_of"] == as_of:
+                        yield record
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            print(f"📌 '{path}' ends early ({e}); replaying the records before that", file=sys.stderr)
+
+def server_timing_ms(response):
+    for part in response.headers.get("server-timing", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name == "app" and params.startswith("dur="):
+            return float(params[len("dur="):])
+    return None
+
+# Captures written before headers were recorded were all JSON posts in the default locale
+LEGACY_HEADERS = {"content-type": "application/json"}
+
+# Fires `records` through `client` and compares every response with the captured one
+async def replay(client, records, rate=0.0, concurrency=32, show=5):
+    result = {
+        "replayed": 0, "errors": 0, "mismatches": 0, "status_mismatches": 0,
+        "mismatch_examples": [], "as_of": Counter()
+    }
+    captured_ms, server_ms, client_ms = [], [], []
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    async def fire(record):
+        try:
+            request = record["request"]
+            content = request.encode("utf-8") if isinstance(request, str) else json.dumps(request).encode("utf-8")
+            sent = time.perf_counter()
+            try:
+                response = await client.post(record["path"], content=content, headers=record.get("headers", LEGACY_HEADERS))
+            except httpx.HTTPError as e:
+                result["errors"] += 1
+                if len(result["mismatch_examples"]) < show:
+                    result["mismatch_examples"].append({"path": record["path"], "error": repr(e)})
+                return
+            client_ms.append((time.perf_counter() - sent) * 1000)
+            result["replayed"] += 1
+            result["as_of"][record["as_of"]] += 1
+            captured_ms.append(record["latency_ms"])
+            timing = server_timing_ms(response)
+            if timing is not None:
+                server_ms.append(timing)
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            if response.status_code != record["status"] or body != record["response"]:
+                result["mismatches"] += 1
+                result["status_mismatches"] += response.status_code != record["status"]
+                if len(result["mismatch_examples"]) < show:
+                    result["mismatch_examples"].append({
+                        "path": record["path"], "as_of": record["as_of"], "request": request,
+                        "captured": {"status": record["status"], "response": record["response"]},
+                        "replayed": {"status": response.status_code, "response": body}
+                    })
+        finally:
+            slots.release()
+
+    started = loop.time()
+    for index, record in enumerate(records):
+        if rate > 0:
+            delay = started + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await slots.acquire()
+        task = asyncio.create_task(fire(record))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    wall = loop.time() - started
+
+    result["as_of"] = dict(result["as_of"])
+    result["achieved_rps"] = round(result["replayed"] / wall, 1) if wall > 0 else 0.0
+    result["latency"] = {}
+    if captured_ms:
+        captured = _percentiles(captured_ms)
+        result["latency"]["captured_server"] = captured
+        result["latency"]["replay_client"] = latency_summary(np.array(client_ms) / 1000, wall)
+        if server_ms:
+            replayed = _percentiles(server_ms)
+            result["latency"]["replay_server"] = replayed
+            result["latency"]["server_delta_ms"] = {k: round(replayed[k] - captured[k], 3) for k in captured}
+    return result
+
+def _percentiles(values_ms):
+    values = np.asarray(values_ms)
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured requests against a running instance and diff the responses.")
+    parser.add_argument("captures", nargs="+", help="capture segments (.ndjson.gz) or directories of them")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--rate", type=float, default=100.0, help="requests/sec (0 = as fast as --concurrency allows)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight at most")
+    parser.add_argument("--as-of", help="only replay records captured as of this YYYY-MM-DD day")
+    parser.add_argument("--limit", type=int, help="replay at most this many records")
+    parser.add_argument("--include-partial", action="store_true", help="also replay segments still being written (.part)")
+    parser.add_argument("--show", type=int, default=5, help="mismatches to print")
+    parser.add_argument("--report", help="write the full result as JSON here")
+    args = parser.parse_args()
+
+    files = segment_files(args.captures, args.include_partial)
+    if not files:
+        raise SystemExit(f"📌 No capture segments (*{SEGMENT_SUFFIX}) in {args.captures}")
+    records = iter_captures(files, args.as_of)
+    if args.limit:
+        records = (record for _, record in zip(range(args.limit), records))
+
+    async def run():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=30.0) as client:
+            return await replay(client, records, args.rate, args.concurrency, args.show)
+
+    result = asyncio.run(run())
+    result["target"] = args.target
+    result["segments"] = len(files)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    for example in result["mismatch_examples"]:
+        print(json.dumps(example, ensure_ascii=False))
+    latency = result["latency"]
+    if "replay_server" in latency:
+        print("⏱  server-side ms  " + "  ".join(
+            f"{k[:-3]}: {latency['captured_server'][k]:.3f} -> {latency['replay_server'][k]:.3f} ({latency['server_delta_ms'][k]:+.3f})"
+            for k in latency["captured_server"]))
+    elif latency:
+        print("📌 The target sent no Server-Timing header (enable its capture middleware); client round trips only")
+    if latency:
+        client = latency["replay_client"]
+        print(f"⏱  client round trip  p50: {client['p50_ms']:.3f}  p95: {client['p95_ms']:.3f}  p99: {client['p99_ms']:.3f} ms "
+              f"at {result['achieved_rps']:,} req/s")
+    if len(result["as_of"]) > 1:
+        print(f"📌 Records span several as-of days {sorted(result['as_of'])}; replay one at a time with --as-of "
+              f"against a target started with that ENGAGEMENT_AS_OF")
+    ok = result["mismatches"] == 0 and result["errors"] == 0
+    print(f"{'✅' if ok else '❌'} {result['replayed']:,} requests replayed from {len(files)} segment(s): "
+          f"{result['mismatches']:,} mismatches ({result['status_mismatches']:,} status), {result['errors']:,} errors")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
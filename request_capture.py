@@ -0,0 +1,236 @@
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from datetime import date
+from metrics import NULL_METRICS
+
+# "capture" section of config.json; off unless enabled
+CAPTURE_DEFAULTS = {
+    "enabled": False,
+    "sample_rate": 0.01,
+    "paths": ["/analyze-engagement", "/analyze-engagement/coalesced"],
+    "directory": "captures",
+    "anonymize_user_id": False,
+    "segment_records": 50000,
+    "segment_seconds": 300,
+    "max_queue": 10000
+}
+# Request headers that change the response (fast path vs validation, nudge locale), kept so a
+# replay sends the same ones
+CAPTURED_HEADERS = ("content-type", "accept-language")
+SEGMENT_SUFFIX = ".ndjson.gz"
+# A segment still being written; renamed to SEGMENT_SUFFIX once closed
+PARTIAL_SUFFIX = SEGMENT_SUFFIX + ".part"
+_STOP = object()
+
+# Writes captured requests to gzip NDJSON segments on a background thread.
+# submit() only puts the raw bytes on a bounded queue (dropping and counting the record when it is
+# full), so a request never waits on JSON decoding, hashing, compression or the disk. Each segment is
+# written once, front to back, under a ".part" name and renamed when it reaches segment_records or
+# segment_seconds, so finished segments never change. Names carry the pid, so the workers of
+# serve.py can share one directory. One JSON line per request:
+#   {"ts", "as_of", "path", "status", "latency_ms", "headers", "request", "response"}
+# With anonymize_salt, user_data.user_id in the request and wherever the response echoes it are
+# replaced by the same keyed hash, so a replay still echoes back the captured response.
+class CaptureWriter:
+    def __init__(self, directory, segment_records=50000, segment_seconds=300, max_queue=10000,
+                 anonymize_salt=None, metrics=NULL_METRICS):
+        if segment_records < 1 or segment_seconds <= 0 or max_queue < 1:
+            raise ValueError("capture needs segment_records, segment_seconds and max_queue > 0")
+        self.directory = directory
+        self.segment_records = segment_records
+        self.segment_seconds = segment_seconds
+        self.anonymize_salt = anonymize_salt
+        self.metrics = metrics
+        self._queue = queue.Queue(max_queue)
+        self._thread = None  # started on first submit, so nothing runs before serve.py forks
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.captured = self.dropped = self.written = self.segments = 0
+
+    # ts, as_of (day ordinal), path, status, latency (seconds), the CAPTURED_HEADERS the request
+    # carried ({name: value}) and the raw request/response bodies
+    def submit(self, ts, as_of, path, status, latency, headers, request_body, response_body):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((ts, as_of, path, status, latency, headers, request_body, response_body))
+        except queue.Full:
+            self.dropped += 1
+            self.metrics.inc("capture_dropped_total")
+            return False
+        self.captured += 1
+        self.metrics.inc("capture_records_total")
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        segment = path = None
+        records = 0
+        opened_at = 0.0
+        while True:
+            try:
+                # with a segment open, wake up to close it on time even when no requests arrive
+                item = self._queue.get(timeout=1.0 if segment is not None else None)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                if segment is None:
+                    path = self._next_path()
+                    segment = gzip.open(path + ".part", "wb")
+                    records, opened_at = 0, time.monotonic()
+                segment.write(self._encode(*item))
+                records += 1
+                self.written += 1
+            if segment is not None and (records >= self.segment_records or time.monotonic() - opened_at >= self.segment_seconds):
+                self._finish(segment, path)
+                segment = None
+        if segment is not None:
+            self._finish(segment, path)
+
+    def _next_path(self):
+        self._sequence += 1
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:05d}"
+        return os.path.join(self.directory, name + SEGMENT_SUFFIX)
+
+    def _finish(self, segment, path):
+        segment.close()
+        os.replace(path + ".part", path)
+        self.segments += 1
+
+    def _encode(self, ts, as_of, path, status, latency, headers, request_body, response_body):
+        request, response = _decode(request_body), _decode(response_body)
+        if self.anonymize_salt is not None:
+            user = request.get("user_data") if isinstance(request, dict) else None
+            if isinstance(user, dict) and isinstance(user.get("user_id"), str):
+                user_id = user["user_id"]
+                user["user_id"] = self.anonymize(user_id)
+                # the response echoes it: as user_id, or inside a 422's "input"
+                response = _replace_value(response, user_id, user["user_id"])
+        record = {
+            "ts": round(ts, 3),
+            "as_of": date.fromordinal(as_of).isoformat(),
+            "path": path,
+            "status": status,
+            "latency_ms": round(latency * 1000, 3),
+            "headers": headers,
+            "request": request,
+            "response": response
+        }
+        return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def anonymize(self, user_id):
+        return "anon-" + hmac.new(self.anonymize_salt, user_id.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "written": self.written,
+            "segments": self.segments
+        }
+
+    # Writes out what is queued and closes the open segment; a later submit() starts a new one
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    # Writer built from the "capture" section of config.json; None when disabled. The anonymization
+    # key is ENGAGEMENT_CAPTURE_SALT, or random per process (hashes then differ between workers).
+    @classmethod
+    def from_config(cls, settings, metrics=NULL_METRICS):
+        settings = {**CAPTURE_DEFAULTS, **(settings or {})}
+        if not settings["enabled"]:
+            return None
+        salt = None
+        if settings["anonymize_user_id"]:
+            salt = os.environ.get("ENGAGEMENT_CAPTURE_SALT", "").encode("utf-8") or secrets.token_bytes(16)
+        return cls(
+            settings["directory"],
+            segment_records=settings["segment_records"],
+            segment_seconds=settings["segment_seconds"],
+            max_queue=settings["max_queue"],
+            anonymize_salt=salt,
+            metrics=metrics
+        )
+
+# JSON body as a value; anything else (not JSON, not UTF-8) as text
+def _decode(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+# `value` with every string equal to `old` (at any depth) replaced by `new`
+def _replace_value(value, old, new):
+    if isinstance(value, dict):
+        return {key: _replace_value(item, old, new) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_replace_value(item, old, new) for item in value]
+    return new if value == old else value
+
+_CAPTURED_HEADER_NAMES = frozenset(name.encode("latin-1") for name in CAPTURED_HEADERS)
+
+# Pure ASGI middleware: for POSTs to `paths`, adds a Server-Timing header with the server-side
+# latency (receipt to response start), and hands a `sample_rate` share of the requests, with their
+# response, to a CaptureWriter. Unsampled requests only pay for the header.
+class CaptureMiddleware:
+    def __init__(self, app, writer, paths, sample_rate, as_of_clock):
+        self.app = app
+        self.writer = writer
+        self.paths = frozenset(paths)
+        self.sample_rate = sample_rate
+        self.as_of_clock = as_of_clock
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        sampled = random.random() < self.sample_rate
+        request_body, response_body = [], []
+        status, latency = 500, 0.0
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.append(message.get("body", b""))
+            return message
+
+        async def send_and_keep(message):
+            nonlocal status, latency
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - started
+                status = message["status"]
+                timing = (b"server-timing", f"app;dur={latency * 1000:.3f}".encode("ascii"))
+                message = {**message, "headers": [*message.get("headers", []), timing]}
+            elif message["type"] == "http.response.body" and sampled:
+                response_body.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    headers = {name.decode("latin-1"): value.decode("latin-1")
+                               for name, value in scope["headers"] if name in _CAPTURED_HEADER_NAMES}
+                    self.writer.submit(time.time(), self.as_of_clock(), scope["path"], status, latency, headers,
+                                       b"".join(request_body), b"".join(response_body))
+            await send(message)
+
+        await self.app(scope, receive_and_keep if sampled else receive, send_and_keep)
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# Key made of only the request fields NudgeEngine actually reads (plus user_id, which is echoed back).
+# goal_tags, clubs_joined, login_streak, posts_created and buddies_interacted never change the output.
+def request_fingerprint(payload, peer):
+    profile = payload.user_data.profile
+    activity = payload.user_data.activity
+    if peer.batch_id is not None:
+        # versions are only unique per source: an uploaded snapshot and a cohort may share a batch_id
+        peer_key = ("batch", peer.source, peer.batch_id, peer.version)
+    else:
+        peer_key = (
+            peer.batch_avg_projects,
+            peer.batch_resume_uploaded_pct,
+            tuple(peer.batch_event_attendance.items()),
+            tuple(peer.buddies_attending_events)
+        )
+    return (
+        payload.user_data.user_id,
+        profile.resume_uploaded,
+        profile.karma,
+        profile.projects_added,
+        profile.buddy_count,
+        tuple(profile.quiz_history),
+        activity.last_event_attended,
+        peer_key
+    )
+
+def _next_midnight(now):
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).timestamp()
+
+# Bounded LRU cache of engagement responses.
+# Entries expire after ttl_seconds or at the next local midnight, whichever comes first, because the
+# day-count rules (quiz, comeback, FOMO) depend on today's date. The whole cache is dropped when any
+# watched file (config.json, model pickles) changes; files are re-stat'ed at most every check_interval seconds.
+# Every drop bumps `generation`: callers read it before fetching the engine and pass it to put(), so
+# a response computed by an engine that was swapped out (and the cache cleared) meanwhile is not stored.
+class ResponseCache:
+    def __init__(self, max_entries=10000, ttl_seconds=3600, watch_paths=(), check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.watch_paths = tuple(watch_paths)
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._next_check = time.monotonic() + check_interval
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _file_stamp(self):
+        stamp = []
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _check_sources(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def get(self, key):
+        with self._lock:
+            self._check_sources()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, response = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    # False (and nothing stored) when the cache was cleared since `generation` was read
+    def put(self, key, response, generation):
+        now = time.time()
+        expires_at = min(now + self.ttl_seconds, _next_midnight(datetime.fromtimestamp(now)))
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+    # Cache built from the "response_cache" section of config.json; None when disabled
+    @classmethod
+    def from_config(cls, settings, watch_paths=()):
+        if not settings or not settings.get("enabled"):
+            return None
+        return cls(
+            max_entries=settings.get("max_entries", 10000),
+            ttl_seconds=settings.get("ttl_seconds", 3600),
+            watch_paths=watch_paths
+        )
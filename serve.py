@@ -0,0 +1,204 @@
+# Production server: N uvicorn worker processes sharing one listening socket, with rolling reloads.
+#   - the supervisor imports the heavy dependencies once and forks the workers, so their code pages
+#     are shared copy-on-write instead of being loaded N times
+#   - peer snapshots live in one directory (FileSnapshotRegistry) that every worker reads
+#   - SIGHUP (or a change to config.json / the model artifacts, with watch_interval > 0) starts a new
+#     worker, waits until it is serving, then gracefully stops an old one, one at a time; needed for
+#     settings outside hot reload (logging, metrics, cache, micro-batching, startup), not for thresholds or models
+#   - SIGTERM / SIGINT stop all workers gracefully
+# POSIX only (fork + signals); on Windows use "uvicorn main:app".
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import uvicorn
+from engine import load_config, source_paths
+
+logger = logging.getLogger("serve")
+
+SERVING_DEFAULTS = {
+    "host": "0.0.0.0",
+    "port": 8000,
+    "workers": 0,                 # 0: one per available core
+    "snapshot_dir": "data/peer_snapshots",
+    "graceful_timeout": 30,       # seconds a stopping worker gets to finish in-flight requests
+    "watch_interval": 0           # seconds between artifact checks for a rolling restart; 0 disables
+                                  # (workers hot-reload rules and models themselves, see "hot_reload")
+}
+
+# Imported before forking so every worker shares them; main.py itself is imported in the
+# worker so each generation reads config.json and the artifacts afresh
+PRELOAD_MODULES = ("numpy", "pydantic", "fastapi", "starlette", "httpx", "models", "engine",
+                   "event_fomo_score", "logistic_scorer", "snapshot_registry", "response_cache",
+                   "metrics", "logging_setup", "nudge_catalogue", "fast_path", "day_clock", "micro_batcher",
+                   "cohort_aggregator", "nudge_targeting", "request_capture", "shadow_models")
+
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Listening socket shared by all workers. Created with an explicit IPPROTO_TCP because asyncio
+# only sets TCP_NODELAY on accepted connections whose socket proto is TCP; uvicorn's
+# Config.bind_socket() leaves it at 0, and Nagle + delayed ACKs then add ~40 ms per keep-alive request.
+def bind_socket(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+# Reports readiness to the supervisor once the app's startup hooks (model warm-up) have run
+class _Server(uvicorn.Server):
+    def __init__(self, config, ready):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+def _run_worker(config, sock, ready):
+    _Server(config, ready).run(sockets=[sock])
+
+class Supervisor:
+    def __init__(self, settings):
+        self.settings = settings
+        self.context = multiprocessing.get_context("fork")
+        self.config = uvicorn.Config(
+            "main:app",
+            host=settings["host"],
+            port=settings["port"],
+            timeout_graceful_shutdown=settings["graceful_timeout"]
+        )
+        self.workers = []
+        self.reload_requested = False
+        self.stopping = False
+        self.watch_paths = source_paths(model_format=settings["model_format"])
+
+    def _spawn(self):
+        ready = self.context.Event()
+        process = self.context.Process(target=_run_worker, args=(self.config, self.sock, ready))
+        process.start()
+        return process, ready
+
+    def _stop(self, process):
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join(self.settings["graceful_timeout"] + 5)
+        if process.is_alive():
+            logger.warning("Worker %d did not stop in time; killing it", process.pid)
+            process.kill()
+            process.join()
+
+    # Replace workers one at a time, so capacity never drops by more than one worker
+    def rolling_reload(self):
+        logger.info("Rolling reload of %d workers", len(self.workers))
+        for index, (old, _) in enumerate(list(self.workers)):
+            if self.stopping:
+                return
+            process, ready = self._spawn()
+            if not ready.wait(self.settings["graceful_timeout"]) or not process.is_alive():
+                logger.error("Replacement worker failed to start; keeping the running workers")
+                self._stop(process)
+                return
+            self.workers[index] = (process, ready)
+            self._stop(old)
+        logger.info("Rolling reload complete")
+
+    def _stamps(self):
+        stamps = []
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return stamps
+
+    def _on_hup(self, signum, frame):
+        self.reload_requested = True
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        count = self.settings["workers"] or default_workers()
+        self.sock = bind_socket(self.settings["host"], self.settings["port"])
+        for name in PRELOAD_MODULES:
+            __import__(name)
+
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        # Read by main.py: per-process state (cohorts) is only served when there is one worker
+        os.environ["ENGAGEMENT_WORKERS"] = str(count)
+        self.workers = [self._spawn() for _ in range(count)]
+        logger.info("Serving on %s:%d with %d workers (supervisor pid %d)",
+                    self.settings["host"], self.settings["port"], count, os.getpid())
+
+        interval = self.settings["watch_interval"]
+        stamps = self._stamps()
+        last_check = time.monotonic()
+        while not self.stopping:
+            time.sleep(0.2)
+            # Restart workers that died outside a reload
+            for index, (process, _) in enumerate(self.workers):
+                if not process.is_alive() and not self.stopping:
+                    logger.warning("Worker %d exited with %s; restarting it", process.pid, process.exitcode)
+                    self.workers[index] = self._spawn()
+            if interval and time.monotonic() - last_check >= interval:
+                last_check = time.monotonic()
+                current = self._stamps()
+                if current != stamps:
+                    logger.info("Config or model artifacts changed")
+                    stamps = current
+                    self.reload_requested = True
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_reload()
+
+        logger.info("Stopping %d workers", len(self.workers))
+        for process, _ in self.workers:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        for process, _ in self.workers:
+            self._stop(process)
+        self.sock.close()
+
+def main():
+    config = load_config()
+    settings = {**SERVING_DEFAULTS, **config.get("serving", {})}
+    settings["model_format"] = config.get("startup", {}).get("model_format", "json")
+    parser = argparse.ArgumentParser(description="Serve the Engagement Insight Engine with multiple worker processes.")
+    parser.add_argument("--host", default=settings["host"])
+    parser.add_argument("--port", type=int, default=settings["port"])
+    parser.add_argument("--workers", type=int, default=settings["workers"], help="0 = one per core")
+    parser.add_argument("--snapshot-dir", default=settings["snapshot_dir"])
+    parser.add_argument("--watch-interval", type=float, default=settings["watch_interval"])
+    args = parser.parse_args()
+    settings.update(host=args.host, port=args.port, workers=args.workers,
+                    snapshot_dir=args.snapshot_dir, watch_interval=args.watch_interval)
+
+    # Own handler rather than basicConfig: workers inherit the root logger and configure it themselves
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [serve] %(levelname)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs fork(); run 'uvicorn main:app' on this platform")
+    # Read by main.py in every worker: peer snapshots uploaded to one worker are visible to all
+    os.environ["ENGAGEMENT_SNAPSHOT_DIR"] = os.path.abspath(settings["snapshot_dir"])
+    Supervisor(settings).run()
+
+if __name__ == "__main__":
+    main()
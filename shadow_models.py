@@ -0,0 +1,288 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from engine import MODEL_FEATURES, load_scorers, model_paths
+from engine_reloader import source_fingerprint
+from metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
+
+# "shadow" section of config.json; off unless enabled
+SHADOW_DEFAULTS = {
+    "enabled": False,
+    "model_dir": "models/candidate",
+    "model_format": "json",
+    "batch_size": 256,
+    "max_queue": 10000,
+    "flush_seconds": 1.0
+}
+# Equal-width probability bins for the drift histograms and PSI
+DRIFT_BINS = 20
+# Floor for empty bins in the PSI, so one empty bin doesn't make it infinite
+PSI_EPSILON = 1e-4
+
+# Running comparison of one model's live and candidate probabilities on the same rows.
+# A model "nudges" a row when its probability clears nudge_probability_threshold, as the ML rules
+# check it; agreement is both models making the same call. Drift is measured on the probability
+# distributions: mean and absolute differences per row, and the population stability index (PSI)
+# of the candidate's histogram against the live model's.
+class ModelComparison:
+    def __init__(self):
+        self.samples = 0
+        self.decisions = np.zeros(4, dtype=np.int64)  # both, live only, candidate only, neither
+        self.sum_live = self.sum_candidate = self.sum_abs_diff = self.max_abs_diff = 0.0
+        self.hist_live = np.zeros(DRIFT_BINS, dtype=np.int64)
+        self.hist_candidate = np.zeros(DRIFT_BINS, dtype=np.int64)
+
+    def add(self, live, candidate, threshold):
+        live_nudge = live >= threshold
+        candidate_nudge = candidate >= threshold
+        self.decisions += np.bincount(2 * ~live_nudge + ~candidate_nudge, minlength=4)
+        diff = np.abs(candidate - live)
+        self.samples += len(live)
+        self.sum_live += float(live.sum())
+        self.sum_candidate += float(candidate.sum())
+        self.sum_abs_diff += float(diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(diff.max(initial=0.0)))
+        self.hist_live += _histogram(live)
+        self.hist_candidate += _histogram(candidate)
+
+    def psi(self):
+        live = np.maximum(self.hist_live / self.samples, PSI_EPSILON)
+        candidate = np.maximum(self.hist_candidate / self.samples, PSI_EPSILON)
+        return float(np.sum((candidate - live) * np.log(candidate / live)))
+
+    def report(self):
+        if not self.samples:
+            return {"samples": 0}
+        both, live_only, candidate_only, neither = self.decisions.tolist()
+        return {
+            "samples": self.samples,
+            "agreement_rate": round((both + neither) / self.samples, 6),
+            "decisions": {"both": both, "live_only": live_only, "candidate_only": candidate_only, "neither": neither},
+            "nudge_rate": {
+                "live": round((both + live_only) / self.samples, 6),
+                "candidate": round((both + candidate_only) / self.samples, 6)
+            },
+            "mean_probability": {
+                "live": round(self.sum_live / self.samples, 6),
+                "candidate": round(self.sum_candidate / self.samples, 6)
+            },
+            "mean_abs_diff": round(self.sum_abs_diff / self.samples, 6),
+            "max_abs_diff": round(self.max_abs_diff, 6),
+            "psi": round(self.psi(), 6),
+            "histogram": {
+                "bins": DRIFT_BINS,
+                "live": self.hist_live.tolist(),
+                "candidate": self.hist_candidate.tolist()
+            }
+        }
+
+def _histogram(probabilities):
+    bins = np.minimum((probabilities * DRIFT_BINS).astype(np.int64), DRIFT_BINS - 1)
+    return np.bincount(bins, minlength=DRIFT_BINS)
+
+# Scores live traffic with a candidate model set (e.g. a retrain written by
+# train_model.py --model-dir models/candidate) next to the live one, without touching responses.
+# submit() only appends the already-validated requests and their peers to an in-memory queue of at
+# most max_queue requests; when that is full they are dropped and counted, never waited on. A
+# background thread takes batches of batch_size requests (or what arrived within flush_seconds),
+# builds their feature rows once with NudgeEngine.model_columns() and scores them with both the
+# live engine's models and the candidate's, one matrix per model, into a ModelComparison each.
+# Comparisons restart when the candidate is reloaded or reset() is called (e.g. on an engine swap).
+class ShadowEvaluator:
+    MODELS = ("resume", "event")
+
+    def __init__(self, model_dir, get_engine, model_format="json", batch_size=256, max_queue=10000,
+                 flush_seconds=1.0, metrics=NULL_METRICS):
+        if batch_size < 1 or max_queue < 1 or flush_seconds <= 0:
+            raise ValueError("shadow needs batch_size, max_queue and flush_seconds > 0")
+        self.model_dir = model_dir
+        self.model_format = model_format
+        self.get_engine = get_engine
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.flush_seconds = flush_seconds
+        self.metrics = metrics
+        self.candidate = None  # (resume scorer, event scorer)
+        self.fingerprint = None
+        self.load_error = None
+        self._pending = deque()  # (payloads, peers) as submitted
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stop = False
+        self._thread = None  # started on first submit, so nothing runs before serve.py forks
+        self.submitted = self.dropped = 0  # since the process started
+        self._generation = 0  # bumped on every load/reset; batches scored for an older one are discarded
+        self._reset()
+
+    # Loads the candidate models; ValueError/OSError if they can't be loaded or need features
+    # the engine does not provide. Comparisons restart from zero.
+    def load(self):
+        try:
+            scorers = load_scorers(self.model_dir, self.model_format)
+            for name, scorer in zip(self.MODELS, scorers):
+                unknown = set(scorer.feature_names) - set(MODEL_FEATURES)
+                if unknown:
+                    raise ValueError(f"candidate {name} model expects features the engine does not provide: {sorted(unknown)}")
+            fingerprint = source_fingerprint(model_paths(self.model_dir, self.model_format))
+        except (OSError, ValueError) as e:
+            self.load_error = str(e)
+            raise
+        with self._stats_lock:
+            self.candidate, self.fingerprint, self.load_error = scorers, fingerprint, None
+            self._reset()
+        logger.info("Shadow candidate models loaded from %s (%s)", self.model_dir, fingerprint)
+        return fingerprint
+
+    # Loads the candidate if no load has been tried yet; a failure is logged and kept in load_error
+    def ensure_loaded(self):
+        if self.candidate is None and self.load_error is None:
+            try:
+                self.load()
+            except (OSError, ValueError) as e:
+                logger.error("Shadow candidate models not loaded from %s: %s", self.model_dir, e)
+
+    def reset(self):
+        with self._stats_lock:
+            self._reset()
+
+    def _reset(self):
+        self._generation += 1
+        self._comparisons = {name: ModelComparison() for name in self.MODELS}
+        self.since = time.time()
+        self.scored = self.skipped = self.batches = self.errors = 0
+
+    # Queues parsed requests and their PeerAggregates for shadow scoring; False if dropped
+    def submit(self, payloads, peers):
+        n = len(payloads)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shadow-models", daemon=True)
+                self._thread.start()
+            if self._queued + n > self.max_queue:
+                self.dropped += n
+                self.metrics.inc("shadow_dropped_total", n)
+                return False
+            self._pending.append((payloads, peers))
+            self._queued += n
+            self.submitted += n
+            if self._queued >= self.batch_size:
+                self._cond.notify()
+        self.metrics.inc("shadow_samples_total", n)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stop and self._queued < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+                payloads, peers = [], []
+                while self._pending and len(payloads) < self.batch_size:
+                    batch_payloads, batch_peers = self._pending.popleft()
+                    payloads.extend(batch_payloads)
+                    peers.extend(batch_peers)
+                self._queued -= len(payloads)
+                stop = self._stop and not self._pending
+            if payloads:
+                self._score(payloads, peers)
+            if stop:
+                return
+
+    def _score(self, payloads, peers):
+        started = time.perf_counter()
+        self.ensure_loaded()
+        with self._stats_lock:
+            candidate, generation = self.candidate, self._generation
+            if candidate is None:
+                self.skipped += len(payloads)
+                return
+        try:
+            engine = self.get_engine()
+            threshold = engine.nudge_probability_threshold
+            columns = engine.model_columns(payloads, peers)
+            scored = []
+            for name, live, shadow in zip(self.MODELS, (engine.resume_scorer, engine.event_scorer), candidate):
+                scored.append((
+                    name,
+                    live.predict_proba(np.column_stack([columns[c] for c in live.feature_names])),
+                    shadow.predict_proba(np.column_stack([columns[c] for c in shadow.feature_names]))
+                ))
+        except Exception as e:
+            logger.exception("Shadow scoring failed for %d requests: %s", len(payloads), e)
+            with self._stats_lock:
+                self.errors += 1
+            self.metrics.inc("shadow_errors_total")
+            return
+        with self._stats_lock:
+            if generation != self._generation:
+                return  # scored for a candidate or engine that has since been replaced
+            for name, live, shadow in scored:
+                self._comparisons[name].add(live, shadow, threshold)
+            self.scored += len(payloads)
+            self.batches += 1
+        self.metrics.observe("engine_stage_seconds", time.perf_counter() - started, stage="shadow")
+
+    # Comparisons since the last load/reset, with the queue counters since the process started
+    def report(self):
+        with self._stats_lock:
+            models = {name: comparison.report() for name, comparison in self._comparisons.items()}
+            report = {
+                "candidate": {
+                    "model_dir": self.model_dir,
+                    "model_format": self.model_format,
+                    "fingerprint": self.fingerprint,
+                    "load_error": self.load_error
+                },
+                "since": self.since,
+                "scored": self.scored,
+                "skipped": self.skipped,
+                "batches": self.batches,
+                "errors": self.errors,
+                "models": models
+            }
+        report["queue"] = {"queued": self._queued, "max_queue": self.max_queue,
+                           "submitted": self.submitted, "dropped": self.dropped}
+        return report
+
+    # Gauges for /metrics: queue depth, and agreement rate and PSI per model once scored
+    def stats(self):
+        stats = {"queued": self._queued, "scored": self.scored}
+        with self._stats_lock:
+            for name, comparison in self._comparisons.items():
+                if comparison.samples:
+                    decisions = comparison.decisions
+                    stats[f"{name}_agreement_rate"] = round(int(decisions[0] + decisions[3]) / comparison.samples, 6)
+                    stats[f"{name}_psi"] = round(comparison.psi(), 6)
+        return stats
+
+    # Scores what is queued, then stops the thread; a later submit() starts a new one
+    def close(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stop = thread is not None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        self._stop = False
+
+    # Evaluator built from the "shadow" section of config.json; None when disabled.
+    # A relative model_dir is relative to this directory, like models/.
+    @classmethod
+    def from_config(cls, settings, get_engine, metrics=NULL_METRICS):
+        settings = {**SHADOW_DEFAULTS, **(settings or {})}
+        if not settings["enabled"]:
+            return None
+        return cls(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), settings["model_dir"]),
+            get_engine,
+            model_format=settings["model_format"],
+            batch_size=settings["batch_size"],
+            max_queue=settings["max_queue"],
+            flush_seconds=settings["flush_seconds"],
+            metrics=metrics
+        )
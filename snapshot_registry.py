@@ -0,0 +1,216 @@
+import json
+import os
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-memory SnapshotRegistry is available
+    fcntl = None
+import threading
+import time
+from urllib.parse import quote, unquote
+from models import PeerSnapshot
+
+# Everything the engine reads from a PeerSnapshot, derived once per snapshot instead of once per request
+class PeerAggregates:
+    __slots__ = (
+        "batch_avg_projects", "batch_resume_uploaded_pct", "batch_event_attendance",
+        "buddies_attending_events", "buddies_attending", "max_attendance", "batch_score",
+        "batch_id", "version", "source", "updated_at"
+    )
+
+    # source: what assigned batch_id's versions, "snapshot" (a registry) or "cohort" (cohort_aggregator.py)
+    def __init__(self, snapshot, batch_id=None, version=0, source="snapshot"):
+        attendance = snapshot.batch_event_attendance
+        self.batch_avg_projects = snapshot.batch_avg_projects
+        self.batch_resume_uploaded_pct = snapshot.batch_resume_uploaded_pct
+        self.batch_event_attendance = attendance
+        self.buddies_attending_events = snapshot.buddies_attending_events
+        self.buddies_attending = len(snapshot.buddies_attending_events)
+        # "any event at or above the peer threshold" becomes one comparison against the max
+        self.max_attendance = max(attendance.values(), default=float("-inf"))
+        # same expression calculate_event_fomo_score uses for its batch score
+        batch_scores = [min(count / 10, 1.0) for count in attendance.values()]
+        self.batch_score = sum(batch_scores) / len(batch_scores) if batch_scores else 0
+        self.batch_id = batch_id
+        self.version = version
+        self.source = source
+        self.updated_at = time.time()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot)
+
+    # A copy with another user's buddies_attending_events (and version); the batch fields are shared, not recomputed
+    def with_buddies(self, buddies_attending_events, version=None):
+        copy = object.__new__(PeerAggregates)
+        for name in PeerAggregates.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.buddies_attending_events = buddies_attending_events
+        copy.buddies_attending = len(buddies_attending_events)
+        if version is not None:
+            copy.version = version
+        return copy
+
+    # The snapshot as a plain dict (PeerSnapshot field order); built on demand, the engine never needs it
+    @property
+    def snapshot(self):
+        return {
+            "batch_avg_projects": self.batch_avg_projects,
+            "batch_resume_uploaded_pct": self.batch_resume_uploaded_pct,
+            "batch_event_attendance": self.batch_event_attendance,
+            "buddies_attending_events": self.buddies_attending_events
+        }
+
+class UnknownBatchError(KeyError):
+    pass
+
+# In-memory store of uploaded peer snapshots keyed by batch_id.
+# Each upload is aggregated once and gets the next version number for that batch; versions carry on
+# after a delete, so (batch_id, version) always names one snapshot (response_cache.py keys on it).
+# Readers get whole PeerAggregates objects, so a refresh never exposes a half-updated entry.
+class SnapshotRegistry:
+    def __init__(self):
+        self._entries = {}
+        self._last_versions = {}  # batch_id -> last version given out, kept after a delete
+        self._lock = threading.Lock()
+
+    def put(self, batch_id, snapshot):
+        with self._lock:
+            version = self._last_versions.get(batch_id, 0) + 1
+            entry = PeerAggregates(snapshot, batch_id=batch_id, version=version)
+            self._entries[batch_id] = entry
+            self._last_versions[batch_id] = version
+        return entry
+
+    def get(self, batch_id):
+        entry = self._entries.get(batch_id)
+        if entry is None:
+            raise UnknownBatchError(batch_id)
+        return entry
+
+    def delete(self, batch_id):
+        with self._lock:
+            if self._entries.pop(batch_id, None) is None:
+                raise UnknownBatchError(batch_id)
+
+    def versions(self):
+        return {batch_id: entry.version for batch_id, entry in list(self._entries.items())}
+
+    # Peer aggregates for a request: the registered batch if it names one, else its embedded snapshot
+    def resolve(self, payload):
+        if payload.batch_id is not None:
+            return self.get(payload.batch_id)
+        return PeerAggregates.from_snapshot(payload.peer_snapshot)
+
+# SnapshotRegistry shared by every worker process on a host (see serve.py).
+# Each batch is one JSON file in `directory`, replaced atomically on upload; workers keep the
+# parsed PeerAggregates and re-read a file only when its mtime/size changes, so an upload
+# through any worker is seen by all of them. Versions are assigned under a directory-wide flock;
+# a delete renames the file to a tombstone, so the next upload of that batch continues its versions.
+class FileSnapshotRegistry(SnapshotRegistry):
+    SUFFIX = ".json"
+    TOMBSTONE_SUFFIX = ".deleted"
+
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError("FileSnapshotRegistry needs fcntl (POSIX)")
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, ".lock")
+        self._stamps = {}
+
+    def _path(self, batch_id):
+        return os.path.join(self.directory, quote(batch_id, safe="") + self.SUFFIX)
+
+    def _tombstone_path(self, batch_id):
+        return os.path.join(self.directory, quote(batch_id, safe="") + self.TOMBSTONE_SUFFIX)
+
+    # Last version written for batch_id, from its file or the tombstone a delete left; 0 if never uploaded
+    def _last_version(self, batch_id):
+        for path in (self._path(batch_id), self._tombstone_path(batch_id)):
+            try:
+                with open(path) as f:
+                    return json.load(f)["version"]
+            except FileNotFoundError:
+                pass
+        return 0
+
+    def _read(self, batch_id, stat):
+        with open(self._path(batch_id)) as f:
+            record = json.load(f)
+        entry = PeerAggregates(PeerSnapshot.parse_obj(record["snapshot"]), batch_id=batch_id, version=record["version"])
+        entry.updated_at = record["updated_at"]
+        self._entries[batch_id] = entry
+        self._stamps[batch_id] = _stamp(stat)
+        return entry
+
+    def put(self, batch_id, snapshot):
+        path = self._path(batch_id)
+        with _FileLock(self._lock_path):
+            version = self._last_version(batch_id) + 1
+            entry = PeerAggregates(snapshot, batch_id=batch_id, version=version)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": version, "updated_at": entry.updated_at, "snapshot": entry.snapshot}, f)
+            os.replace(tmp_path, path)
+            stamp = _stamp(os.stat(path))
+            try:
+                os.remove(self._tombstone_path(batch_id))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._entries[batch_id] = entry
+            self._stamps[batch_id] = stamp
+        return entry
+
+    def get(self, batch_id):
+        try:
+            st = os.stat(self._path(batch_id))
+        except FileNotFoundError:
+            self._entries.pop(batch_id, None)
+            raise UnknownBatchError(batch_id)
+        entry = self._entries.get(batch_id)
+        if entry is not None and self._stamps.get(batch_id) == _stamp(st):
+            return entry
+        with self._lock:
+            return self._read(batch_id, st)
+
+    def delete(self, batch_id):
+        with _FileLock(self._lock_path):
+            try:
+                os.replace(self._path(batch_id), self._tombstone_path(batch_id))
+            except FileNotFoundError:
+                raise UnknownBatchError(batch_id)
+        with self._lock:
+            self._entries.pop(batch_id, None)
+            self._stamps.pop(batch_id, None)
+
+    def versions(self):
+        versions = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            batch_id = unquote(name[:-len(self.SUFFIX)])
+            try:
+                versions[batch_id] = self.get(batch_id).version
+            except UnknownBatchError:
+                pass  # deleted by another worker while listing
+        return versions
+
+# os.replace() gives every upload a new inode, so this changes even within one mtime tick
+def _stamp(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+# Exclusive advisory lock on a file, held for the duration of a with-block
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
@@ -0,0 +1,252 @@
+# What-if simulator for config.json's rule thresholds over a corpus of recorded requests.
+# The corpus is loaded once into columns (NudgeEngine.rule_columns: every value a rule compares, and
+# both models' probabilities, none of which depend on the thresholds). A candidate config is then
+# one comparison per rule over the columns, applied in RULES order with the same MAX_NUDGES cap as
+# NudgeEngine.evaluate(), so sweeping hundreds of configs costs no model or Python per-request work.
+# Each config reports the nudge mix, fallback rate and per-rule firing counts (and how many times a
+# rule matched but the response was already full).
+#   python threshold_simulator.py corpus.ndjson --as-of 2025-07-01 --save-columns corpus.npz
+#   python threshold_simulator.py corpus.npz --grid resume_threshold=0.6:0.9:0.05 --grid quiz_inactive_days=3,7,14
+# Inputs are read like bulk_score.py reads them (full request bodies, or bare user_data joined to --peers).
+import argparse
+import itertools
+import json
+import sys
+import time
+from datetime import date
+import numpy as np
+from pydantic import ValidationError
+from day_clock import to_ordinal
+from engine import RULES, MAX_NUDGES
+from fast_path import decode_engagement_request
+from models import EngagementRequest
+
+CHUNK_SIZE = 4096
+# Threshold name -> config.json section
+THRESHOLDS = {
+    "resume_threshold": "profile_rules",
+    "projects_avg_threshold": "profile_rules",
+    "event_fomo_threshold": "profile_rules",
+    "buddies_event_threshold": "engagement_rules",
+    "event_peer_threshold": "engagement_rules",
+    "quiz_inactive_days": "engagement_rules",
+    "user_inactive_days": "engagement_rules",
+    "nudge_probability_threshold": "ml_rules"
+}
+# Columns the rules read, derived once from NudgeEngine.rule_columns(); rows a rule can't fire for
+# hold -inf, so every rule below is a single comparison
+SIMULATION_COLUMNS = (
+    "resume_pct_if_missing", "avg_projects_if_none", "buddies_attending", "max_attendance",
+    "quiz_days_if_dated", "event_days_if_attended", "event_fomo_score", "inactive_over_30_days",
+    "ml_resume", "ml_event"
+)
+# Same conditions as NudgeEngine._rule_*, one mask per RULES entry
+RULE_MASKS = {
+    "resume": lambda c, t: c["resume_pct_if_missing"] > t["resume_threshold"] * 100,
+    "project": lambda c, t: c["avg_projects_if_none"] >= t["projects_avg_threshold"],
+    "buddies_event": lambda c, t: c["buddies_attending"] >= t["buddies_event_threshold"],
+    "peer_event": lambda c, t: c["max_attendance"] >= t["event_peer_threshold"],
+    "quiz": lambda c, t: c["quiz_days_if_dated"] > t["quiz_inactive_days"],
+    "comeback": lambda c, t: c["event_days_if_attended"] > t["user_inactive_days"],
+    "event_fomo": lambda c, t: (c["event_fomo_score"] >= t["event_fomo_threshold"]) | c["inactive_over_30_days"],
+    "ml_resume": lambda c, t: c["ml_resume"] >= t["nudge_probability_threshold"],
+    "ml_event": lambda c, t: c["ml_event"] >= t["nudge_probability_threshold"]
+}
+
+def thresholds_from_config(config):
+    return {name: config[section][name] for name, section in THRESHOLDS.items()}
+
+# NudgeEngine.rule_columns() output -> SIMULATION_COLUMNS
+def simulation_columns(columns):
+    missing = -np.inf
+    event_days = np.where(columns["has_event"], columns["event_days"], 0)
+    return {
+        "resume_pct_if_missing": np.where(columns["resume_uploaded"] == 0, columns["batch_resume_uploaded_pct"], missing),
+        "avg_projects_if_none": np.where(columns["projects_added"] == 0, columns["batch_avg_projects"], missing),
+        "buddies_attending": columns["buddies_attending"],
+        "max_attendance": columns["max_attendance"],
+        "quiz_days_if_dated": np.where(columns["has_quiz"], columns["quiz_days"], missing),
+        "event_days_if_attended": np.where(columns["has_event"], columns["event_days"], missing),
+        "event_fomo_score": columns["event_fomo_score"],
+        "inactive_over_30_days": event_days > 30,
+        "ml_resume": columns["ml_resume"],
+        "ml_event": columns["ml_event"]
+    }
+
+class ThresholdSimulator:
+    # columns: SIMULATION_COLUMNS arrays; base: thresholds a candidate's missing entries default to
+    def __init__(self, columns, base, as_of=None):
+        unknown = [name for name, _, _ in RULES if name not in RULE_MASKS]
+        if unknown:
+            raise ValueError(f"No simulated condition for rules {unknown}")
+        self.columns = {name: columns[name] for name in SIMULATION_COLUMNS}
+        self.base = dict(base)
+        self.as_of = as_of
+        self.rows = len(self.columns["ml_event"])
+        self.invalid = 0
+
+    # Scores request bodies chunk by chunk, keeping only the columns; bodies that fail validation or
+    # name a batch_id resolve_peer() doesn't know (KeyError) are skipped and counted in .invalid
+    @classmethod
+    def from_bodies(cls, engine, chunks, resolve_peer, base, as_of):
+        today = to_ordinal(as_of)
+        parts, invalid = [], 0
+        for bodies in chunks:
+            payloads, peers = [], []
+            for body in bodies:
+                payload = decode_engagement_request(body)
+                try:
+                    if payload is None:
+                        payload = EngagementRequest.parse_obj(body)
+                    peers.append(resolve_peer(payload))
+                except (ValidationError, KeyError):
+                    invalid += 1
+                    continue
+                payloads.append(payload)
+            if payloads:
+                parts.append(simulation_columns(engine.rule_columns(payloads, peers, today)))
+        columns = {name: np.concatenate([p[name] for p in parts]) if parts else np.empty(0) for name in SIMULATION_COLUMNS}
+        simulator = cls(columns, base, today)
+        simulator.invalid = invalid
+        return simulator
+
+    # The columns and as-of day as an .npz, so later sweeps skip decoding and scoring
+    def save(self, path):
+        np.savez(path, as_of=np.int64(self.as_of), base=json.dumps(self.base), **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in SIMULATION_COLUMNS}, json.loads(str(data["base"])), int(data["as_of"]))
+
+    # Runs the rules under `thresholds` (missing names: the base config) over every row
+    def simulate(self, thresholds=None):
+        unknown = set(thresholds or ()) - set(THRESHOLDS)
+        if unknown:
+            raise ValueError(f"Unknown thresholds {sorted(unknown)}; choose from {list(THRESHOLDS)}")
+        t = {**self.base, **(thresholds or {})}
+        fired_count = np.zeros(self.rows, dtype=np.uint8)
+        fired, capped = {}, {}
+        for index, (name, _, _) in enumerate(RULES):
+            matched = RULE_MASKS[name](self.columns, t)
+            # the first MAX_NUDGES rules always have room
+            mask = matched & (fired_count < MAX_NUDGES) if index >= MAX_NUDGES else matched
+            fired[name] = int(np.count_nonzero(mask))
+            capped[name] = int(np.count_nonzero(matched)) - fired[name]
+            fired_count += mask
+        nudges = sum(fired.values())
+        fallbacks = MAX_NUDGES * self.rows - nudges
+        return {
+            "thresholds": t,
+            "users": self.rows,
+            "fired": fired,
+            "capped": capped,
+            "nudge_mix": {name: round(count / nudges, 4) if nudges else 0.0 for name, count in fired.items()},
+            "fallback_nudges": fallbacks,
+            "fallback_rate": round(fallbacks / (MAX_NUDGES * self.rows), 4) if self.rows else 0.0,
+            "users_with_fallback": int(np.count_nonzero(fired_count < MAX_NUDGES))
+        }
+
+    def sweep(self, candidates):
+        return [self.simulate(candidate) for candidate in candidates]
+
+# "name=0.6,0.7,0.8" or "name=start:stop:step" (stop included) -> (name, values)
+def parse_grid(text):
+    name, _, values = text.partition("=")
+    if name not in THRESHOLDS or not values:
+        raise argparse.ArgumentTypeError(f"Expected NAME=v1,v2,... or NAME=start:stop:step with NAME in {list(THRESHOLDS)}")
+    number = float if any(c in values for c in ".eE") else int
+    if ":" in values:
+        start, stop, step = (number(v) for v in values.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return name, [number(round(start + i * step, 10)) for i in range(count)]
+    return name, [number(v) for v in values.split(",")]
+
+# --configs: a JSON list of threshold overrides, inline or read from a file given as @path
+def parse_configs(text):
+    try:
+        if text.startswith("@"):
+            with open(text[1:], encoding="utf-8") as f:
+                configs = json.load(f)
+        else:
+            configs = json.loads(text)
+    except OSError as e:
+        raise argparse.ArgumentTypeError(f"Can't read {text[1:]}: {e.strerror}")
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Not valid JSON: {e}")
+    if not isinstance(configs, list) or not all(isinstance(c, dict) and set(c) <= set(THRESHOLDS) for c in configs):
+        raise argparse.ArgumentTypeError(f"Expected a JSON list of objects with keys in {list(THRESHOLDS)}")
+    return configs
+
+# Cartesian product of the --grid values, as threshold overrides
+def grid_candidates(grids):
+    names = [name for name, _ in grids]
+    return [dict(zip(names, values)) for values in itertools.product(*(values for _, values in grids))]
+
+def main():
+    from engine import NudgeEngine, load_config, load_scorers, CONFIG_PATH
+    from snapshot_registry import SnapshotRegistry
+    from models import PeerSnapshot
+    from bulk_score import iter_records, iter_payloads, load_peers, chunked
+
+    parser = argparse.ArgumentParser(description="Simulate nudge output under candidate rule thresholds.")
+    parser.add_argument("input", help="recorded requests (.ndjson/.jsonl, .csv, .json) or columns saved with --save-columns (.npz)")
+    parser.add_argument("--grid", action="append", type=parse_grid, default=[], metavar="NAME=VALUES",
+                        help="threshold values to sweep, e.g. resume_threshold=0.6:0.9:0.05 or quiz_inactive_days=3,7,14")
+    parser.add_argument("--configs", type=parse_configs, default=[],
+                        help="JSON list of threshold overrides to simulate, e.g. [{\"quiz_inactive_days\": 10}], "
+                             "or @path of a file holding one")
+    parser.add_argument("--output", help="write one NDJSON report per config here")
+    parser.add_argument("--save-columns", help="save the loaded corpus as .npz for later sweeps")
+    parser.add_argument("--input-format", choices=["ndjson", "json", "csv"])
+    parser.add_argument("--peers", default="peer_snapshot.json", help="peer contexts for records without one")
+    parser.add_argument("--batch-field", help="record field naming the peer context (default: round-robin)")
+    parser.add_argument("--config", default=CONFIG_PATH, help="base thresholds and models")
+    parser.add_argument("--model-format", choices=["json", "pickle"], default="json")
+    parser.add_argument("--as-of", type=to_ordinal, help="day counts as of this YYYY-MM-DD date (default: today)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    base = thresholds_from_config(config)
+    started = time.perf_counter()
+    if args.input.endswith(".npz"):
+        simulator = ThresholdSimulator.load(args.input)
+        simulator.base = base
+        print(f"📦 {simulator.rows:,} requests loaded from '{args.input}' (as of {date.fromordinal(simulator.as_of)})", file=sys.stderr)
+    else:
+        engine = NudgeEngine(config, *load_scorers(model_format=args.model_format))
+        peers = load_peers(args.peers)
+        registry = SnapshotRegistry()
+        for batch_id, snapshot in peers.items():
+            registry.put(batch_id, PeerSnapshot.parse_obj(snapshot))
+        records = iter_records(args.input, args.input_format and "." + args.input_format)
+        chunks = chunked(iter_payloads(records, list(peers), args.batch_field), CHUNK_SIZE)
+        as_of = args.as_of or engine.as_of_clock()
+        simulator = ThresholdSimulator.from_bodies(engine, chunks, registry.resolve, base, as_of)
+        print(f"📦 {simulator.rows:,} requests loaded and scored in {time.perf_counter() - started:.2f}s "
+              f"({simulator.invalid:,} invalid skipped)", file=sys.stderr)
+    if args.save_columns:
+        simulator.save(args.save_columns)
+        print(f"📦 Columns saved to '{args.save_columns}'", file=sys.stderr)
+
+    candidates = [{}]  # the base config first, to compare against
+    candidates += grid_candidates(args.grid) if args.grid else []
+    candidates += args.configs
+    started = time.perf_counter()
+    reports = simulator.sweep(candidates)
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for report in reports:
+                f.write(json.dumps(report) + "\n")
+    rules = [name for name, _, _ in RULES]
+    print(f"{'config':<48} {'fallback':>8} " + " ".join(f"{name:>13}" for name in rules))
+    for candidate, report in zip(candidates, reports):
+        label = ", ".join(f"{k}={v}" for k, v in candidate.items()) or "(base config)"
+        print(f"{label[:48]:<48} {report['fallback_rate']:>8.2%} " + " ".join(f"{report['fired'][name]:>13,}" for name in rules))
+    print(f"⏱  {len(reports):,} configs x {simulator.rows:,} requests simulated in {elapsed:.2f}s"
+          + (f" -> {args.output}" if args.output else ""), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
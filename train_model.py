@@ -1,78 +1,201 @@
-import pandas as pd
+# Trains the resume and event nudge models.
+# Training rows live in a columnar feature store (feature_store.py, data/feature_store) that is seeded
+# from processed_fomo_dataset.csv on the first run; later runs read the store, not the CSV.
+#   python train_model.py                          # fit both models from scratch on every stored row
+#   python train_model.py --append new_rows.csv    # store new labelled rows, then warm-start both models
+#                                                  # from models/*.pkl instead of fitting from scratch
+#   python train_model.py --model-dir models/candidate   # write the models elsewhere, e.g. as the
+#                                                        # candidate set scored in shadow (shadow_models.py)
+# Both models share one train/test split, the cross-validation folds of both run in parallel
+# (joblib), and every run's stage timings are appended to reports/training_runs.ndjson.
+import argparse
+import json
+import os
+import time
+from datetime import datetime
 import joblib
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split, cross_val_score
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, check_cv
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
-import os
-
-# Load dataset
-df = pd.read_csv("processed_fomo_dataset.csv")
-
-# Features and labels
-X = df.drop(columns=["should_nudge_resume", "should_nudge_event"])
-y_resume = df["should_nudge_resume"]
-y_event = df["should_nudge_event"]
-
-# Split data
-X_train_r, X_test_r, y_train_r, y_test_r = train_test_split(X, y_resume, test_size=0.2, random_state=42)
-X_train_e, X_test_e, y_train_e, y_test_e = train_test_split(X, y_event, test_size=0.2, random_state=42)
-
-# Train resume model (no feature filtering)
-model_resume = LogisticRegression(max_iter=1000)
-model_resume.fit(X_train_r, y_train_r)
-
-# Train event model
-model_event = LogisticRegression(max_iter=1000)
-model_event.fit(X_train_e, y_train_e)
-
-# Make directories
-os.makedirs("models", exist_ok=True)
-os.makedirs("reports", exist_ok=True)
-
-# Save models
-joblib.dump(model_resume, "models/model_resume.pkl")
-joblib.dump(model_event, "models/model_event.pkl")
-
-# Evaluate resume model
-y_pred_r = model_resume.predict(X_test_r)
-report_r = classification_report(y_test_r, y_pred_r)
-accuracy_r = accuracy_score(y_test_r, y_pred_r)
-cv_scores_r = cross_val_score(model_resume, X, y_resume, cv=5)
-
-# Evaluate event model
-y_pred_e = model_event.predict(X_test_e)
-report_e = classification_report(y_test_e, y_pred_e)
-accuracy_e = accuracy_score(y_test_e, y_pred_e)
-cv_scores_e = cross_val_score(model_event, X, y_event, cv=5)
-
-# Save reports
-with open("reports/classification_report.txt", "w") as f:
-    f.write("Resume Nudge Model:\n")
-    f.write(report_r)
-    f.write(f"\nAccuracy: {accuracy_r:.2%}\n")
-    f.write(f"5-Fold CV Accuracy: {cv_scores_r.mean():.2%}\n")
-
-    f.write("\n\nEvent Nudge Model:\n")
-    f.write(report_e)
-    f.write(f"\nAccuracy: {accuracy_e:.2%}\n")
-    f.write(f"5-Fold CV Accuracy: {cv_scores_e.mean():.2%}\n")
-
-# Feature importance plot (resume)
-resume_importance = pd.Series(model_resume.coef_[0], index=X.columns).sort_values()
-resume_importance.to_csv("reports/feature_importance_resume.csv")
-resume_importance.plot(kind='barh', title="Resume Nudge Model - Feature Importance", color='lightgreen')
-plt.tight_layout()
-plt.grid(True, linestyle='--', alpha=0.5)
-plt.savefig("reports/feature_importance_resume.png")
-plt.close()
-
-print("✅ Models trained and saved in 'models/' folder.")
-print("📊 Reports and plots saved in 'reports/' folder.")
-
-
-train_acc = model_resume.score(X_train_r, y_train_r)
-test_acc = model_resume.score(X_test_r, y_test_r)
-
-print(f"Train Accuracy: {train_acc:.2%}")
-print(f"Test Accuracy: {test_acc:.2%}")
+from build_info import git_commit
+from feature_store import FeatureStore, FEATURE_STORE_DIR
+from logistic_scorer import LogisticScorer
+
+DATASET_PATH = "processed_fomo_dataset.csv"
+# model name -> label column
+LABELS = {"resume": "should_nudge_resume", "event": "should_nudge_event"}
+TIMINGS_PATH = os.path.join("reports", "training_runs.ndjson")
+
+def read_rows(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+# A new LogisticRegression, or with warm_start the saved model set to refit from its current
+# coefficients: LogisticRegression has no partial_fit, but lbfgs started from the previous optimum
+# converges in a few iterations when the new rows only move it a little. Warm starts always begin
+# from the live models in models/.
+def new_model(name, warm_start, feature_names):
+    if warm_start:
+        path = os.path.join("models", f"model_{name}.pkl")
+        try:
+            model = joblib.load(path)
+        except FileNotFoundError:
+            print(f"📌 No '{path}' to warm-start from; fitting the {name} model from scratch.")
+        else:
+            if list(getattr(model, "feature_names_in_", [])) == list(feature_names):
+                return model.set_params(warm_start=True, max_iter=1000)
+            print(f"📌 '{path}' was trained on other features; fitting the {name} model from scratch.")
+    return LogisticRegression(max_iter=1000)
+
+# Accuracy of a fresh copy of `model` fitted on one fold (what cross_val_score computes per fold)
+def fold_accuracy(model, X, y, train, test):
+    fold_model = clone(model).set_params(warm_start=False)
+    fold_model.fit(X.iloc[train], y.iloc[train])
+    return fold_model.score(X.iloc[test], y.iloc[test])
+
+# Stratified k-fold accuracies for every model, with all folds of all models run in parallel
+def cross_validate(models, X, labels, folds, jobs):
+    tasks = []
+    for name, model in models.items():
+        y = labels[name]
+        tasks.extend((name, model, y, train, test) for train, test in check_cv(folds, y, classifier=True).split(X, y))
+    scores = Parallel(n_jobs=jobs, prefer="threads")(
+        delayed(fold_accuracy)(model, X, y, train, test) for _, model, y, train, test in tasks
+    )
+    return {name: np.array([s for (task_name, *_), s in zip(tasks, scores) if task_name == name]) for name in models}
+
+# Feature importance bar chart, drawn without pyplot (no display or global figure state needed)
+def plot_feature_importance(importance, path):
+    try:
+        from matplotlib.figure import Figure
+    except ImportError:
+        print("📌 matplotlib not installed. Run 'pip install matplotlib' to save the feature importance plot.")
+        return
+    fig = Figure()
+    ax = fig.subplots()
+    importance.plot(kind='barh', title="Resume Nudge Model - Feature Importance", color='lightgreen', ax=ax)
+    ax.grid(True, linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    fig.savefig(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the resume and event nudge models.")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="CSV that seeds an empty feature store")
+    parser.add_argument("--store", default=FEATURE_STORE_DIR, help="feature store directory")
+    parser.add_argument("--append", action="append", metavar="PATH",
+                        help="labelled rows (.csv or .parquet) to add to the store first; implies --warm-start")
+    parser.add_argument("--warm-start", action="store_true", help="refit from the saved models' coefficients")
+    parser.add_argument("--cv-folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel cross-validation jobs (-1 = one per core)")
+    parser.add_argument("--no-plots", action="store_true", help="skip the feature importance plot")
+    parser.add_argument("--model-dir", default="models", help="where to save the models (default: the live models/)")
+    args = parser.parse_args()
+    warm_start = args.warm_start or bool(args.append)
+
+    timings = {}
+    started = last = time.perf_counter()
+
+    def lap(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round(now - last, 4)
+        last = now
+
+    # === Feature store ===
+    store = FeatureStore(args.store)
+    new_rows = 0
+    if not store.shards:
+        shard = store.append(read_rows(args.dataset), source=args.dataset)
+        print(f"📦 Feature store '{args.store}' seeded with {shard['rows']:,} rows from '{args.dataset}'")
+    for path in args.append or ():
+        shard = store.append(read_rows(path), source=path)
+        new_rows += shard["rows"]
+        print(f"📦 {shard['rows']:,} rows from '{path}' appended as {shard['name']}")
+    df = store.load()
+    lap("load")
+
+    # Features and labels; one split for both models (the same rows separate splits with
+    # random_state=42 would pick)
+    X = df.drop(columns=list(LABELS.values()))
+    labels = {name: df[column] for name, column in LABELS.items()}
+    train_index, test_index = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    X_train, X_test = X.iloc[train_index], X.iloc[test_index]
+
+    # === Fit ===
+    models = {}
+    for name in LABELS:
+        model = new_model(name, warm_start, X.columns)
+        model.fit(X_train, labels[name].iloc[train_index])
+        models[name] = model
+        lap(f"fit_{name}")
+
+    # Make directories
+    os.makedirs(args.model_dir, exist_ok=True)
+    os.makedirs("reports", exist_ok=True)
+
+    # Save models, plus compact, versioned artifacts (feature order, coefficients, intercept) that the
+    # service loads without importing sklearn; see "startup.model_format" in config.json
+    for name, model in models.items():
+        joblib.dump(model, os.path.join(args.model_dir, f"model_{name}.pkl"))
+        LogisticScorer.from_estimator(model).save(os.path.join(args.model_dir, f"model_{name}.json"))
+    lap("save")
+
+    # === Evaluate ===
+    reports, accuracy = {}, {}
+    for name, model in models.items():
+        y_test = labels[name].iloc[test_index]
+        y_pred = model.predict(X_test)
+        reports[name] = classification_report(y_test, y_pred)
+        accuracy[name] = accuracy_score(y_test, y_pred)
+    lap("evaluate")
+    cv_scores = cross_validate(models, X, labels, args.cv_folds, args.jobs)
+    lap("cross_validate")
+
+    # Save reports
+    with open("reports/classification_report.txt", "w") as f:
+        for title, name in (("Resume Nudge Model:\n", "resume"), ("\n\nEvent Nudge Model:\n", "event")):
+            f.write(title)
+            f.write(reports[name])
+            f.write(f"\nAccuracy: {accuracy[name]:.2%}\n")
+            f.write(f"{args.cv_folds}-Fold CV Accuracy: {cv_scores[name].mean():.2%}\n")
+
+    # Feature importance (resume)
+    resume_importance = pd.Series(models["resume"].coef_[0], index=X.columns).sort_values()
+    resume_importance.to_csv("reports/feature_importance_resume.csv")
+    if not args.no_plots:
+        plot_feature_importance(resume_importance, "reports/feature_importance_resume.png")
+    lap("reports")
+
+    print(f"✅ Models trained and saved in '{args.model_dir}/' folder (.pkl + .json artifacts).")
+    print("📊 Reports and plots saved in 'reports/' folder.")
+
+    train_acc = models["resume"].score(X_train, labels["resume"].iloc[train_index])
+    test_acc = models["resume"].score(X_test, labels["resume"].iloc[test_index])
+
+    print(f"Train Accuracy: {train_acc:.2%}")
+    print(f"Test Accuracy: {test_acc:.2%}")
+
+    # === Training time log, one JSON line per run ===
+    total = time.perf_counter() - started
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "mode": "warm_start" if warm_start else "full",
+        "rows": len(df),
+        "new_rows": new_rows,
+        "shards": len(store.shards),
+        "n_iter": {name: int(model.n_iter_[0]) for name, model in models.items()},
+        "accuracy": {name: round(value, 4) for name, value in accuracy.items()},
+        "cv_accuracy": {name: round(float(scores.mean()), 4) for name, scores in cv_scores.items()},
+        "seconds": timings,
+        "total_seconds": round(total, 4)
+    }
+    with open(TIMINGS_PATH, "a") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"⏱  Trained in {total:.2f}s ({', '.join(f'{k} {v:.3f}s' for k, v in timings.items())}) -> {TIMINGS_PATH}")
+
+if __name__ == "__main__":
+    main()